@@ -0,0 +1,47 @@
+"""Compare requests/sec of one connection per call against the pooled session of ApiV5Client.
+
+Usage: python -m benchmarks.bench_connection_pool [number_of_calls]
+
+The stand-in server speaks plain HTTP on localhost, so the figures only show the cost of
+TCP connection setup; against api.helloasso.com the TLS handshake makes the gap wider.
+"""
+import sys
+import time
+
+import requests
+
+from benchmarks._server import LocalServer
+from helloasso_api import ApiV5Client
+
+
+def bench(name: str, func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+    rate = calls / elapsed
+    print(f"{name:<32} {calls} calls in {elapsed:.2f}s : {rate:.0f} req/s")
+    return rate
+
+
+def main(calls: int = 2000):
+    with LocalServer() as server:
+        url = f"{server.api_base}/v5/ping"
+        client = ApiV5Client(
+            api_base=server.api_base,
+            client_id="client_id",
+            client_secret="client_secret",
+            access_token="token",
+        )
+        with client:
+            before = bench(
+                "requests.get (no pool)",
+                lambda: requests.get(url, headers={"Authorization": "Bearer token"}),
+                calls,
+            )
+            after = bench("ApiV5Client.call (pooled)", lambda: client.call("/v5/ping"), calls)
+    print(f"speedup: x{after / before:.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
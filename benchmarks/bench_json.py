@@ -0,0 +1,56 @@
+"""Compare json codecs decoding and encoding realistic pages of orders.
+
+Usage: python -m benchmarks.bench_json [orders_per_page] [repeat]
+
+Each codec decodes the bytes of a page of the orders endpoint (what response.json() does)
+and encodes it back (what a json= payload costs), the best of `repeat` runs is kept.
+requests' own response.json() is measured as the baseline.
+"""
+import json
+import sys
+import time
+
+from requests import Response
+
+from benchmarks.bench_models import synthetic_orders
+from helloasso_api.codec import CODECS, orjson
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(page_size: int = 100, repeat: int = 200):
+    page = {
+        "data": json.loads(synthetic_orders(page_size)),
+        "pagination": {"pageSize": page_size, "continuationToken": "abc"},
+    }
+    content = json.dumps(page).encode()
+    print(f"page of {page_size} orders : {len(content) / 1024:.0f} KiB")
+
+    response = Response()
+    response._content = content
+    response.encoding = "utf-8"
+    baseline = best_of(response.json, repeat)
+    print(f"{'requests .json()':<20} decode {baseline * 1000:7.3f} ms")
+
+    for name, codec_class in CODECS.items():
+        if name == "orjson" and orjson is None:
+            print(f"{name:<20} not installed")
+            continue
+        codec = codec_class()
+        decode = best_of(lambda: codec.loads(content), repeat)
+        encode = best_of(lambda: codec.dumps(page), repeat)
+        print(
+            f"{name:<20} decode {decode * 1000:7.3f} ms (x{baseline / decode:.1f})"
+            f"  encode {encode * 1000:7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,103 @@
+"""Compare the memory held by orders kept as raw dicts and as __slots__ models.
+
+Usage: python -m benchmarks.bench_models [number_of_orders]
+
+Orders are decoded from a synthetic json page, as returned by the orders endpoint, then
+kept in a list. Models are measured twice: with nested objects untouched (decoded lazily,
+kept as received) and once every payer, item and payment has been accessed.
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from helloasso_api.models import Order
+
+
+def synthetic_orders(count: int) -> str:
+    orders = []
+    for i in range(count):
+        payer = {
+            "email": f"payer{i}@example.org",
+            "firstName": "Jeanne",
+            "lastName": f"Martin{i}",
+            "country": "FRA",
+        }
+        orders.append(
+            {
+                "id": i,
+                "date": "2022-05-12T14:05:32.1234567+02:00",
+                "formSlug": "adhesion-2022",
+                "formType": "Membership",
+                "organizationSlug": "mon-asso",
+                "organizationName": "Mon asso",
+                "amount": {"total": 2500, "vat": 0, "discount": 0},
+                "payer": payer,
+                "items": [
+                    {
+                        "id": i * 10,
+                        "name": "Adhésion",
+                        "type": "Membership",
+                        "state": "Processed",
+                        "amount": 2500,
+                        "priceCategory": "Fixed",
+                        "user": {"firstName": "Jeanne", "lastName": f"Martin{i}"},
+                        "payments": [{"id": i * 100, "shareAmount": 2500}],
+                    }
+                ],
+                "payments": [
+                    {
+                        "id": i * 100,
+                        "date": "2022-05-12T14:05:32.1234567+02:00",
+                        "state": "Authorized",
+                        "type": "Offline",
+                        "amount": 2500,
+                        "paymentMeans": "Card",
+                    }
+                ],
+                "meta": {
+                    "createdAt": "2022-05-12T14:05:32.1234567+02:00",
+                    "updatedAt": "2022-05-12T14:05:32.1234567+02:00",
+                },
+                "isAnonymous": False,
+                "isAmountHidden": False,
+            }
+        )
+    return json.dumps(orders)
+
+
+def measure(name: str, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:<32} {size / 2 ** 20:8.1f} MiB {elapsed:6.2f}s")
+    del kept
+    return size
+
+
+def decoded(orders: list) -> list:
+    for order in orders:
+        order.payer, order.items, order.payments
+    return orders
+
+
+def main(count: int = 100000):
+    text = synthetic_orders(count)
+    raw = measure("raw dicts", lambda: json.loads(text))
+    lazy = measure(
+        "models (nested not accessed)", lambda: Order.from_list(json.loads(text))
+    )
+    full = measure(
+        "models (nested decoded)", lambda: decoded(Order.from_list(json.loads(text)))
+    )
+    print(f"saving: lazy {1 - lazy / raw:.0%}, decoded {1 - full / raw:.0%}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
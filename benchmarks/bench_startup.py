@@ -0,0 +1,66 @@
+"""Measure the import time of the package and the time to build a client, with and without
+lazy_auth, each in a fresh interpreter.
+
+Usage: python -m benchmarks.bench_startup [runs]
+
+Clients are built against helloasso_api.mock_server with a 20 ms latency standing in for the
+token round trip to api.helloasso.com.
+"""
+import subprocess
+import sys
+from statistics import median
+
+from helloasso_api.mock_server import MockApi, constant_latency
+
+SNIPPETS = {
+    "import helloasso_api": "import helloasso_api",
+    "from helloasso_api import HaApiV5": "from helloasso_api import HaApiV5",
+    "HaApiV5(...)": (
+        "from helloasso_api import HaApiV5\n"
+        "start = time.perf_counter()\n"
+        "HaApiV5(api_base=API_BASE, client_id='client_id', client_secret='client_secret')"
+    ),
+    "HaApiV5(..., lazy_auth=True)": (
+        "from helloasso_api import HaApiV5\n"
+        "start = time.perf_counter()\n"
+        "HaApiV5(api_base=API_BASE, client_id='client_id', client_secret='client_secret',"
+        " lazy_auth=True)"
+    ),
+}
+
+TEMPLATE = """
+import sys, time
+start = time.perf_counter()
+API_BASE = {api_base!r}
+{snippet}
+elapsed = time.perf_counter() - start
+print(elapsed, sorted(m for m in ("requests", "httpx") if m in sys.modules))
+"""
+
+
+def run(snippet: str, api_base: str) -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", TEMPLATE.format(api_base=api_base, snippet=snippet)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    elapsed, modules = output.split(" ", 1)
+    return float(elapsed), modules.strip()
+
+
+def main(runs: int = 10):
+    results = {}
+    with MockApi(orders=0, latency=constant_latency(20)) as mock:
+        for name, snippet in SNIPPETS.items():
+            timings = []
+            for _ in range(runs):
+                elapsed, modules = run(snippet, mock.api_base)
+                timings.append(elapsed)
+            results[name] = median(timings) * 1000
+            print(f"{name:<36} {results[name]:7.1f} ms  loaded: {modules}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,101 @@
+"""Measure memory and connections of a partner client calling the api for many organizations,
+through for_organization against one client per organization.
+
+Usage: python -m benchmarks.bench_tenants [organizations] [max_organizations]
+
+Runs against helloasso_api.mock_server, each organization makes one call.
+"""
+import sys
+import time
+import tracemalloc
+
+from helloasso_api import HaApiV5, MetricsRegistry
+from helloasso_api.mock_server import MockApi
+
+PING = "/v5/users/me/organizations"
+
+
+def connections(metrics: MetricsRegistry) -> int:
+    return sum(value for _, value in metrics.snapshot()["gauges"]["pool_connections"])
+
+
+def new_client(api_base: str, **kwargs) -> HaApiV5:
+    return HaApiV5(
+        api_base=api_base,
+        client_id="client_id",
+        client_secret="client_secret",
+        lazy_auth=True,
+        **kwargs,
+    )
+
+
+def bench_for_organization(mock: MockApi, organizations: int, max_organizations: int):
+    metrics = MetricsRegistry()
+    # every organization gets the same tokens, the storage keeps a single copy of them so
+    # that only the memory of the client is measured
+    storage = {}
+    tracemalloc.start()
+    start = time.perf_counter()
+    partner = new_client(
+        mock.api_base,
+        metrics=metrics,
+        max_organizations=max_organizations,
+        organization_token_getter=lambda key, slug: storage.get(key),
+        organization_token_setter=lambda key, slug, token: storage.update({key: token}),
+    )
+    tokens = mock.new_tokens()
+    for index in range(organizations):
+        partner.for_organization(
+            f"asso-{index}", tokens["access_token"], tokens["refresh_token"]
+        ).call(PING)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, memory, connections(metrics)
+
+
+def bench_client_per_organization(mock: MockApi, organizations: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = mock.new_tokens()
+    clients = []
+    total = 0
+    for _ in range(organizations):
+        metrics = MetricsRegistry()
+        client = new_client(
+            mock.api_base,
+            metrics=metrics,
+            access_token=tokens["access_token"],
+            refresh_token=tokens["refresh_token"],
+        )
+        client.call(PING)
+        total += connections(metrics)
+        clients.append(client)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for client in clients:
+        client.close()
+    return elapsed, memory, total
+
+
+def main(organizations: int = 500, max_organizations: int = 256):
+    with MockApi(orders=0) as mock:
+        for name, (elapsed, memory, opened) in (
+            (
+                f"for_organization (max {max_organizations})",
+                bench_for_organization(mock, organizations, max_organizations),
+            ),
+            (
+                "one HaApiV5 per organization",
+                bench_client_per_organization(mock, organizations),
+            ),
+        ):
+            print(
+                f"{name:<32} {organizations} organizations  {elapsed:6.2f} s  "
+                f"{memory / 1024 / 1024:7.1f} MiB  {opened} connections"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,53 @@
+"""Compare two result files of benchmarks.suite.
+
+Usage: python -m benchmarks.compare before.json after.json
+
+Metrics ending with _us, _ms or _s are timings (lower is better), metrics ending with _per_s
+are rates (higher is better). Changes within +-5% are usually noise on a laptop.
+"""
+import json
+import sys
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[f"{prefix}{key}"] = value
+    return metrics
+
+
+def improvement(name: str, before: float, after: float) -> float:
+    """Return the relative improvement of after over before, positive when better."""
+    if not before or not after:
+        return 0.0
+    if name.endswith("_per_s"):
+        return after / before - 1
+    if name.endswith(("_us", "_ms", "_s")):
+        return before / after - 1
+    return 0.0
+
+
+def main(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(
+        f"before: {before['environment']['commit']}  after: {after['environment']['commit']}"
+    )
+    before_metrics = flatten({k: v for k, v in before.items() if k != "environment"})
+    after_metrics = flatten({k: v for k, v in after.items() if k != "environment"})
+    for name, value in before_metrics.items():
+        if name not in after_metrics:
+            continue
+        new_value = after_metrics[name]
+        change = improvement(name, value, new_value)
+        mark = f"{change:+.1%}" if change else ""
+        print(f"{name:<45} {value:>12.2f} {new_value:>12.2f} {mark:>8}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
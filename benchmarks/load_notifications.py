@@ -0,0 +1,89 @@
+"""Post bursts of notifications to a local NotificationReceiver and report how fast they
+are acknowledged.
+
+Usage: python -m benchmarks.load_notifications [bursts] [burst_size] [senders] [handler_ms]
+
+Every burst re-sends a tenth of its notifications, as HelloAsso does when a delivery is
+not acknowledged in time. The handler sleeps handler_ms to stand in for real processing:
+when the workers fall behind, the bounded queue fills up and deliveries are refused with
+503 instead of piling up in memory.
+
+Senders and receiver share one process (and the GIL): the figures are a lower bound of what
+the receiver sustains behind a real WSGI server.
+"""
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+
+import requests
+
+from helloasso_api.notifications import NotificationReceiver
+
+
+def notification(order_id: int) -> bytes:
+    return json.dumps(
+        {
+            "eventType": "Order",
+            "data": {
+                "id": order_id,
+                "amount": {"total": 1000},
+                "payer": {"email": f"payer{order_id}@example.org"},
+                "items": [{"id": order_id * 10, "amount": 1000, "type": "Donation"}],
+            },
+        }
+    ).encode()
+
+
+def main(
+    bursts: int = 10, burst_size: int = 500, senders: int = 16, handler_ms: float = 1
+):
+    receiver = NotificationReceiver(
+        lambda n: time.sleep(handler_ms / 1000), workers=8, queue_size=1000
+    )
+    server = threading.Thread(target=receiver.serve, args=("127.0.0.1", 0), daemon=True)
+    server.start()
+    while receiver._server is None:
+        time.sleep(0.01)
+    host, port = receiver._server.server_address
+    url = f"http://{host}:{port}/notifications"
+
+    local = threading.local()
+
+    def post(body: bytes):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        status = local.session.post(url, data=body).status_code
+        return status, time.perf_counter() - start
+
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=senders) as executor:
+        for burst in range(bursts):
+            ids = range(burst * burst_size, (burst + 1) * burst_size)
+            bodies = [notification(i) for i in ids]
+            bodies += bodies[: burst_size // 10]
+            results += executor.map(post, bodies)
+    elapsed = time.perf_counter() - start
+    receiver.stop()
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(
+        f"{len(results)} deliveries in {elapsed:.2f}s : {len(results) / elapsed:.0f} req/s"
+    )
+    print(
+        f"ack latency p50 {median(latencies) * 1000:.2f}ms "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms"
+    )
+    print(f"statuses {statuses}")
+    print(f"receiver {receiver.stats()}")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if "." in arg else int(arg) for arg in sys.argv[1:]))
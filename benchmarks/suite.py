@@ -0,0 +1,276 @@
+"""Benchmark the hot paths of the client offline and save the results as json.
+
+Usage: python -m benchmarks.suite [output.json]
+
+Scenarios:
+- overhead: client cost of one call (prepare_request, execute_request, check_response,
+  token expiry check, exception mapping on 404) against a canned response, no socket
+- throughput: calls/s through call_many at several concurrency levels
+- refresh_storm: concurrent calls all getting a 401 at once, a single token refresh is
+  expected (token_requests)
+- pagination: items/s walking a paginated list
+- json_decode: GET + .json() of a large page of orders, per json codec
+- coalescing: bursts of identical GETs with and without a RequestCoalescer, api requests
+  per burst
+- outage: sequential calls while every request times out, with and without a
+  CircuitBreaker, time per call and requests sent
+
+Everything except overhead runs against helloasso_api.mock_server, in process.
+Results go to benchmarks/results/<date>-<commit>.json by default, compare two runs with
+python -m benchmarks.compare before.json after.json
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from statistics import median
+
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from helloasso_api import ApiV5Client, CircuitBreaker, RequestCoalescer
+from helloasso_api.codec import orjson
+from helloasso_api.exceptions import ApiV5CircuitOpen, ApiV5NotFound, ApiV5Timeout
+from helloasso_api.mock_server import MockApi, constant_latency
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+ORDERS = "/v5/organizations/mock-asso/orders"
+PING = "/v5/users/me/organizations"
+
+
+class CannedAdapter(BaseAdapter):
+    """Answer every request with the same response without opening any connection."""
+
+    def __init__(self, status_code: int = 200, content: bytes = b'{"success": true}'):
+        super(CannedAdapter, self).__init__()
+        self.status_code = status_code
+        self.content = content
+
+    def send(self, request, **kwargs) -> Response:
+        response = Response()
+        response.status_code = self.status_code
+        response._content = self.content
+        response.headers["Content-Type"] = "application/json"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def new_client(api_base: str, **kwargs) -> ApiV5Client:
+    return ApiV5Client(
+        api_base=api_base,
+        client_id="client_id",
+        client_secret="client_secret",
+        **kwargs,
+    )
+
+
+def per_call_us(func, calls: int) -> dict:
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "median_us": median(timings) * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99)] * 1e6,
+    }
+
+
+def bench_overhead(calls: int) -> dict:
+    client = new_client("http://api.invalid", access_token="token")
+    client.session.mount("http://", CannedAdapter())
+    results = {"call": per_call_us(lambda: client.call("/v5/ping"), calls)}
+
+    client.session.mount("http://", CannedAdapter(404, b'{"message": "not found"}'))
+
+    def not_found():
+        try:
+            client.call("/v5/ping")
+        except ApiV5NotFound:
+            pass
+
+    results["call_404"] = per_call_us(not_found, calls)
+    return results
+
+
+def bench_throughput(api_base: str, calls: int, concurrency_levels: tuple) -> dict:
+    results = {}
+    for concurrency in concurrency_levels:
+        with new_client(api_base, pool_maxsize=concurrency) as client:
+            client.call_many([PING] * concurrency, max_concurrency=concurrency)
+            start = time.perf_counter()
+            client.call_many([PING] * calls, max_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+        results[f"concurrency_{concurrency}"] = {"calls_per_s": calls / elapsed}
+    return results
+
+
+def token_requests(mock: MockApi) -> int:
+    stats = mock.stats()
+    return stats.get("grant_client_credentials", 0) + stats.get(
+        "grant_refresh_token", 0
+    )
+
+
+def bench_refresh_storm(mock: MockApi, concurrency: int, rounds: int):
+    with new_client(mock.api_base, pool_maxsize=concurrency) as client:
+        timings = []
+        before = token_requests(mock)
+        for _ in range(rounds):
+            # revoke every access token: all the calls get a 401 at once
+            mock.access_tokens.clear()
+            start = time.perf_counter()
+            results = client.call_many(
+                [PING] * concurrency, max_concurrency=concurrency
+            )
+            timings.append(time.perf_counter() - start)
+            errors = [result.error for result in results if result.error]
+            if errors:
+                raise errors[0]
+    return {
+        "concurrency": concurrency,
+        "median_ms": median(timings) * 1000,
+        "token_requests_per_storm": (token_requests(mock) - before) / rounds,
+    }
+
+
+def bench_pagination(api_base: str, page_size: int, rounds: int) -> dict:
+    with new_client(api_base) as client:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            items = sum(1 for _ in client.paginate(ORDERS, page_size=page_size))
+            timings.append(time.perf_counter() - start)
+    return {
+        "items": items,
+        "page_size": page_size,
+        "items_per_s": items / median(timings),
+    }
+
+
+def bench_json_decode(api_base: str, page_size: int, rounds: int) -> dict:
+    results = {}
+    for codec in (None, "json", "orjson"):
+        if codec == "orjson" and orjson is None:
+            continue
+        with new_client(api_base, json_codec=codec) as client:
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                result = client.call(ORDERS, params={"pageSize": page_size})
+                result.json()
+                timings.append(time.perf_counter() - start)
+        results[codec or "requests"] = {"median_ms": median(timings) * 1000}
+    results["page_kib"] = len(result.content) / 1024
+    return results
+
+
+def bench_coalescing(mock: MockApi, concurrency: int, rounds: int) -> dict:
+    results = {}
+    for name, coalescer in (("off", None), ("on", RequestCoalescer())):
+        with new_client(
+            mock.api_base, pool_maxsize=concurrency, coalescer=coalescer
+        ) as client:
+            client.call(PING)
+            before = mock.stats()["status_200"]
+            start = time.perf_counter()
+            for _ in range(rounds):
+                client.call_many([PING] * concurrency, max_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "calls_per_s": concurrency * rounds / elapsed,
+                "api_requests_per_burst": (mock.stats()["status_200"] - before)
+                / rounds,
+            }
+    return results
+
+
+def bench_outage(mock: MockApi, calls: int, timeout: float) -> dict:
+    results = {}
+    for name, breaker in (("off", None), ("on", CircuitBreaker())):
+        with new_client(
+            mock.api_base, timeout=timeout, circuit_breaker=breaker
+        ) as client:
+            latency, mock.latency = mock.latency, constant_latency(timeout * 5000)
+            timings = []
+            sent = 0
+            for _ in range(calls):
+                start = time.perf_counter()
+                try:
+                    client.call(PING)
+                except ApiV5Timeout:
+                    sent += 1
+                except ApiV5CircuitOpen:
+                    pass
+                timings.append(time.perf_counter() - start)
+            mock.latency = latency
+            results[name] = {
+                "median_ms": median(timings) * 1000,
+                "total_s": sum(timings),
+                "requests_sent": sent,
+            }
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            # capture_output and text are python 3.7+
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or "unknown",
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": orjson is not None,
+    }
+
+
+def run() -> dict:
+    results = {"environment": environment()}
+
+    results["overhead"] = bench_overhead(calls=5000)
+    with MockApi(orders=2000, max_page_size=2000) as mock:
+        results["throughput"] = bench_throughput(
+            mock.api_base, calls=2000, concurrency_levels=(1, 4, 16)
+        )
+        results["refresh_storm"] = bench_refresh_storm(mock, concurrency=32, rounds=20)
+        results["pagination"] = bench_pagination(mock.api_base, 100, rounds=5)
+        results["json_decode"] = bench_json_decode(mock.api_base, 2000, rounds=20)
+    with MockApi(orders=0, latency=constant_latency(20)) as mock:
+        results["coalescing"] = bench_coalescing(mock, concurrency=16, rounds=20)
+    with MockApi(orders=0) as mock:
+        results["outage"] = bench_outage(mock, calls=50, timeout=0.1)
+    return results
+
+
+def main(output: str = None):
+    results = run()
+    if output is None:
+        env = results["environment"]
+        date = env["date"][:19].replace(":", "")
+        output = os.path.join(RESULTS_DIR, f"{date}-{env['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
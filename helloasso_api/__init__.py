@@ -1,5 +1,41 @@
-from helloasso_api.apiv5client import ApiV5Client
-from helloasso_api.client.authorization import AuthorizationApi
+import sys
+from importlib import import_module
+
+# public names and their modules, imported on first access so that importing the package
+# stays cheap: requests, httpx, asyncio and the oauth libraries are only loaded when used
+_EXPORTS = {
+    "ApiV5Client": "helloasso_api.apiv5client",
+    "AsyncApiV5Client": "helloasso_api.async_apiv5client",
+    "AsyncHaApiV5": "helloasso_api.async_apiv5client",
+    "AuthorizationApi": "helloasso_api.client.authorization",
+    "CallResult": "helloasso_api.batch",
+    "ChangeFeed": "helloasso_api.feed",
+    "CircuitBreaker": "helloasso_api.circuit_breaker",
+    "Exporter": "helloasso_api.export",
+    "ExportStats": "helloasso_api.export",
+    "Form": "helloasso_api.models",
+    "GetterSetterTokenStore": "helloasso_api.token_store",
+    "HaApiV5": "helloasso_api.apiv5client",
+    "Item": "helloasso_api.models",
+    "MemoryTokenStore": "helloasso_api.token_store",
+    "MetricsRegistry": "helloasso_api.metrics",
+    "Notification": "helloasso_api.notifications",
+    "NotificationReceiver": "helloasso_api.notifications",
+    "Order": "helloasso_api.models",
+    "OrganizationClient": "helloasso_api.apiv5client",
+    "Organization": "helloasso_api.models",
+    "Payer": "helloasso_api.models",
+    "Payment": "helloasso_api.models",
+    "RateLimiter": "helloasso_api.ratelimit",
+    "RequestCoalescer": "helloasso_api.coalescing",
+    "ResponseCache": "helloasso_api.http_cache",
+    "RetryBudget": "helloasso_api.retry",
+    "RetryPolicy": "helloasso_api.retry",
+    "SQLiteTokenStore": "helloasso_api.token_store",
+    "TokenPair": "helloasso_api.token_store",
+    "TokenStore": "helloasso_api.token_store",
+}
+__all__ = sorted(_EXPORTS)
 
 """
 Manage all calls to Helloasso api (including authentication calls).
@@ -29,7 +65,19 @@ api = ApiV5(
 """
 
 
-class HaApiV5(ApiV5Client):
-    def __init__(self, *args, **kwargs):
-        super(HaApiV5, self).__init__(*args, **kwargs)
-        self.authorization = AuthorizationApi(self)
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+if sys.version_info < (3, 7):
+    # modules have no __getattr__ (PEP 562) before python 3.7: import every name now
+    for _name in _EXPORTS:
+        __getattr__(_name)
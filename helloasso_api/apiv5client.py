@@ -1,9 +1,21 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
 from typing import Callable
 
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from typing_extensions import Literal
 
+from helloasso_api.batch import call_many, call_many_as_completed
+from helloasso_api.cache import TTLCache
+from helloasso_api.circuit_breaker import CircuitBreaker
+from helloasso_api.coalescing import RequestCoalescer
+from helloasso_api.client.authorization import AuthorizationApi
+from helloasso_api.codec import JsonCodec, get_codec
 from helloasso_api.exceptions import (
     ApiV5BadRequest,
     ApiV5Conflict,
@@ -17,8 +29,28 @@ from helloasso_api.exceptions import (
     ApiV5Timeout,
     ApiV5Unauthorized,
 )
-from helloasso_api.oauth2 import OAuth2Api
-from helloasso_api.utils import get_log
+from helloasso_api.http_cache import ResponseCache
+from helloasso_api.metrics import (
+    MetricsRegistry,
+    register_circuit_breaker_gauges,
+    register_coalescer_gauges,
+    register_pool_gauges,
+)
+from helloasso_api.oauth2 import OAuth2Api, OrganizationOAuth2Api
+from helloasso_api.pagination import Paginator
+from helloasso_api.ratelimit import RateLimiter
+from helloasso_api.retry import RetryPolicy
+from helloasso_api.streaming import JsonArrayStream
+from helloasso_api.token_store import TokenStore
+from helloasso_api.utils import get_base_url, get_log
+
+_DEFAULT_CODEC = JsonCodec()
+
+
+@contextmanager
+def _no_lock():
+    # contextlib.nullcontext only exists from python 3.7
+    yield
 
 
 class ApiV5Client(object):
@@ -40,6 +72,29 @@ class ApiV5Client(object):
         oauth2_token_setter: Callable[
             [Literal["access_token", "refresh_token"], str, str], None
         ] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        token_renewal_margin: float = 60,
+        refresh_token_lifetime: float = 30 * 24 * 3600,
+        token_cache_ttl: float = None,
+        rate_limiter: RateLimiter = None,
+        retry_policy: RetryPolicy = None,
+        response_cache: ResponseCache = None,
+        json_codec=None,
+        metrics: MetricsRegistry = None,
+        lazy_auth: bool = False,
+        organization_token_getter: Callable[
+            [Literal["access_token", "refresh_token"], str], str
+        ] = None,
+        organization_token_setter: Callable[
+            [Literal["access_token", "refresh_token"], str, str], None
+        ] = None,
+        max_organizations: int = None,
+        token_store: TokenStore = None,
+        coalescer: RequestCoalescer = None,
+        circuit_breaker: CircuitBreaker = None,
     ):
         """
         :param api_base: url of api, example: :api.helloasso-dev.com
@@ -51,11 +106,65 @@ class ApiV5Client(object):
         :param refresh_token: (optional) The OAuth refresh token if exist
         :param oauth2_token_getter: custom method to retrieve tokens (useful to share tokens across multiple instances).
         :param oauth2_token_setter: custom method to store tokens (useful to share tokens across multiple instances).
+        :param pool_connections: (optional) number of connection pools to cache (one per host)
+        :param pool_maxsize: (optional) maximum number of connections kept open per host
+        :param pool_block: (optional) block when all pooled connections of a host are in use
+            instead of opening extra ones
+        :param keep_alive: (optional) keep connections open between requests
+        :param token_renewal_margin: (optional) renew the access token this many seconds
+            before it expires
+        :param refresh_token_lifetime: (optional) lifetime of refresh tokens in seconds,
+            an expired refresh token is not used and new tokens are requested instead
+        :param token_cache_ttl: (optional) cache the results of oauth2_token_getter locally
+            for this many seconds (access tokens never past their renewal time). The cache is
+            updated by the setter and cleared when tokens are renewed. With a token_store,
+            token_renewal_margin by default, 0 to read the store on every token read.
+        :param retry_policy: (optional) RetryPolicy retrying failed calls
+        :param rate_limiter: (optional) RateLimiter throttling api calls, may be shared
+            between clients
+        :param response_cache: (optional) ResponseCache serving and revalidating GET
+            responses, may be shared between clients
+        :param json_codec: (optional) JsonCodec encoding json payloads and decoding responses,
+            "auto" to use orjson when installed, the json module otherwise. By default
+            bodies are handled by requests.
+        :param metrics: (optional) MetricsRegistry recording latencies, statuses, errors,
+            token events and connection pool usage, may be shared between clients
+        :param lazy_auth: (optional) do not request tokens when the client is created but on
+            the first call, so that building a client costs no network round trip
+        :param organization_token_getter: (optional) custom method to retrieve the tokens of
+            the organizations used with for_organization, called with the token key and the
+            organization slug
+        :param organization_token_setter: (optional) custom method to store the tokens of
+            the organizations, called with the token key, the organization slug and the token
+        :param max_organizations: (optional) number of organization clients kept in memory
+            by for_organization, the least recently used is closed and dropped first. 1024 by
+            default when an organization_token_getter or a token_store can give their tokens
+            back, unbounded otherwise: the clients then hold the only copy of the tokens
+        :param token_store: (optional) TokenStore sharing the tokens between clients and
+            processes, instead of oauth2_token_getter and oauth2_token_setter. Token pairs are
+            written at once and renewals hold the refresh lock of the store, so that only one
+            process refreshes. Also used for the tokens of the organizations, by slug.
+        :param coalescer: (optional) RequestCoalescer making identical GET requests made at
+            the same time share a single api request, may be shared between clients
+        :param circuit_breaker: (optional) CircuitBreaker failing calls fast with
+            ApiV5CircuitOpen on the routes the api fails to answer, may be shared between
+            clients
         """
         self.log = get_log("apiv5.apiv5client")
 
         self.api_base = api_base
         self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self.coalescer = coalescer
+        self.circuit_breaker = circuit_breaker
+        self.json_codec = get_codec(json_codec)
+        self.metrics = metrics
 
         self.client_id = client_id
         self.client_secret = client_secret
@@ -64,8 +173,8 @@ class ApiV5Client(object):
             raise ApiV5NoConfig("Missing client_id or client_secret.")
         if not self.api_base:
             raise ApiV5NoConfig("Missing Api Base.")
+        self.base_url = get_base_url(self.api_base)
 
-        self.auth = None
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.oauth2_token_getter = oauth2_token_getter
@@ -75,6 +184,33 @@ class ApiV5Client(object):
             raise ApiV5NoConfig(
                 "You must either specify both the oauth2 token setter and getter, or neither."
             )
+        self.token_store = token_store
+        if token_store is not None and (
+            oauth2_token_getter is not None or organization_token_getter is not None
+        ):
+            raise ApiV5NoConfig(
+                "You must either specify a token store or token getters and setters."
+            )
+
+        self.organization_token_getter = organization_token_getter
+        self.organization_token_setter = organization_token_setter
+        if (organization_token_getter is None) != (organization_token_setter is None):
+            raise ApiV5NoConfig(
+                "You must either specify both the organization token setter and getter, or neither."
+            )
+        self._organizations = self._organization_cache(max_organizations)
+        self._organizations_lock = threading.Lock()
+
+        self._token_lock = threading.Lock()
+        self._token_refresher = None
+        self._token_refresher_stop = threading.Event()
+        self.session = self.build_session()
+        if self.metrics is not None:
+            register_pool_gauges(self.metrics, self.session)
+            if self.coalescer is not None:
+                register_coalescer_gauges(self.metrics, self.coalescer)
+            if self.circuit_breaker is not None:
+                register_circuit_breaker_gauges(self.metrics, self.circuit_breaker)
 
         self.oauth = OAuth2Api(
             api_base=self.api_base,
@@ -85,10 +221,115 @@ class ApiV5Client(object):
             refresh_token=self.refresh_token,
             oauth2_token_getter=self.oauth2_token_getter,
             oauth2_token_setter=self.oauth2_token_setter,
+            session=self.session,
+            token_renewal_margin=token_renewal_margin,
+            refresh_token_lifetime=refresh_token_lifetime,
+            token_cache_ttl=token_cache_ttl,
+            metrics=self.metrics,
+            token_store=self.token_store,
         )
 
-        if not self.oauth.access_token:
-            self.oauth.get_token()
+        self._authenticated = False
+        if not lazy_auth:
+            self.authenticate()
+
+    def _organization_cache(self, max_organizations: int = None) -> TTLCache:
+        """Return the cache of the organization clients, closing the ones it drops."""
+        reloadable = (
+            self.organization_token_getter is not None or self.token_store is not None
+        )
+        if max_organizations is not None and not reloadable:
+            raise ApiV5NoConfig(
+                "max_organizations requires an organization_token_getter or a token_store, "
+                "the tokens of the dropped organization clients would be lost."
+            )
+        if max_organizations is None:
+            max_organizations = 1024 if reloadable else float("inf")
+        return TTLCache(
+            float("inf"),
+            max_organizations,
+            on_evict=lambda organization_slug, client: client.close(),
+        )
+
+    def authenticate(self) -> None:
+        """Request tokens unless there already are some (given, or shared through the getter).
+        Called on the first call when lazy_auth is set. Afterwards tokens are renewed on
+        expiry or on 401 responses.
+        """
+        with self._token_lock:
+            if not self._authenticated:
+                if not self.oauth.access_token:
+                    with self.refresh_lock():
+                        # another process may have got tokens while we waited for the lock
+                        self.oauth.invalidate_token_cache()
+                        if not self.oauth.access_token:
+                            self.oauth.get_token()
+                self._authenticated = True
+
+    def build_session(self) -> requests.Session:
+        """Return the http session shared by all api and authentication calls.
+        Connections are pooled per host and reused as long as keep_alive is enabled.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def close(self) -> None:
+        """Stop the token refresher if started and close all pooled connections."""
+        self.stop_token_refresher()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def for_organization(
+        self,
+        organization_slug: str,
+        access_token: str = None,
+        refresh_token: str = None,
+    ) -> "OrganizationClient":
+        """Return a client calling the api on behalf of an organization, with the tokens it
+        granted to the application (see AuthorizationApi.exchange_authorization_token).
+        All organization clients share the connection pool, rate limiter, retry policy,
+        response cache and metrics of this client. At most max_organizations of them are kept,
+        the dropped ones are closed and their tokens read again through the
+        organization_token_getter or the token_store.
+        :param organization_slug: slug of the organization
+        :param access_token: (optional) access token of the organization, stored with
+            organization_token_setter if any
+        :param refresh_token: (optional) refresh token of the organization
+        """
+        with self._organizations_lock:
+            client = self._organizations.get(organization_slug)
+            if client is None:
+                if (
+                    access_token is None
+                    and refresh_token is None
+                    and self.organization_token_getter is None
+                    and self.token_store is None
+                ):
+                    raise ApiV5NoConfig(
+                        f"No tokens for organization {organization_slug}: pass its tokens, "
+                        "an organization_token_getter or a token_store."
+                    )
+                client = OrganizationClient(self, organization_slug)
+                self._organizations.set(organization_slug, client)
+        if access_token is not None:
+            client.set_access_token(access_token)
+        if refresh_token is not None:
+            client.set_refresh_token(refresh_token)
+        return client
 
     def set_access_token(self, access_token: str):
         self.access_token = access_token
@@ -113,75 +354,150 @@ class ApiV5Client(object):
         include_auth: bool,
     ) -> (str, dict, dict, dict, dict):
         """Build all the elements of the the request."""
-        url = f"https://{self.api_base}{sub_path}"
+        url = f"{self.base_url}{sub_path}"
         self.log.debug(f"Prepare Request : {url}")
         data = data or {}
         json = json or {}
         params = params or {}
         headers = headers or {}
-        self.auth = (
+        auth = (
             {"Authorization": f"Bearer {self.oauth.access_token}"}
             if include_auth
             else {}
         )
-        all_headers = {**self.header(), **self.auth, **headers}
+        all_headers = {**self.header(), **auth, **headers}
         return url, all_headers, data, json, params
 
     def execute_request(
-        self, url: str, method: str, headers: dict, data: dict, json: dict, params: dict
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool = False,
     ) -> Response:
-        """Execute request based on method name. Map Api Error to python Exceptions."""
+        """Execute request based on method name. Map Api Error to python Exceptions.
+        Raise ApiV5CircuitOpen at once while the circuit_breaker is open for the route.
+        """
+        if self.circuit_breaker is None:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+            return self._send_request(url, method, headers, data, json, params, stream)
+        permit = self.circuit_breaker.acquire(url)
+        sent = time.monotonic()
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+                sent = time.monotonic()
+            result = self._send_request(
+                url, method, headers, data, json, params, stream
+            )
+        except BaseException as e:
+            self.circuit_breaker.record(permit, time.monotonic() - sent, e)
+            raise
+        self.circuit_breaker.record(permit, time.monotonic() - sent)
+        return result
+
+    def _session_request(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool,
+    ) -> Response:
+        """Send the request with the session method of the http method."""
+        if method == "POST":
+            return self.session.post(
+                url,
+                headers=headers,
+                params=params,
+                data=data,
+                json=json,
+                timeout=self.timeout,
+            )
+        elif method == "GET":
+            return self.session.get(
+                url,
+                headers=headers,
+                params=params,
+                data=data,
+                timeout=self.timeout,
+                stream=stream,
+            )
+        elif method == "PATCH":
+            return self.session.patch(
+                url,
+                headers=headers,
+                data=data,
+                timeout=self.timeout,
+            )
+        elif method == "PUT":
+            return self.session.put(
+                url,
+                headers=headers,
+                data=data,
+                timeout=self.timeout,
+            )
+        elif method == "DELETE":
+            return self.session.delete(
+                url,
+                headers=headers,
+                data=data,
+                timeout=self.timeout,
+            )
+        else:
+            raise ApiV5IncorrectMethod(
+                "Incorrect Method: only POST,GET,PATCH,PUT,DELETE authorized."
+            )
+
+    def _send_request(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool = False,
+    ) -> Response:
+        """Send the request (rate limiter already acquired) and check the response."""
+        if method == "POST" and json and not data:
+            data, json = self.encode_json(json)
+        started = self.metrics.request_started() if self.metrics is not None else None
+        result = None
         try:
             self.log.debug(f"Execute Request : {method} : {url}")
-            if method == "POST":
-                result = requests.post(
-                    url,
-                    headers=headers,
-                    params=params,
-                    data=data,
-                    json=json,
-                    timeout=self.timeout,
-                )
-            elif method == "GET":
-                result = requests.get(
-                    url,
-                    headers=headers,
-                    params=params,
-                    data=data,
-                    timeout=self.timeout,
-                )
-            elif method == "PATCH":
-                result = requests.patch(
-                    url,
-                    headers=headers,
-                    data=data,
-                    timeout=self.timeout,
-                )
-            elif method == "PUT":
-                result = requests.put(
-                    url,
-                    headers=headers,
-                    data=data,
-                    timeout=self.timeout,
-                )
-            elif method == "DELETE":
-                result = requests.delete(
-                    url,
-                    headers=headers,
-                    data=data,
-                    timeout=self.timeout,
-                )
-            else:
-                raise ApiV5IncorrectMethod(
-                    "Incorrect Method: only POST,GET,PATCH,PUT,DELETE authorized."
-                )
+            result = self._session_request(
+                url, method, headers, data, json, params, stream
+            )
+            if stream and result.status_code >= 400:
+                # error responses are not streamed: read the body for the exception
+                # (and the 401 replay) and give the connection back to the pool
+                result.content
+                result.close()
         except requests.exceptions.Timeout:
             raise ApiV5Timeout(f"{url} timeout : {str(self.timeout)} sec")
         except requests.exceptions.ConnectionError as e:
             raise ApiV5ConnectionError(
                 f"Failed to establish a new connection: Name or service not known : {url}"
             )
+        finally:
+            if started is not None:
+                status = result.status_code if result is not None else None
+                self.metrics.request_finished(method, url, status, started)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(url, result)
+        return self.check_response(result)
 
+    @staticmethod
+    def check_response(result):
+        """Map Api error status codes to python Exceptions, return the result otherwise."""
         if result.status_code in (404, 410):
             raise ApiV5NotFound(result)
         elif result.status_code == 401:
@@ -199,6 +515,14 @@ class ApiV5Client(object):
 
         return result
 
+    @staticmethod
+    def map_result(result, callback: Callable):
+        """Apply callback to the result of a call.
+        Resource classes use it so that the same code works with ApiV5Client and
+        AsyncApiV5Client (which returns awaitables).
+        """
+        return callback(result)
+
     def call(
         self,
         sub_path: str,
@@ -208,24 +532,347 @@ class ApiV5Client(object):
         json: dict = None,
         headers: dict = None,
         include_auth: bool = True,
+        stream: bool = False,
     ) -> Response:
-        """Manage all api calls. It also handle re-authentication if necessary."""
+        """Manage all api calls. It also handle re-authentication if necessary:
+        on a 401 response tokens are renewed once and the request is replayed.
+        Failed calls are retried according to retry_policy if any.
+        """
         self.log.debug(f"Call : {method} : {sub_path}")
-        url, headers, data, json, params = self.prepare_request(
-            sub_path, headers, data, json, params, include_auth
+        send = partial(
+            self._send,
+            sub_path,
+            params,
+            method,
+            data,
+            json,
+            headers,
+            include_auth,
+            stream,
         )
+        if self.retry_policy is not None:
+            send = partial(self.retry_policy.run, send, method, sub_path)
+        if self.metrics is not None:
+            return self.metrics.time_call(send, method, sub_path)
+        return send()
 
+    def _send(
+        self,
+        sub_path: str,
+        params: dict,
+        method: str,
+        data: dict,
+        json: dict,
+        headers: dict,
+        include_auth: bool,
+        stream: bool,
+    ) -> Response:
+        if include_auth:
+            if not self._authenticated:
+                self.authenticate()
+            self.renew_expiring_tokens()
+        url, all_headers, data_, json_, params_ = self.prepare_request(
+            sub_path, headers, data, json, params, include_auth
+        )
         try:
-            result = self.execute_request(url, method, headers, data, json, params)
-            return result
+            return self._execute(
+                url, method, all_headers, data_, json_, params_, stream
+            )
         except ApiV5Unauthorized:
             self.log.warning("401 Unauthorized response to API request.")
-            if self.oauth.access_token:
+            self.renew_tokens(all_headers.get("Authorization"))
+
+        url, all_headers, data_, json_, params_ = self.prepare_request(
+            sub_path, headers, data, json, params, include_auth
+        )
+        return self._execute(url, method, all_headers, data_, json_, params_, stream)
+
+    def encode_json(self, json) -> (bytes, dict):
+        """Return the (data, json) to send for a json payload: the payload serialized by
+        json_codec, or left to requests when there is no codec. bytes and str payloads are
+        already serialized and sent as they are.
+        """
+        if self.json_codec is None and not isinstance(json, (bytes, str)):
+            return None, json
+        return (self.json_codec or _DEFAULT_CODEC).encode(json), None
+
+    def _execute(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool,
+    ) -> Response:
+        """Execute the request through coalescer and response_cache when it is a GET, and make
+        the response decode with json_codec.
+        """
+        if method != "GET" or stream:
+            result = self.execute_request(
+                url, method, headers, data, json, params, stream
+            )
+        elif self.coalescer is not None:
+            result = self.coalescer.run(
+                self.coalescer.key(url, params, headers.get("Authorization")),
+                partial(self._execute_get, url, headers, data, json, params),
+                self._copy_response,
+            )
+        else:
+            result = self._execute_get(url, headers, data, json, params)
+        if self.json_codec is not None and not stream:
+            self.json_codec.decode_response(result)
+        return result
+
+    def _execute_get(
+        self, url: str, headers: dict, data: dict, json: dict, params: dict
+    ) -> Response:
+        if self.response_cache is None:
+            return self.execute_request(url, "GET", headers, data, json, params, False)
+        return self._execute_cached(url, "GET", headers, data, json, params)
+
+    @staticmethod
+    def _copy_response(result: Response) -> Response:
+        """Return a copy of a response for a coalesced request, sharing the body bytes."""
+        response = Response()
+        response.status_code = result.status_code
+        response.headers = CaseInsensitiveDict(result.headers)
+        response._content = result.content
+        response.url = result.url
+        response.encoding = result.encoding
+        response.reason = result.reason
+        response.request = result.request
+        response.elapsed = result.elapsed
+        return response
+
+    def _execute_cached(
+        self, url: str, method: str, headers: dict, data: dict, json: dict, params: dict
+    ) -> Response:
+        cache = self.response_cache
+        key = cache.key(url, params, headers.get("Authorization"))
+        entry = cache.get(key)
+        if entry is not None:
+            if entry.fresh:
+                return entry.to_response()
+            headers = {**headers, **entry.validators()}
+        result = self.execute_request(url, method, headers, data, json, params)
+        if entry is not None and result.status_code == 304:
+            return cache.revalidated(entry, result).to_response()
+        cache.store(key, url, result)
+        return result
+
+    def paginate(
+        self,
+        sub_path: str,
+        params: dict = None,
+        page_size: int = 20,
+        prefetch: bool = False,
+        max_pages_in_memory: int = 2,
+        continuation_token: str = None,
+    ) -> Paginator:
+        """Return a Paginator yielding the items of a paginated list endpoint.
+        See helloasso_api.pagination.Paginator for the parameters.
+        """
+        return Paginator(
+            self,
+            sub_path,
+            params=params,
+            page_size=page_size,
+            prefetch=prefetch,
+            max_pages_in_memory=max_pages_in_memory,
+            continuation_token=continuation_token,
+        )
+
+    def call_many(self, calls, max_concurrency: int = None) -> list:
+        """Run calls concurrently from a pool of threads sharing this client (auth and
+        connection pool) and return a CallResult for each of them, in the order of calls.
+        A failing call does not stop the others: its exception is set in CallResult.error.
+        :param calls: iterable of sub_path or of dict of call keyword arguments,
+            example: [{"sub_path": "/v5/forms", "params": {"pageSize": 10}}, "/v5/users/me"]
+        :param max_concurrency: (optional) number of threads, pool_maxsize by default
+        """
+        return call_many(self, calls, max_concurrency or self.pool_maxsize)
+
+    def call_many_as_completed(self, calls, max_concurrency: int = None):
+        """Same as call_many but yield each CallResult as soon as the call completes."""
+        return call_many_as_completed(self, calls, max_concurrency or self.pool_maxsize)
+
+    def stream(
+        self,
+        sub_path: str,
+        params: dict = None,
+        key: str = "data",
+        chunk_size: int = 65536,
+    ) -> JsonArrayStream:
+        """Call a GET endpoint and return a JsonArrayStream decoding the elements of the `key`
+        array of the response as the body arrives, so that memory stays bounded whatever the
+        size of the page. The other members (pagination) are available once the iteration
+        is over.
+        :param chunk_size: number of bytes read at once
+        """
+        result = self.call(sub_path, params=params, stream=True)
+        return JsonArrayStream(
+            result.iter_content(chunk_size),
+            key,
+            close=result.close,
+            encoding=result.encoding or "utf-8",
+        )
+
+    def renew_tokens(self, failed_authorization: str = None) -> None:
+        """Refresh tokens (or get new ones) after an Unauthorized response.
+        Safe to call from several threads, and from several processes sharing a token_store:
+        only one renewal runs at a time, and callers whose failed Authorization header is
+        already outdated return without renewing again.
+        :param failed_authorization: Authorization header of the request that got a 401
+        """
+        with self._token_lock, self.refresh_lock():
+            self.oauth.invalidate_token_cache()
+            access_token = self.oauth.access_token
+            if access_token and f"Bearer {access_token}" != failed_authorization:
+                self.log.info("Access token already renewed")
+                return
+            if access_token:
                 self.log.info("Refreshing access token")
                 self.oauth.refresh_tokens()
             else:
                 self.log.info("Get access token")
                 self.oauth.get_token()
-            return self.call(
-                sub_path, params=params, method=method, data=data, headers=headers
+
+    def refresh_lock(self):
+        """Return the lock to hold while getting or renewing tokens: the refresh lock of the
+        token store, shared with the other processes using it, or a no-op without token store.
+        """
+        if self.token_store is None:
+            return _no_lock()
+        return self.token_store.refresh_lock(self.oauth.token_store_key)
+
+    def renew_expiring_tokens(self) -> None:
+        """Renew the access token if it expires within token_renewal_margin seconds."""
+        if self.oauth.access_token_needs_renewal():
+            self.log.info("Access token expires soon")
+            self.renew_tokens(f"Bearer {self.oauth.access_token}")
+
+    def start_token_refresher(self, min_interval: float = 5) -> None:
+        """Renew the access token from a background thread shortly before it expires,
+        so that calls never wait for a renewal. Stopped by stop_token_refresher or close.
+        :param min_interval: minimum number of seconds between two checks
+        """
+        if self._token_refresher is not None:
+            return
+        self._token_refresher_stop.clear()
+        self._token_refresher = threading.Thread(
+            target=self._run_token_refresher,
+            args=(min_interval,),
+            name="helloasso-token-refresher",
+            daemon=True,
+        )
+        self._token_refresher.start()
+
+    def stop_token_refresher(self) -> None:
+        if self._token_refresher is None:
+            return
+        self._token_refresher_stop.set()
+        self._token_refresher.join()
+        self._token_refresher = None
+
+    def _run_token_refresher(self, min_interval: float) -> None:
+        while True:
+            try:
+                self.renew_expiring_tokens()
+            except Exception as e:
+                self.log.warning(f"Token refresher : renewal failed : {str(e)}")
+            expires_at = self.oauth.access_token_expiry()
+            if expires_at is None:
+                delay = min_interval
+            else:
+                delay = expires_at - self.oauth.token_renewal_margin - time.time()
+            if self._token_refresher_stop.wait(max(delay, min_interval)):
+                return
+
+
+class OrganizationClient(ApiV5Client):
+    """Client calling the api on behalf of one organization. Built by
+    ApiV5Client.for_organization: everything but the token state is shared with the partner
+    client, so that the number of connections does not grow with the number of organizations.
+    """
+
+    _SHARED = (
+        "api_base",
+        "base_url",
+        "timeout",
+        "pool_connections",
+        "pool_maxsize",
+        "pool_block",
+        "keep_alive",
+        "rate_limiter",
+        "retry_policy",
+        "response_cache",
+        "coalescer",
+        "circuit_breaker",
+        "json_codec",
+        "metrics",
+        "client_id",
+        "client_secret",
+        "session",
+        "token_store",
+    )
+
+    def __init__(self, partner: ApiV5Client, organization_slug: str):
+        """
+        :param partner: client of the partner application
+        :param organization_slug: slug of the organization
+        """
+        self.log = get_log("apiv5.organization_client")
+        for name in self._SHARED:
+            setattr(self, name, getattr(partner, name))
+        self.partner = partner
+        self.organization_slug = organization_slug
+        self.access_token = None
+        self.refresh_token = None
+
+        getter = partner.organization_token_getter
+        setter = partner.organization_token_setter
+        self.oauth2_token_getter = self.oauth2_token_setter = None
+        if getter is not None:
+            self.oauth2_token_getter = lambda token_key, client_id: getter(
+                token_key, organization_slug
+            )
+            self.oauth2_token_setter = lambda token_key, client_id, token: setter(
+                token_key, organization_slug, token
             )
+
+        self._token_lock = threading.Lock()
+        self._token_refresher = None
+        self._token_refresher_stop = threading.Event()
+        token_cache = partner.oauth.token_cache
+        self.oauth = OrganizationOAuth2Api(
+            organization_slug,
+            api_base=self.api_base,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            timeout=self.timeout,
+            oauth2_token_getter=self.oauth2_token_getter,
+            oauth2_token_setter=self.oauth2_token_setter,
+            session=self.session,
+            token_renewal_margin=partner.oauth.token_renewal_margin,
+            refresh_token_lifetime=partner.oauth.refresh_token_lifetime,
+            token_cache_ttl=token_cache.ttl if token_cache is not None else None,
+            metrics=self.metrics,
+            token_store=self.token_store,
+        )
+        # organization tokens come from the authorization code flow, not from get_token
+        self._authenticated = True
+
+    def for_organization(self, *args, **kwargs) -> "OrganizationClient":
+        return self.partner.for_organization(*args, **kwargs)
+
+    def close(self) -> None:
+        """Stop the token refresher if started. Connections belong to the partner client."""
+        self.stop_token_refresher()
+
+
+class HaApiV5(ApiV5Client):
+    def __init__(self, *args, **kwargs):
+        super(HaApiV5, self).__init__(*args, **kwargs)
+        self.authorization = AuthorizationApi(self)
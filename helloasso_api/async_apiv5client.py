@@ -0,0 +1,600 @@
+import asyncio
+import time
+from functools import partial
+from typing import Callable
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from helloasso_api.apiv5client import ApiV5Client
+from helloasso_api.async_oauth2 import AsyncOAuth2Api
+from helloasso_api.batch import async_call_many, async_call_many_as_completed
+from helloasso_api.circuit_breaker import CircuitBreaker
+from helloasso_api.client.authorization import AuthorizationApi
+from helloasso_api.coalescing import RequestCoalescer
+from helloasso_api.codec import get_codec
+from helloasso_api.exceptions import (
+    ApiV5ConnectionError,
+    ApiV5IncorrectMethod,
+    ApiV5NoConfig,
+    ApiV5Timeout,
+    ApiV5Unauthorized,
+)
+from helloasso_api.http_cache import CacheEntry, ResponseCache
+from helloasso_api.metrics import (
+    MetricsRegistry,
+    register_circuit_breaker_gauges,
+    register_coalescer_gauges,
+)
+from helloasso_api.pagination import AsyncPaginator
+from helloasso_api.ratelimit import RateLimiter
+from helloasso_api.retry import RetryPolicy
+from helloasso_api.streaming import AsyncJsonArrayStream
+from helloasso_api.utils import get_base_url, get_log
+
+
+class AsyncApiV5Client(object):
+    """Asyncio twin of ApiV5Client: same parameters, same exceptions, awaitable calls.
+    The class must not be used directly but inherited from. See AsyncHaApiV5 in src/__init__.py
+
+    No request is made at instantiation, tokens are fetched on the first call.
+    Token getter and setter may be coroutine functions.
+    """
+
+    def __init__(
+        self,
+        api_base: str,
+        client_id: str,
+        client_secret: str,
+        timeout: int = None,
+        access_token: str = None,
+        refresh_token: str = None,
+        oauth2_token_getter: Callable = None,
+        oauth2_token_setter: Callable = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keep_alive: bool = True,
+        token_renewal_margin: float = 60,
+        refresh_token_lifetime: float = 30 * 24 * 3600,
+        token_cache_ttl: float = None,
+        rate_limiter: RateLimiter = None,
+        retry_policy: RetryPolicy = None,
+        response_cache: ResponseCache = None,
+        json_codec=None,
+        metrics: MetricsRegistry = None,
+        coalescer: RequestCoalescer = None,
+        circuit_breaker: CircuitBreaker = None,
+    ):
+        """
+        :param api_base: url of api, example: :api.helloasso-dev.com
+        :param client_id: client_id for authentication
+        :param client_secret: client_secret for authentication
+        :param timeout: (optional) How long to wait for the server to send
+            data before giving up, as a float
+        :param access_token: (optional) The OAuth access token if exist
+        :param refresh_token: (optional) The OAuth refresh token if exist
+        :param oauth2_token_getter: custom method or coroutine function to retrieve tokens.
+        :param oauth2_token_setter: custom method or coroutine function to store tokens.
+        :param max_connections: (optional) maximum number of concurrent connections
+        :param max_keepalive_connections: (optional) maximum number of idle connections kept open
+        :param keep_alive: (optional) keep connections open between requests
+        :param token_renewal_margin: (optional) renew the access token this many seconds
+            before it expires
+        :param refresh_token_lifetime: (optional) lifetime of refresh tokens in seconds
+        :param token_cache_ttl: (optional) cache the results of oauth2_token_getter locally
+            for this many seconds
+        :param retry_policy: (optional) RetryPolicy retrying failed calls
+        :param rate_limiter: (optional) RateLimiter throttling api calls, may be shared
+        :param response_cache: (optional) ResponseCache serving and revalidating GET responses
+        :param json_codec: (optional) JsonCodec encoding json payloads and decoding responses,
+            "auto" to use orjson when installed
+        :param metrics: (optional) MetricsRegistry recording latencies, statuses, errors
+            and token events, may be shared
+        :param coalescer: (optional) RequestCoalescer making identical GET requests made at
+            the same time share a single api request, may be shared
+        :param circuit_breaker: (optional) CircuitBreaker failing calls fast with
+            ApiV5CircuitOpen on the routes the api fails to answer, may be shared
+        """
+        if httpx is None:
+            raise ApiV5NoConfig(
+                "httpx is required by the async client: pip install helloasso_apiv5[async]"
+            )
+        self.log = get_log("apiv5.async_apiv5client")
+
+        self.api_base = api_base
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keep_alive = keep_alive
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self.coalescer = coalescer
+        self.circuit_breaker = circuit_breaker
+        self.json_codec = get_codec(json_codec)
+        self.metrics = metrics
+        if self.metrics is not None and self.coalescer is not None:
+            register_coalescer_gauges(self.metrics, self.coalescer)
+        if self.metrics is not None and self.circuit_breaker is not None:
+            register_circuit_breaker_gauges(self.metrics, self.circuit_breaker)
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+        if not self.client_id or not self.client_secret:
+            raise ApiV5NoConfig("Missing client_id or client_secret.")
+        if not self.api_base:
+            raise ApiV5NoConfig("Missing Api Base.")
+        self.base_url = get_base_url(self.api_base)
+
+        self.oauth2_token_getter = oauth2_token_getter
+        self.oauth2_token_setter = oauth2_token_setter
+
+        if (oauth2_token_getter is None) != (oauth2_token_setter is None):
+            raise ApiV5NoConfig(
+                "You must either specify both the oauth2 token setter and getter, or neither."
+            )
+
+        self._token_lock = None
+        self._authenticated = False
+        self._token_refresher = None
+        self.session = self.build_session()
+
+        self.oauth = AsyncOAuth2Api(
+            api_base=self.api_base,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            timeout=self.timeout,
+            access_token=access_token,
+            refresh_token=refresh_token,
+            oauth2_token_getter=self.oauth2_token_getter,
+            oauth2_token_setter=self.oauth2_token_setter,
+            session=self.session,
+            token_renewal_margin=token_renewal_margin,
+            refresh_token_lifetime=refresh_token_lifetime,
+            token_cache_ttl=token_cache_ttl,
+            metrics=self.metrics,
+        )
+
+    def build_session(self) -> "httpx.AsyncClient":
+        """Return the http session shared by all api and authentication calls."""
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=(
+                self.max_keepalive_connections if self.keep_alive else 0
+            ),
+        )
+        return httpx.AsyncClient(limits=limits)
+
+    async def close(self) -> None:
+        """Stop the token refresher if started and close all pooled connections."""
+        await self.stop_token_refresher()
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def set_access_token(self, access_token: str):
+        await self.oauth.store_token("access_token", access_token)
+
+    async def set_refresh_token(self, refresh_token: str):
+        await self.oauth.store_token("refresh_token", refresh_token)
+
+    header = staticmethod(ApiV5Client.header)
+    check_response = staticmethod(ApiV5Client.check_response)
+    encode_json = ApiV5Client.encode_json
+
+    @staticmethod
+    def map_result(result, callback: Callable):
+        """Apply callback to the awaited result of a call. See ApiV5Client.map_result."""
+
+        async def _map():
+            return callback(await result)
+
+        return _map()
+
+    async def prepare_request(
+        self,
+        sub_path: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        include_auth: bool,
+    ) -> (str, dict, dict, dict, dict):
+        """Build all the elements of the the request."""
+        url = f"{self.base_url}{sub_path}"
+        self.log.debug(f"Prepare Request : {url}")
+        data = data or {}
+        json = json or {}
+        params = params or {}
+        headers = headers or {}
+        if include_auth:
+            access_token = await self.oauth.load_token("access_token")
+            if not access_token:
+                await self.renew_tokens()
+                access_token = await self.oauth.load_token("access_token")
+            auth = {"Authorization": f"Bearer {access_token}"}
+        else:
+            auth = {}
+        all_headers = {**self.header(), **auth, **headers}
+        return url, all_headers, data, json, params
+
+    async def execute_request(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool = False,
+    ):
+        """Execute request based on method name. Map Api Error to python Exceptions.
+        Raise ApiV5CircuitOpen at once while the circuit_breaker is open for the route.
+        """
+        if method not in ("POST", "GET", "PATCH", "PUT", "DELETE"):
+            raise ApiV5IncorrectMethod(
+                "Incorrect Method: only POST,GET,PATCH,PUT,DELETE authorized."
+            )
+        self.log.debug(f"Execute Request : {method} : {url}")
+        if self.circuit_breaker is None:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(url)
+            return await self._send_request(
+                url, method, headers, data, json, params, stream
+            )
+        permit = self.circuit_breaker.acquire(url)
+        sent = time.monotonic()
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(url)
+                sent = time.monotonic()
+            result = await self._send_request(
+                url, method, headers, data, json, params, stream
+            )
+        except BaseException as e:
+            self.circuit_breaker.record(permit, time.monotonic() - sent, e)
+            raise
+        self.circuit_breaker.record(permit, time.monotonic() - sent)
+        return result
+
+    async def _send_request(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool = False,
+    ):
+        """Send the request (rate limiter already acquired) and check the response."""
+        if method == "POST" and json and not data:
+            data, json = self.encode_json(json)
+        if isinstance(data, bytes):
+            content = {"content": data}
+        elif method == "POST" and not data:
+            content = {"json": json}
+        else:
+            content = {"data": data or None}
+        started = self.metrics.request_started() if self.metrics is not None else None
+        result = None
+        try:
+            request = self.session.build_request(
+                method,
+                url,
+                headers=headers,
+                params=params if method in ("POST", "GET") else None,
+                timeout=self.timeout,
+                **content,
+            )
+            result = await self.session.send(request, stream=stream)
+            if stream and result.status_code >= 400:
+                # error responses are not streamed: read the body for the exception
+                # (and the 401 replay) and give the connection back to the pool
+                await result.aread()
+                await result.aclose()
+        except httpx.TimeoutException:
+            raise ApiV5Timeout(f"{url} timeout : {str(self.timeout)} sec")
+        except httpx.TransportError:
+            raise ApiV5ConnectionError(
+                f"Failed to establish a new connection: Name or service not known : {url}"
+            )
+        finally:
+            if started is not None:
+                status = result.status_code if result is not None else None
+                self.metrics.request_finished(method, url, status, started)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(url, result)
+        return self.check_response(result)
+
+    async def call(
+        self,
+        sub_path: str,
+        params: dict = None,
+        method: str = "GET",
+        data: dict = None,
+        json: dict = None,
+        headers: dict = None,
+        include_auth: bool = True,
+        stream: bool = False,
+    ):
+        """Manage all api calls. It also handle re-authentication if necessary:
+        on a 401 response tokens are renewed once and the request is replayed.
+        Failed calls are retried according to retry_policy if any.
+        """
+        self.log.debug(f"Call : {method} : {sub_path}")
+        send = partial(
+            self._send,
+            sub_path,
+            params,
+            method,
+            data,
+            json,
+            headers,
+            include_auth,
+            stream,
+        )
+        if self.retry_policy is not None:
+            send = partial(self.retry_policy.run_async, send, method, sub_path)
+        if self.metrics is not None:
+            return await self.metrics.time_call_async(send, method, sub_path)
+        return await send()
+
+    async def _send(
+        self,
+        sub_path: str,
+        params: dict,
+        method: str,
+        data: dict,
+        json: dict,
+        headers: dict,
+        include_auth: bool,
+        stream: bool,
+    ):
+        if include_auth:
+            if not self._authenticated:
+                await self.authenticate()
+            await self.renew_expiring_tokens()
+        url, all_headers, data_, json_, params_ = await self.prepare_request(
+            sub_path, headers, data, json, params, include_auth
+        )
+        try:
+            return await self._execute(
+                url, method, all_headers, data_, json_, params_, stream
+            )
+        except ApiV5Unauthorized:
+            self.log.warning("401 Unauthorized response to API request.")
+            await self.renew_tokens(all_headers.get("Authorization"))
+
+        url, all_headers, data_, json_, params_ = await self.prepare_request(
+            sub_path, headers, data, json, params, include_auth
+        )
+        return await self._execute(
+            url, method, all_headers, data_, json_, params_, stream
+        )
+
+    @staticmethod
+    def _cached_response(entry: CacheEntry) -> "httpx.Response":
+        return httpx.Response(
+            entry.status_code,
+            headers=entry.headers,
+            content=entry.content,
+            request=httpx.Request("GET", entry.url),
+        )
+
+    async def _execute(
+        self,
+        url: str,
+        method: str,
+        headers: dict,
+        data: dict,
+        json: dict,
+        params: dict,
+        stream: bool,
+    ):
+        """Execute the request through coalescer and response_cache when it is a GET, and make
+        the response decode with json_codec.
+        """
+        if method != "GET" or stream:
+            result = await self.execute_request(
+                url, method, headers, data, json, params, stream
+            )
+        elif self.coalescer is not None:
+            result = await self.coalescer.run_async(
+                self.coalescer.key(url, params, headers.get("Authorization")),
+                partial(self._execute_get, url, headers, data, json, params),
+                self._copy_response,
+            )
+        else:
+            result = await self._execute_get(url, headers, data, json, params)
+        if self.json_codec is not None and not stream:
+            self.json_codec.decode_response(result)
+        return result
+
+    async def _execute_get(
+        self, url: str, headers: dict, data: dict, json: dict, params: dict
+    ):
+        if self.response_cache is None:
+            return await self.execute_request(
+                url, "GET", headers, data, json, params, False
+            )
+        return await self._execute_cached(url, "GET", headers, data, json, params)
+
+    @staticmethod
+    def _copy_response(result: "httpx.Response") -> "httpx.Response":
+        """Return a copy of a response for a coalesced request, sharing the body bytes."""
+        return httpx.Response(
+            result.status_code,
+            headers=result.headers,
+            content=result.content,
+            request=result.request,
+        )
+
+    async def _execute_cached(
+        self, url: str, method: str, headers: dict, data: dict, json: dict, params: dict
+    ):
+        cache = self.response_cache
+        key = cache.key(url, params, headers.get("Authorization"))
+        entry = cache.get(key)
+        if entry is not None:
+            if entry.fresh:
+                return self._cached_response(entry)
+            headers = {**headers, **entry.validators()}
+        result = await self.execute_request(url, method, headers, data, json, params)
+        if entry is not None and result.status_code == 304:
+            return self._cached_response(cache.revalidated(entry, result))
+        cache.store(key, url, result)
+        return result
+
+    def paginate(
+        self,
+        sub_path: str,
+        params: dict = None,
+        page_size: int = 20,
+        prefetch: bool = False,
+        max_pages_in_memory: int = 2,
+        continuation_token: str = None,
+    ) -> AsyncPaginator:
+        """Return an AsyncPaginator yielding the items of a paginated list endpoint
+        (iterate with `async for`). See helloasso_api.pagination.Paginator for the parameters.
+        """
+        return AsyncPaginator(
+            self,
+            sub_path,
+            params=params,
+            page_size=page_size,
+            prefetch=prefetch,
+            max_pages_in_memory=max_pages_in_memory,
+            continuation_token=continuation_token,
+        )
+
+    async def call_many(self, calls, max_concurrency: int = None) -> list:
+        """Run calls concurrently on the event loop and return a CallResult for each of them,
+        in the order of calls. See ApiV5Client.call_many.
+        :param max_concurrency: (optional) maximum number of calls in flight, max_connections
+            by default
+        """
+        return await async_call_many(
+            self, calls, max_concurrency or self.max_connections
+        )
+
+    def call_many_as_completed(self, calls, max_concurrency: int = None):
+        """Same as call_many but yield each CallResult as soon as the call completes
+        (iterate with `async for`).
+        """
+        return async_call_many_as_completed(
+            self, calls, max_concurrency or self.max_connections
+        )
+
+    async def stream(
+        self,
+        sub_path: str,
+        params: dict = None,
+        key: str = "data",
+        chunk_size: int = 65536,
+    ) -> AsyncJsonArrayStream:
+        """Call a GET endpoint and return an AsyncJsonArrayStream decoding the elements of
+        the `key` array of the response as the body arrives. See ApiV5Client.stream.
+
+        async for order in await api.stream("/v5/organizations/my-asso/orders"):
+            ...
+        """
+        result = await self.call(sub_path, params=params, stream=True)
+        return AsyncJsonArrayStream(
+            result.aiter_bytes(chunk_size),
+            key,
+            close=result.aclose,
+            encoding=result.encoding or "utf-8",
+        )
+
+    async def authenticate(self) -> None:
+        """Request tokens unless there already are some. The async client cannot do it when
+        created, so it always authenticates on the first call.
+        """
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if not self._authenticated:
+                if not await self.oauth.load_token("access_token"):
+                    await self.oauth.get_token()
+                self._authenticated = True
+
+    async def renew_tokens(self, failed_authorization: str = None) -> None:
+        """Refresh tokens (or get new ones). See ApiV5Client.renew_tokens.
+        Concurrent coroutines share a single renewal.
+        """
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            self.oauth.invalidate_token_cache()
+            access_token = await self.oauth.load_token("access_token")
+            if access_token and f"Bearer {access_token}" != failed_authorization:
+                self.log.info("Access token already renewed")
+                return
+            if access_token:
+                self.log.info("Refreshing access token")
+                await self.oauth.refresh_tokens()
+            else:
+                self.log.info("Get access token")
+                await self.oauth.get_token()
+
+    async def renew_expiring_tokens(self) -> None:
+        """Renew the access token if it expires within token_renewal_margin seconds."""
+        # the token requests are sent with, which another client may have renewed already
+        access_token = await self.oauth.load_token("access_token")
+        if self.oauth.access_token_needs_renewal(access_token):
+            self.log.info("Access token expires soon")
+            await self.renew_tokens(f"Bearer {access_token}")
+
+    def start_token_refresher(self, min_interval: float = 5) -> None:
+        """Renew the access token from a background task shortly before it expires.
+        Must be called from the running event loop. See ApiV5Client.start_token_refresher.
+        """
+        if self._token_refresher is None:
+            self._token_refresher = asyncio.ensure_future(
+                self._run_token_refresher(min_interval)
+            )
+
+    async def stop_token_refresher(self) -> None:
+        if self._token_refresher is None:
+            return
+        self._token_refresher.cancel()
+        try:
+            await self._token_refresher
+        except asyncio.CancelledError:
+            pass
+        self._token_refresher = None
+
+    async def _run_token_refresher(self, min_interval: float) -> None:
+        while True:
+            try:
+                await self.renew_expiring_tokens()
+            except Exception as e:
+                self.log.warning(f"Token refresher : renewal failed : {str(e)}")
+            access_token = await self.oauth.load_token("access_token")
+            expires_at = self.oauth.access_token_expiry(access_token)
+            if expires_at is None:
+                delay = min_interval
+            else:
+                delay = expires_at - self.oauth.token_renewal_margin - time.time()
+            await asyncio.sleep(max(delay, min_interval))
+
+
+class AsyncHaApiV5(AsyncApiV5Client):
+    """Asyncio version of HaApiV5 (requires httpx). Every call must be awaited:
+
+    async with AsyncHaApiV5(client_id="XXXX", client_secret="XXXX", api_base="XXXX") as api:
+        response = await api.call("/v5/users/me/organizations")
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncHaApiV5, self).__init__(*args, **kwargs)
+        self.authorization = AuthorizationApi(self)
@@ -0,0 +1,181 @@
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from helloasso_api.exceptions import (
+    ApiV5AuthenticationError,
+    ApiV5ConnectionError,
+    ApiV5NoConfig,
+    ApiV5Timeout,
+    Apiv5ExceptionError,
+)
+from helloasso_api.oauth2 import OAuth2Api, _AccessDenied, parse_token_response
+from helloasso_api.utils import get_log, maybe_await
+
+
+class AsyncOAuth2Api(OAuth2Api):
+    """Handle Authentication logic for AsyncApiV5Client.
+
+    Token getter and setter may be plain functions or coroutine functions. Use load_token and
+    store_token to go through them, the access_token and refresh_token properties only
+    return the local copy of the tokens.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncOAuth2Api, self).__init__(*args, **kwargs)
+        if httpx is None:
+            raise ApiV5NoConfig(
+                "httpx is required by the async client: pip install helloasso_apiv5[async]"
+            )
+        self.log = get_log("apiv5.async_oauth2")
+
+    @property
+    def access_token(self) -> str:
+        return self._access_token
+
+    @access_token.setter
+    def access_token(self, access_token: str):
+        self._access_token = access_token
+
+    @property
+    def refresh_token(self) -> str:
+        return self._refresh_token
+
+    @refresh_token.setter
+    def refresh_token(self, refresh_token: str):
+        self._refresh_token = refresh_token
+
+    async def load_token(self, token_key: str) -> str:
+        """Return a token. If a getter has been provided at instantiation it will be used,
+        else the local copy will be used.
+        """
+        if self.oauth2_token_getter:
+            token = None
+            if self.token_cache is not None:
+                token = self.token_cache.get((token_key, self.client_id))
+            if token is None:
+                token = await maybe_await(
+                    self.oauth2_token_getter(token_key, self.client_id)
+                )
+                self._cache_token(token_key, token)
+            if token:
+                return token
+        return getattr(self, f"_{token_key}")
+
+    async def store_token(self, token_key: str, token: str) -> None:
+        """Set a token. If a setter has been provided at instantiation it will be used."""
+        if self.oauth2_token_setter:
+            await maybe_await(
+                self.oauth2_token_setter(token_key, self.client_id, token)
+            )
+            self._cache_token(token_key, token)
+        setattr(self, f"_{token_key}", token)
+
+    async def token_saver(self, request):
+        """Parse dict response from the token endpoint and store access and refresh tokens."""
+        await self.store_token("access_token", request["access_token"])
+        await self.store_token("refresh_token", request["refresh_token"])
+        self.save_expiry(request)
+
+    async def request_token(self, data: dict, auth=None) -> "httpx.Response":
+        """POST a form to the token endpoint through the shared httpx session.
+        Connection errors and timeouts are mapped to Python exceptions.
+        """
+        try:
+            return await self.session.post(
+                self._get_path(),
+                data=data,
+                headers=self._get_headers(),
+                auth=auth,
+                timeout=self.timeout,
+            )
+        except httpx.TimeoutException:
+            raise ApiV5Timeout(f"{self._get_path()} timeout : {str(self.timeout)} sec")
+        except httpx.TransportError:
+            raise ApiV5ConnectionError(
+                f"Failed to establish a new connection: Name or service not known : {self._get_path()}"
+            )
+
+    async def _post(self, data: dict, auth=None) -> dict:
+        return parse_token_response(await self.request_token(data, auth=auth))
+
+    async def exchange_authorization_code(
+        self, code: str, redirect_url: str, code_verifier: str
+    ) -> "httpx.Response":
+        """Exchange an authorization code for tokens, returning the token endpoint response."""
+        self.log.info("OAUTH2 : Exchange Authorization Code")
+        self.token_event("authorization_code")
+        return await self.request_token(
+            self.authorization_code_body(code, redirect_url, code_verifier)
+        )
+
+    async def get_token(self) -> None:
+        """Authenticate to ApiV5 to get an access and a refresh token.
+        HTTP errors are mapped to Python exceptions.
+        """
+        self.log.info("OAUTH2 : Get Token")
+        self.token_event("fetch")
+        try:
+            result = await self._post(
+                {"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+            )
+        except (
+            ApiV5AuthenticationError,
+            ApiV5ConnectionError,
+            Apiv5ExceptionError,
+            ApiV5Timeout,
+        ):
+            raise
+        except Exception as e:
+            raise Apiv5ExceptionError(f"Error : {str(e)}")
+        await self.token_saver(result)
+
+    async def refresh_tokens(self):
+        """Refresh connection tokens. If tokens are not presents a new token will be requested instead.
+        HTTP errors are mapped to Python exceptions.
+        """
+        self.log.info("OAUTH2 : Refresh Token")
+        refresh_token = await self.load_token("refresh_token")
+        try:
+            if refresh_token is not None and not self.refresh_token_expired():
+                self.token_event("refresh")
+                result = await self._post(
+                    {
+                        "grant_type": "refresh_token",
+                        "client_id": self.client_id,
+                        "client_secret": self.client_secret,
+                        "refresh_token": refresh_token,
+                    }
+                )
+                await self.token_saver(result)
+            else:
+                self.token_event("refresh_skipped")
+                await self.store_token("access_token", None)
+                await self.store_token("refresh_token", None)
+                self.log.warning(
+                    "OAUTH2 : the Refresh Token is empty or expired, reset tokens."
+                )
+        except _AccessDenied:
+            self.token_event("refresh_denied")
+            await self.store_token("access_token", None)
+            await self.store_token("refresh_token", None)
+            self.log.warning(
+                "OAUTH2 : (access_denied) invalid token values, reset tokens"
+            )
+        except (
+            ApiV5AuthenticationError,
+            ApiV5ConnectionError,
+            Apiv5ExceptionError,
+            ApiV5Timeout,
+        ):
+            raise
+        except Exception as e:
+            raise Apiv5ExceptionError(f"OAUTH2 : Error : {str(e)}")
+        finally:
+            if not self._access_token:
+                self.log.info(
+                    "OAUTH2 : Access Token for Refresh Token not exist, requests a new Access Token"
+                )
+                await self.get_token()
@@ -0,0 +1,88 @@
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class CallResult(namedtuple("CallResult", ["index", "request", "response", "error"])):
+    """Outcome of one call of a batch: response is None when the call raised error."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _call_kwargs(request) -> dict:
+    """A batch request is either a sub_path or a dict of call keyword arguments."""
+    if isinstance(request, str):
+        return {"sub_path": request}
+    return request
+
+
+def _run(client, index: int, request) -> CallResult:
+    try:
+        return CallResult(index, request, client.call(**_call_kwargs(request)), None)
+    except Exception as e:
+        return CallResult(index, request, None, e)
+
+
+def call_many_as_completed(client, calls, max_concurrency: int = 8):
+    """Run calls from a pool of max_concurrency threads sharing client, and yield a
+    CallResult for each of them as soon as it completes. A failing call does not stop
+    the others, its exception is reported in CallResult.error.
+    """
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="helloasso-batch"
+    ) as executor:
+        futures = [
+            executor.submit(_run, client, index, request)
+            for index, request in enumerate(calls)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def call_many(client, calls, max_concurrency: int = 8) -> list:
+    """Run calls concurrently and return their CallResult in the order of calls."""
+    results = list(call_many_as_completed(client, calls, max_concurrency))
+    return sorted(results, key=lambda result: result.index)
+
+
+async def _run_async(client, semaphore, index: int, request) -> CallResult:
+    async with semaphore:
+        try:
+            response = await client.call(**_call_kwargs(request))
+            return CallResult(index, request, response, None)
+        except Exception as e:
+            return CallResult(index, request, None, e)
+
+
+async def async_call_many_as_completed(client, calls, max_concurrency: int = 100):
+    """Asyncio version of call_many_as_completed, iterate with `async for`."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        asyncio.ensure_future(_run_async(client, semaphore, index, request))
+        for index, request in enumerate(calls)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def async_call_many(client, calls, max_concurrency: int = 100) -> list:
+    """Asyncio version of call_many."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(
+            _run_async(client, semaphore, index, request)
+            for index, request in enumerate(calls)
+        )
+    )
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class TTLCache(object):
+    """Thread-safe, size-bounded cache whose entries expire after ttl seconds.
+    The least recently used entry is evicted when maxsize is reached.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128, on_evict: Callable = None):
+        """
+        :param ttl: lifetime of the entries in seconds
+        :param maxsize: maximum number of entries
+        :param on_evict: (optional) function called with the key and the value of the
+            entries evicted to respect maxsize
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value of key, default if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                self._entries.pop(key, None)
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Cache value for ttl seconds (the cache ttl by default, capped by it)."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False))
+        if self.on_evict is not None:
+            for evicted_key, (evicted_value, _) in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def invalidate(self, key=None) -> None:
+        """Drop key from the cache, or every entry if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
@@ -0,0 +1,248 @@
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable
+
+from helloasso_api.exceptions import (
+    ApiV5CircuitOpen,
+    ApiV5ConnectionError,
+    ApiV5ServerError,
+    ApiV5Timeout,
+)
+from helloasso_api.metrics import compile_routes, route_template
+from helloasso_api.utils import get_log
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CircuitEvent = namedtuple(
+    "CircuitEvent",
+    ["route", "old_state", "new_state", "failure_rate", "slow_call_rate"],
+)
+CircuitEvent.__doc__ = """Passed to the on_state_change hook when the circuit of a route
+changes state. The rates are the ones of the calls that led to the change."""
+
+
+class _Circuit(object):
+    """State of a route and outcomes of its last calls."""
+
+    __slots__ = ("state", "outcomes", "opened_at", "probes", "generation")
+
+    def __init__(self, window_size: int):
+        self.state = CLOSED
+        # (failed, slow) of the last calls, or of the probes when half open
+        self.outcomes = deque(maxlen=window_size)
+        self.opened_at = 0.0
+        self.probes = 0
+        # bumped on each state change, so that calls started before are not counted
+        self.generation = 0
+
+    def rates(self) -> (float, float):
+        """Return the failure rate and the slow call rate of the recorded calls."""
+        if not self.outcomes:
+            return 0.0, 0.0
+        failed = sum(1 for failure, _ in self.outcomes if failure)
+        slow = sum(1 for _, slowness in self.outcomes if slowness)
+        return failed / len(self.outcomes), slow / len(self.outcomes)
+
+
+class CircuitBreaker(object):
+    """Fail fast while the api is degraded, per route template (as MetricsRegistry.route).
+
+    A route is closed as long as its last calls mostly succeed in time. Once at least
+    minimum_calls were made, it opens when the failure rate or the slow call rate of the
+    last window_size calls reaches its threshold: calls then raise ApiV5CircuitOpen at once,
+    without reaching the api, for open_duration seconds. The route is then half open and
+    lets half_open_calls probe calls through: it closes when they all succeed in time and
+    opens again on the first failed or slow one.
+
+    Failures are the exceptions of failure_on, any other answer of the api (4xx included)
+    counts as a success. May be shared between clients, synchronous or asyncio.
+
+    Example:
+
+    def report(event: CircuitEvent):
+        statsd.gauge(f"helloasso.circuit.{event.route}", event.new_state == OPEN)
+
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, on_state_change=report)
+    api = HaApiV5(..., circuit_breaker=breaker)
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 0.5,
+        slow_call_duration: float = 5,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_duration: float = 30,
+        half_open_calls: int = 3,
+        failure_on: tuple = (ApiV5ServerError, ApiV5Timeout, ApiV5ConnectionError),
+        routes: dict = None,
+        on_state_change: Callable[[CircuitEvent], None] = None,
+        max_routes: int = 1024,
+    ):
+        """
+        :param failure_rate_threshold: ratio of failed calls opening the circuit
+        :param slow_call_rate_threshold: ratio of slow calls opening the circuit
+        :param slow_call_duration: calls taking at least this many seconds are slow,
+            None to ignore durations
+        :param window_size: number of the last calls of a route the rates are computed on
+        :param minimum_calls: number of calls of a route before its rates are considered
+        :param open_duration: seconds during which an open circuit rejects calls
+        :param half_open_calls: number of probe calls let through by a half open circuit
+        :param failure_on: exceptions counting as failures
+        :param routes: (optional) {path regex: replacement} applied before the default
+            route templates, as in MetricsRegistry
+        :param on_state_change: (optional) function called with a CircuitEvent when the
+            circuit of a route changes state
+        :param max_routes: number of routes whose circuits are kept, the oldest closed
+            circuits are dropped beyond it, and size of the cache of path to route template
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.window_size = window_size
+        self.minimum_calls = min(minimum_calls, window_size)
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.failure_on = failure_on
+        self.on_state_change = on_state_change
+        self.routes = compile_routes(routes)
+        self.max_routes = max_routes
+        self.rejected = 0
+        self._route_templates = {}
+        self._circuits = {}
+        self._lock = threading.Lock()
+        self.log = get_log("apiv5.circuit_breaker")
+
+    def route(self, url: str) -> str:
+        """Return the route template of a url or sub path, the same as the metrics."""
+        return route_template(url, self.routes, self._route_templates, self.max_routes)
+
+    def _circuit(self, route: str) -> _Circuit:
+        circuit = self._circuits.get(route)
+        if circuit is None:
+            if len(self._circuits) >= self.max_routes:
+                self._evict()
+            circuit = self._circuits[route] = _Circuit(self.window_size)
+        return circuit
+
+    def _evict(self) -> None:
+        """Drop the oldest closed circuits (the lock being held) to make room for a new
+        route. Open and half open circuits are kept.
+        """
+        excess = len(self._circuits) - self.max_routes + 1
+        closed = [route for route, c in self._circuits.items() if c.state == CLOSED]
+        for route in closed[:excess]:
+            del self._circuits[route]
+
+    def _transition(self, route: str, circuit: _Circuit, state: str) -> CircuitEvent:
+        """Change the state of circuit (the lock being held) and return the event to report."""
+        event = CircuitEvent(route, circuit.state, state, *circuit.rates())
+        circuit.state = state
+        circuit.generation += 1
+        circuit.outcomes.clear()
+        circuit.probes = 0
+        if state == OPEN:
+            circuit.opened_at = time.monotonic()
+        return event
+
+    def _report(self, event: CircuitEvent) -> None:
+        log = self.log.warning if event.new_state == OPEN else self.log.info
+        log(
+            f"Circuit of {event.route} {event.old_state} -> {event.new_state} : "
+            f"{event.failure_rate:.0%} failed, {event.slow_call_rate:.0%} slow"
+        )
+        if self.on_state_change is not None:
+            self.on_state_change(event)
+
+    def acquire(self, url: str) -> tuple:
+        """Return the permit of a call to url, to pass to record once it is done.
+        Raise ApiV5CircuitOpen when the circuit of its route is open, or half open with all
+        its probe calls in flight.
+        """
+        route = self.route(url)
+        event = None
+        with self._lock:
+            circuit = self._circuit(route)
+            if circuit.state == OPEN:
+                retry_in = circuit.opened_at + self.open_duration - time.monotonic()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise ApiV5CircuitOpen(
+                        f"Circuit of {route} open, retry in {retry_in:.1f} sec : {url}"
+                    )
+                event = self._transition(route, circuit, HALF_OPEN)
+            if circuit.state == HALF_OPEN:
+                if circuit.probes >= self.half_open_calls:
+                    self.rejected += 1
+                    raise ApiV5CircuitOpen(
+                        f"Circuit of {route} half open, probing : {url}"
+                    )
+                circuit.probes += 1
+            permit = (route, circuit.generation)
+        if event is not None:
+            self._report(event)
+        return permit
+
+    def record(self, permit: tuple, duration: float, error: BaseException = None):
+        """Record the outcome of a call.
+        :param permit: permit returned by acquire
+        :param duration: seconds the api took to answer
+        :param error: (optional) exception raised by the call
+        """
+        route, generation = permit
+        event = None
+        with self._lock:
+            circuit = self._circuits.get(route)
+            if circuit is None or circuit.generation != generation:
+                return  # started before the last state change, or circuit dropped
+            if error is not None and not isinstance(error, Exception):
+                # interrupted or cancelled, the call tells nothing about the api
+                if circuit.state == HALF_OPEN:
+                    circuit.probes -= 1
+                return
+            failed = isinstance(error, self.failure_on)
+            slow = (
+                self.slow_call_duration is not None
+                and duration >= self.slow_call_duration
+            )
+            circuit.outcomes.append((failed, slow))
+            if circuit.state == HALF_OPEN:
+                if failed or slow:
+                    event = self._transition(route, circuit, OPEN)
+                elif len(circuit.outcomes) >= self.half_open_calls:
+                    event = self._transition(route, circuit, CLOSED)
+            elif len(circuit.outcomes) >= self.minimum_calls:
+                failure_rate, slow_call_rate = circuit.rates()
+                if (
+                    failure_rate >= self.failure_rate_threshold
+                    or slow_call_rate >= self.slow_call_rate_threshold
+                ):
+                    event = self._transition(route, circuit, OPEN)
+        if event is not None:
+            self._report(event)
+
+    def state(self, url: str) -> str:
+        """Return the state of the circuit of the route of url (or of a route template)."""
+        with self._lock:
+            circuit = self._circuits.get(self.route(url))
+            return circuit.state if circuit is not None else CLOSED
+
+    def stats(self) -> dict:
+        """Return the number of rejected calls and, per route, the state of its circuit and
+        the rates of its last calls.
+        """
+        with self._lock:
+            routes = {}
+            for route, circuit in self._circuits.items():
+                failure_rate, slow_call_rate = circuit.rates()
+                routes[route] = {
+                    "state": circuit.state,
+                    "calls": len(circuit.outcomes),
+                    "failure_rate": failure_rate,
+                    "slow_call_rate": slow_call_rate,
+                }
+            return {"rejected": self.rejected, "routes": routes}
@@ -75,24 +75,20 @@ class AuthorizationApi(object):
             "expires_in": 1800, # seconds
             "organization_slug": "slug_organization"
         }
+
+        HTTP errors are mapped to Python exceptions as for any Api call.
         """
-        headers = {"content-type": "application/x-www-form-urlencoded"}
-        body = {
-            "client_id": self._client.client_id.replace("-", ""),
-            "client_secret": self._client.client_secret,
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": redirect_url,
-            "code_verifier": code_verifier,
-        }
-        response = self._client.call(
-            "/oauth2/token",
-            method="POST",
-            data=body,
-            headers=headers,
-            include_auth=False,
-        ).json()
+        result = self._client.oauth.exchange_authorization_code(
+            code, redirect_url, code_verifier
+        )
+        return self._client.map_result(result, self._check_token_response)
+
+    def _check_token_response(self, result) -> dict:
+        return self._parse_token_response(self._client.check_response(result))
 
+    @staticmethod
+    def _parse_token_response(result) -> dict:
+        response = result.json()
         return {
             "access_token": response["access_token"],
             "refresh_token": response["refresh_token"],
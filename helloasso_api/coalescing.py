@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from typing import Callable
+
+from helloasso_api.http_cache import ResponseCache
+
+
+class _Flight(object):
+    """A request in flight and the callers waiting for its outcome."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self, done):
+        self.done = done
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer(object):
+    """Single-flight of identical GET requests: while a request is in flight, the same
+    request (url, params and token) made by another thread or coroutine waits for it and
+    shares its outcome instead of reaching the api. Each caller gets its own copy of the
+    response (and decodes its own body); an exception is raised to every caller.
+
+    Nothing is kept once the request completes, so that no stale response is ever served
+    (see ResponseCache for that). May be shared between clients, synchronous or asyncio.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    key = staticmethod(ResponseCache.key)
+
+    def _join(self, key, new_event: Callable) -> (_Flight, bool):
+        """Return the flight of key and whether the caller leads it (makes the request)."""
+        with self._lock:
+            self.requests += 1
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._in_flight[key] = _Flight(new_event())
+            return flight, True
+
+    def _land(self, key, flight: _Flight) -> None:
+        with self._lock:
+            del self._in_flight[key]
+        flight.done.set()
+
+    def run(self, key, send: Callable, copy: Callable):
+        """Return send(), or a copy of the result of the identical request in flight.
+        :param key: request key, see RequestCoalescer.key
+        :param send: function making the request
+        :param copy: function copying a response for a waiting caller
+        """
+        flight, leader = self._join(key, threading.Event)
+        if leader:
+            try:
+                flight.result = send()
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._land(key, flight)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy(flight.result)
+
+    async def run_async(self, key, send: Callable, copy: Callable):
+        """Same as run, send being a coroutine function."""
+        # coroutines of different event loops cannot wait for each other. get_running_loop
+        # is python 3.7+, get_event_loop also returns the running loop in a coroutine
+        get_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+        key = (id(get_loop()), key)
+        flight, leader = self._join(key, asyncio.Event)
+        if leader:
+            try:
+                flight.result = await send()
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._land(key, flight)
+        await flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy(flight.result)
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict:
+        """Return the number of requests, of requests served by another request in flight,
+        and the coalescing rate (coalesced / requests).
+        """
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self),
+            "coalescing_rate": self.coalesced / self.requests if self.requests else 0.0,
+        }
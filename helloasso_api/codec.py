@@ -0,0 +1,73 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from helloasso_api.exceptions import ApiV5NoConfig
+
+
+class JsonCodec(object):
+    """Encode request bodies and decode response bodies with the json module.
+    Subclass it to plug another json library (see OrjsonCodec).
+    """
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def loads(self, content):
+        return json.loads(content)
+
+    def encode(self, body) -> bytes:
+        """Return the bytes of a json body, bytes and str are taken as already serialized."""
+        if isinstance(body, bytes):
+            return body
+        if isinstance(body, str):
+            return body.encode()
+        return self.dumps(body)
+
+    def decode_response(self, result):
+        """Make result.json() decode the body with this codec."""
+        # bind the content, not result: a lambda referencing result from its own attribute
+        # would make a reference cycle, only freed by the garbage collector
+        content = result.content
+        result.json = lambda **kwargs: self.loads(content)
+        return result
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec based on orjson, several times faster than the json module."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ApiV5NoConfig("orjson is not installed: pip install orjson")
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, content):
+        return orjson.loads(content)
+
+
+CODECS = {JsonCodec.name: JsonCodec, OrjsonCodec.name: OrjsonCodec}
+
+
+def get_codec(codec) -> JsonCodec:
+    """Return the codec matching a json_codec setting.
+    :param codec: None (bodies handled by the http library), "auto" (orjson when installed,
+        the json module otherwise), a codec name ("json", "orjson") or a JsonCodec instance
+    """
+    if codec is None or isinstance(codec, JsonCodec):
+        return codec
+    if codec == "auto":
+        return OrjsonCodec() if orjson is not None else JsonCodec()
+    if codec not in CODECS:
+        raise ApiV5NoConfig(
+            f"Unknown json codec {codec}, expected one of {list(CODECS)}"
+        )
+    return CODECS[codec]()
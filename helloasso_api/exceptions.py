@@ -79,3 +79,7 @@ class ApiV5RateLimited(ApiV5Error):
 
 class ApiV5Forbidden(ApiV5Error):
     """403 Forbidden"""
+
+
+class ApiV5CircuitOpen(Exception):
+    """the circuit breaker of the route is open, the request was not sent"""
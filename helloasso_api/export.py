@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+import os
+import time
+
+from helloasso_api.exceptions import Apiv5ValueError
+from helloasso_api.pagination import Paginator
+from helloasso_api.utils import get_log, write_json_atomic
+
+FORMATS = ("ndjson", "csv")
+
+
+class ExportStats(object):
+    """Throughput of an export run (a resumed run only counts its own work)."""
+
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+        self.requests = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "elapsed": self.elapsed,
+            "items_per_second": self.items_per_second,
+            "bytes_per_second": self.bytes_per_second,
+        }
+
+
+def flatten(item: dict, prefix: str = "") -> dict:
+    """Flatten nested objects into dotted keys, lists are kept as json."""
+    flat = {}
+    for key, value in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, list):
+            flat[name] = json.dumps(value, ensure_ascii=False)
+        else:
+            flat[name] = value
+    return flat
+
+
+class Exporter(object):
+    """Export every item of a paginated list endpoint to a NDJSON or CSV file.
+
+    Pages are written as they are fetched. Every checkpoint_every pages, and when a call
+    fails, the file is synced to disk and a checkpoint (continuation token, page index and
+    file offset) is saved. If the run is interrupted, the next run with the same checkpoint
+    truncates the file to the checkpoint and resumes from there. The checkpoint is removed
+    once the export is complete.
+
+    Example:
+
+    exporter = Exporter(api, "orders.csv", format="csv")
+    stats = exporter.export_orders("my-asso")
+    print(stats.items_per_second, stats.bytes_per_second, stats.requests)
+    """
+
+    def __init__(
+        self,
+        client,
+        path: str,
+        format: str = "ndjson",
+        checkpoint_path: str = None,
+        page_size: int = 100,
+        fields: list = None,
+        buffer_size: int = 1024 * 1024,
+        checkpoint_every: int = 10,
+    ):
+        """
+        :param client: ApiV5Client used to make the calls
+        :param path: file the items are written to
+        :param format: "ndjson" (one json object per line) or "csv"
+        :param checkpoint_path: (optional) checkpoint file, path + ".checkpoint" by default
+        :param page_size: number of items per page
+        :param fields: (optional) csv columns, nested fields are dotted (payer.email).
+            By default the fields of the first item.
+        :param buffer_size: size of the write buffer in bytes
+        :param checkpoint_every: number of pages written between two checkpoints, a
+            killed run writes these pages again
+        """
+        if format not in FORMATS:
+            raise Apiv5ValueError(f"format must be one of {FORMATS}, got {format}")
+        self._client = client
+        self.path = path
+        self.format = format
+        self.checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+        self.page_size = page_size
+        self.fields = fields
+        self.buffer_size = buffer_size
+        self.checkpoint_every = max(checkpoint_every, 1)
+        self.stats = None
+        self.log = get_log("apiv5.export")
+
+    def export_orders(self, organization_slug: str, params: dict = None) -> ExportStats:
+        return self.export(f"/v5/organizations/{organization_slug}/orders", params)
+
+    def export_payments(
+        self, organization_slug: str, params: dict = None
+    ) -> ExportStats:
+        return self.export(f"/v5/organizations/{organization_slug}/payments", params)
+
+    def load_checkpoint(self, sub_path: str, params: dict) -> dict:
+        """Return the checkpoint of an interrupted export of sub_path, None otherwise."""
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        if (
+            checkpoint.get("sub_path") != sub_path
+            or checkpoint.get("params") != params
+            or checkpoint.get("format") != self.format
+        ):
+            raise Apiv5ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to another export"
+            )
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: dict) -> None:
+        write_json_atomic(self.checkpoint_path, checkpoint)
+
+    def encode_page(self, items: list, write_header: bool) -> bytes:
+        if self.format == "ndjson":
+            return "".join(
+                json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+                for item in items
+            ).encode()
+        rows = [flatten(item) for item in items]
+        if not rows:
+            return b""
+        if self.fields is None:
+            self.fields = list(rows[0])
+        text = io.StringIO()
+        writer = csv.DictWriter(text, self.fields, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return text.getvalue().encode()
+
+    def sync_checkpoint(self, f, checkpoint: dict) -> None:
+        """Sync the pages written to f to disk, then save the checkpoint following them."""
+        f.flush()
+        os.fsync(f.fileno())
+        self.save_checkpoint(checkpoint)
+
+    def start_checkpoint(self, sub_path: str, params: dict) -> dict:
+        """Return the checkpoint of an interrupted export of sub_path, or a new one."""
+        checkpoint = self.load_checkpoint(sub_path, params)
+        if checkpoint is not None and not os.path.exists(self.path):
+            self.log.warning(f"{self.path} is missing, restarting the export")
+            checkpoint = None
+        if checkpoint is None:
+            return {
+                "sub_path": sub_path,
+                "params": params,
+                "format": self.format,
+                "fields": self.fields,
+                "continuation_token": None,
+                "page_index": 0,
+                "offset": 0,
+                "items": 0,
+            }
+        self.fields = checkpoint["fields"]
+        self.log.info(
+            f"Resuming export of {sub_path} after page {checkpoint['page_index']}"
+        )
+        return checkpoint
+
+    def export(self, sub_path: str, params: dict = None) -> ExportStats:
+        """Export the items of sub_path, resuming an interrupted export if any.
+        :return ExportStats: throughput of this run
+        """
+        params = params or {}
+        checkpoint = self.start_checkpoint(sub_path, params)
+        paginator = Paginator(
+            self._client,
+            sub_path,
+            params=params,
+            page_size=self.page_size,
+            continuation_token=checkpoint["continuation_token"],
+            page_index=(
+                checkpoint["page_index"] + 1 if checkpoint["page_index"] else None
+            ),
+        )
+
+        self.stats = stats = ExportStats()
+        mode = "r+b" if checkpoint["offset"] else "wb"
+        with open(self.path, mode, buffering=self.buffer_size) as f:
+            # drop what was written after the last checkpoint
+            f.truncate(checkpoint["offset"])
+            f.seek(checkpoint["offset"])
+            try:
+                for page in paginator.pages():
+                    stats.requests += 1
+                    self.write_page(f, page, checkpoint)
+                    if stats.requests % self.checkpoint_every == 0:
+                        self.sync_checkpoint(f, checkpoint)
+            except BaseException:
+                # the pages written so far are complete, resume after them
+                self.sync_checkpoint(f, checkpoint)
+                raise
+            f.flush()
+            os.fsync(f.fileno())
+        stats.finished_at = time.monotonic()
+
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass  # finished before its first checkpoint
+        self.log.info(
+            f"Exported {checkpoint['items']} items of {sub_path} to {self.path} "
+            f"({stats.items_per_second:.0f} items/sec, {stats.requests} requests)"
+        )
+        return stats
+
+    def write_page(self, f, page: dict, checkpoint: dict) -> None:
+        """Write the items of page to f and move the (unsaved) checkpoint after them."""
+        items = page.get("data") or []
+        content = self.encode_page(items, write_header=not checkpoint["offset"])
+        f.write(content)
+        self.stats.items += len(items)
+        self.stats.bytes += len(content)
+
+        pagination = page.get("pagination") or {}
+        checkpoint.update(
+            continuation_token=pagination.get("continuationToken"),
+            page_index=pagination.get("pageIndex", checkpoint["page_index"] + 1),
+            offset=checkpoint["offset"] + len(content),
+            items=checkpoint["items"] + len(items),
+            fields=self.fields,
+        )
@@ -0,0 +1,234 @@
+import json
+import threading
+from datetime import datetime, timezone
+
+from helloasso_api.pagination import Paginator
+from helloasso_api.utils import get_log, parse_date, write_json_atomic
+
+
+def get_field(item: dict, path: str):
+    """Return the value of a dotted path (meta.updatedAt) in item, None if missing."""
+    for name in path.split("."):
+        if not isinstance(item, dict):
+            return None
+        item = item.get(name)
+    return item
+
+
+def _timestamp(value: str) -> float:
+    date = parse_date(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+class ChangeFeed(object):
+    """Tail a list endpoint (orders, payments) and yield only new or updated items.
+
+    A watermark keeps the latest date seen and the ids seen at that date. Each poll asks
+    for the items most recently updated first and stops at the first item older than the
+    watermark, so that pages already processed are not transferred again, and skips the
+    items already yielded. The from and to parameters of the api filter on the order or
+    payment date, not on the update date: they cannot be used to skip old updates. Items
+    without date_field cannot be compared to the watermark and are skipped.
+
+    A feed without watermark starts from since: by default "now", the first poll then
+    only records the date of the most recently updated item (one request) and the feed
+    yields the changes made afterwards. Pass a date to also get the changes made since
+    then, or None to page through the whole history of the organization first, which may
+    take thousands of requests on a large one.
+
+    The watermark is saved once a poll is complete, a restarted feed does not rescan
+    history; the items of an interrupted poll are yielded again by the next one.
+
+    The poll interval is halved after a poll returning changes (down to min_interval) and
+    multiplied by backoff after an idle poll (up to max_interval).
+
+    Example:
+
+    feed = ChangeFeed.orders(api, "my-asso", watermark_path="orders.watermark")
+    for order in feed:
+        ...
+    """
+
+    def __init__(
+        self,
+        client,
+        sub_path: str,
+        params: dict = None,
+        watermark_path: str = None,
+        date_field: str = "meta.updatedAt",
+        sort_field: str = "UpdateDate",
+        id_field: str = "id",
+        page_size: int = 100,
+        min_interval: float = 5,
+        max_interval: float = 300,
+        backoff: float = 2,
+        since="now",
+    ):
+        """
+        :param client: ApiV5Client used to make the calls
+        :param sub_path: path of the list endpoint
+        :param params: (optional) query parameters sent with every request
+        :param watermark_path: (optional) json file where the watermark is persisted
+        :param date_field: dotted path of the date of the items the feed follows
+        :param sort_field: value of the sortField parameter matching date_field
+        :param id_field: dotted path of the id of the items
+        :param page_size: number of items per page
+        :param min_interval: shortest delay between two polls in seconds
+        :param max_interval: longest delay between two polls in seconds
+        :param backoff: factor applied to the delay after a poll without changes
+        :param since: where a feed without saved watermark starts: "now", a date (str or
+            datetime) or None for the whole history
+        """
+        self._client = client
+        self.sub_path = sub_path
+        self.params = params or {}
+        self.watermark_path = watermark_path
+        self.date_field = date_field
+        self.sort_field = sort_field
+        self.id_field = id_field
+        self.page_size = page_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.since = since
+        self.interval = min_interval
+        self.polls = 0
+        self.requests = 0
+        self.changes_count = 0
+        self.watermark = self.load_watermark()
+        self._stop = threading.Event()
+        self.log = get_log("apiv5.feed")
+
+    @classmethod
+    def orders(cls, client, organization_slug: str, **kwargs) -> "ChangeFeed":
+        return cls(client, f"/v5/organizations/{organization_slug}/orders", **kwargs)
+
+    @classmethod
+    def payments(cls, client, organization_slug: str, **kwargs) -> "ChangeFeed":
+        return cls(client, f"/v5/organizations/{organization_slug}/payments", **kwargs)
+
+    def load_watermark(self) -> dict:
+        """Return the persisted watermark, an empty one if there is none."""
+        if self.watermark_path is not None:
+            try:
+                with open(self.watermark_path) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                pass
+        return {"date": None, "ids": []}
+
+    def save_watermark(self) -> None:
+        if self.watermark_path is not None:
+            write_json_atomic(self.watermark_path, self.watermark)
+
+    def start_watermark(self) -> dict:
+        """Return the watermark of a feed without one, see since."""
+        if self.since is None:
+            return {"date": None, "ids": []}
+        if self.since != "now":
+            since = self.since
+            return {
+                "date": since if isinstance(since, str) else since.isoformat(),
+                "ids": [],
+            }
+        watermark = None
+        for date, timestamp, item in self._recent_items(None):
+            if watermark is not None and timestamp < _timestamp(watermark["date"]):
+                break
+            watermark = watermark or {"date": date, "ids": []}
+            watermark["ids"].append(get_field(item, self.id_field))
+        # nothing to compare to yet: the changes made from now on
+        return watermark or {"date": datetime.now(timezone.utc).isoformat(), "ids": []}
+
+    def poll_params(self) -> dict:
+        return {**self.params, "sortOrder": "Desc", "sortField": self.sort_field}
+
+    def _recent_items(self, last: float):
+        """Yield the (date, timestamp, item) of the items updated since the timestamp last,
+        most recent first.
+        """
+        paginator = Paginator(
+            self._client,
+            self.sub_path,
+            params=self.poll_params(),
+            page_size=self.page_size,
+        )
+        for page in paginator.pages():
+            self.requests += 1
+            for item in page.get("data") or []:
+                date = get_field(item, self.date_field)
+                if date is None:
+                    continue
+                timestamp = _timestamp(date)
+                if last is not None and timestamp < last:
+                    return  # the following items are older
+                yield date, timestamp, item
+
+    def changes(self):
+        """Poll once and yield the items new or updated since the watermark, most recent
+        first. The watermark is saved once all the items have been consumed.
+        """
+        if self.watermark["date"] is None and self.since is not None:
+            self.watermark = self.start_watermark()
+            self.save_watermark()
+            if self.since == "now":
+                # the first poll only records where the feed starts
+                self.polls += 1
+                self.adapt_interval(0)
+                return
+        last = _timestamp(self.watermark["date"]) if self.watermark["date"] else None
+        seen = set(self.watermark["ids"])
+        watermark = {"date": self.watermark["date"], "ids": list(self.watermark["ids"])}
+        newest = last
+        count = 0
+        for date, timestamp, item in self._recent_items(last):
+            item_id = get_field(item, self.id_field)
+            if newest is None or timestamp > newest:
+                newest = timestamp
+                watermark = {"date": date, "ids": []}
+            if timestamp == newest and item_id not in watermark["ids"]:
+                watermark["ids"].append(item_id)
+            if timestamp == last and item_id in seen:
+                continue
+            count += 1
+            yield item
+        if watermark != self.watermark:
+            self.watermark = watermark
+            self.save_watermark()
+        self.polls += 1
+        self.changes_count += count
+        self.adapt_interval(count)
+
+    def poll(self) -> list:
+        """Poll once and return the new or updated items."""
+        return list(self.changes())
+
+    def adapt_interval(self, count: int) -> float:
+        if count:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    def stop(self) -> None:
+        """Make the iteration return after the current poll."""
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "polls": self.polls,
+            "requests": self.requests,
+            "changes": self.changes_count,
+            "interval": self.interval,
+            "watermark": self.watermark["date"],
+        }
+
+    def __iter__(self):
+        """Yield changes forever, waiting the adaptive interval between polls."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            yield from self.changes()
+            self.log.debug(f"Next poll of {self.sub_path} in {self.interval:.1f} sec")
+            self._stop.wait(self.interval)
@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from urllib.parse import urlsplit
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+
+class CacheEntry(object):
+    """A cached GET response."""
+
+    __slots__ = ("url", "status_code", "headers", "content", "expires_at", "size")
+
+    def __init__(
+        self, url: str, status_code: int, headers: dict, content: bytes, ttl: float
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.headers = dict(headers)
+        self.content = content
+        self.expires_at = time.monotonic() + ttl
+        self.size = len(content) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+    def validators(self) -> dict:
+        """Return the conditional request headers revalidating this entry."""
+        headers = CaseInsensitiveDict(self.headers)
+        validators = {}
+        if headers.get("ETag"):
+            validators["If-None-Match"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = headers["Last-Modified"]
+        return validators
+
+    def to_response(self) -> Response:
+        """Return a new requests Response built from the entry."""
+        response = Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = self.url
+        response.encoding = "utf-8"
+        return response
+
+
+class ResponseCache(object):
+    """In-memory LRU cache of GET responses, bounded by entry count and by bytes.
+
+    Entries are keyed by url, params and a hash of the Authorization header, so that
+    responses are never shared between tokens. Stale entries carrying an ETag or a
+    Last-Modified header are revalidated with a conditional request: a 304 answer refreshes
+    the entry without transferring the body again.
+
+    Example:
+
+    cache = ResponseCache(default_ttl=60, routes={r"/v5/organizations/[^/]+$": 3600})
+    api = HaApiV5(..., response_cache=cache)
+    cache.stats()
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 60,
+        routes: dict = None,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+    ):
+        """
+        :param default_ttl: seconds during which a response is served without revalidation
+        :param routes: (optional) {path regex: ttl} routes with their own ttl, 0 disables
+            caching for the route
+        :param max_entries: maximum number of cached responses
+        :param max_bytes: maximum total size of the cached responses
+        """
+        self.default_ttl = default_ttl
+        self.routes = [
+            (re.compile(pattern), ttl) for pattern, ttl in (routes or {}).items()
+        ]
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl(self, url: str) -> float:
+        path = urlsplit(url).path
+        for pattern, ttl in self.routes:
+            if pattern.match(path):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def key(url: str, params: dict, authorization: str) -> tuple:
+        token_id = sha256((authorization or "").encode()).hexdigest()[:16]
+        return (
+            url,
+            tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+            token_id,
+        )
+
+    def get(self, key) -> CacheEntry:
+        """Return the entry of key, fresh or stale, None if absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+            return entry
+
+    def store(self, key, url: str, result) -> None:
+        """Cache a 200 response unless its route ttl is 0 or it asks not to be stored."""
+        ttl = self.ttl(url)
+        cache_control = result.headers.get("Cache-Control") or ""
+        if result.status_code != 200 or ttl <= 0 or "no-store" in cache_control:
+            return
+        entry = CacheEntry(url, result.status_code, result.headers, result.content, ttl)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def revalidated(self, entry: CacheEntry, result) -> CacheEntry:
+        """Refresh entry after a 304 Not Modified answer."""
+        with self._lock:
+            self.revalidations += 1
+            entry.expires_at = time.monotonic() + self.ttl(entry.url)
+            for name in ("ETag", "Last-Modified"):
+                if result.headers.get(name):
+                    entry.headers[name] = result.headers[name]
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "bytes": self.size,
+        }
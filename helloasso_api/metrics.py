@@ -0,0 +1,428 @@
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable
+from urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# path segments replaced to group calls by route template
+DEFAULT_ROUTES = (
+    (r"/organizations/[^/]+", "/organizations/{organizationSlug}"),
+    (r"/forms/[^/]+/[^/]+", "/forms/{formType}/{formSlug}"),
+    (r"/\d+(?=/|$)", "/{id}"),
+)
+
+
+def compile_routes(routes: dict = None) -> list:
+    """Return the [(regex, replacement)] turning paths into route templates: routes first,
+    then DEFAULT_ROUTES.
+    """
+    return [
+        (re.compile(pattern), template)
+        for pattern, template in list((routes or {}).items()) + list(DEFAULT_ROUTES)
+    ]
+
+
+def route_template(url: str, routes: list, cache: dict, max_routes: int) -> str:
+    """Return the route template of a url or sub path.
+    :param routes: compiled routes, see compile_routes
+    :param cache: {path: template} of the paths already seen, cleared once it holds
+        max_routes paths
+    """
+    path = urlsplit(url).path
+    template = cache.get(path)
+    if template is None:
+        template = path
+        for pattern, replacement in routes:
+            template = pattern.sub(replacement, template)
+        if len(cache) >= max_routes:
+            cache.clear()
+        cache[path] = template
+    return template
+
+
+class Histogram(object):
+    """Count observations per bucket (upper bounds), Prometheus style."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """Return [(upper bound, observations <= bound)], the last bound being +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {_format_bound(bound): n for bound, n in self.cumulative()},
+        }
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    values = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{values}}}" if values else ""
+
+
+class MetricsRegistry(object):
+    """Collect client metrics: latency histograms per method and route template, response
+    and error counters, token events, in-flight requests and pool gauges.
+
+    Clients record nothing when they have no registry, so that metrics cost nothing when
+    disabled. A registry may be shared by several clients.
+
+    Example:
+
+    metrics = MetricsRegistry()
+    api = HaApiV5(..., metrics=metrics)
+    metrics.snapshot()
+    metrics.to_prometheus()  # text exposition format, to serve on /metrics
+    """
+
+    def __init__(
+        self,
+        buckets: tuple = DEFAULT_BUCKETS,
+        routes: dict = None,
+        prefix: str = "helloasso",
+        max_routes: int = 1024,
+    ):
+        """
+        :param buckets: upper bounds of the latency histograms buckets, in seconds
+        :param routes: (optional) {path regex: replacement} applied before the default
+            templates (organization slug, form type and slug, numeric ids)
+        :param prefix: prefix of the metric names
+        :param max_routes: size of the cache of path to route template
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.routes = compile_routes(routes)
+        self.prefix = prefix
+        self.max_routes = max_routes
+        self.call_latency = {}
+        self.request_latency = {}
+        self.responses = Counter()
+        self.errors = Counter()
+        self.token_events = Counter()
+        self.in_flight = 0
+        self._gauges = {}
+        self._route_templates = {}
+        self._lock = threading.Lock()
+
+    def route(self, url: str) -> str:
+        """Return the route template of a url or sub path."""
+        return route_template(url, self.routes, self._route_templates, self.max_routes)
+
+    def _observe(self, histograms: dict, key: tuple, seconds: float) -> None:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def request_started(self) -> float:
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def request_finished(self, method: str, url: str, status, started: float) -> None:
+        """Record an http request (one attempt of a call). status is None on network errors."""
+        seconds = time.perf_counter() - started
+        route = self.route(url)
+        with self._lock:
+            self.in_flight -= 1
+            self._observe(self.request_latency, (method, route), seconds)
+            if status is not None:
+                self.responses[(method, route, status)] += 1
+
+    def record_call(
+        self, method: str, sub_path: str, seconds: float, error=None
+    ) -> None:
+        """Record a call, with its retries and token renewals, and its exception if any."""
+        route = self.route(sub_path)
+        with self._lock:
+            self._observe(self.call_latency, (method, route), seconds)
+            if error is not None:
+                self.errors[(method, route, type(error).__name__)] += 1
+
+    def time_call(self, func: Callable, method: str, sub_path: str):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            self.record_call(method, sub_path, time.perf_counter() - start, e)
+            raise
+        self.record_call(method, sub_path, time.perf_counter() - start)
+        return result
+
+    async def time_call_async(self, func: Callable, method: str, sub_path: str):
+        start = time.perf_counter()
+        try:
+            result = await func()
+        except Exception as e:
+            self.record_call(method, sub_path, time.perf_counter() - start, e)
+            raise
+        self.record_call(method, sub_path, time.perf_counter() - start)
+        return result
+
+    def token_event(self, event: str) -> None:
+        """Count a token event: fetch, refresh, refresh_skipped, refresh_denied..."""
+        with self._lock:
+            self.token_events[event] += 1
+
+    def add_gauge(
+        self,
+        name: str,
+        func: Callable,
+        help: str = "",
+        source=None,
+        aggregate: Callable[[list], float] = sum,
+        kind: str = "gauge",
+    ) -> None:
+        """Register a gauge read at export time. func returns [(labels dict, value)].
+        :param source: (optional) object the gauge reports on, func is then called with it.
+            The gauge is registered once per source, which is only weakly referenced: the
+            gauge is dropped once the source is garbage collected.
+        :param aggregate: merges the values of the samples with the same labels (gauges of
+            several sources, clients sharing the registry)
+        :param kind: Prometheus type of the metric, "counter" for values that only go up
+            (their name then ends with _total)
+        """
+        ref = weakref.ref(source) if source is not None else None
+        key = (name, id(source) if source is not None else id(func))
+        with self._lock:
+            current = self._gauges.get(key)
+            if current is not None and (current[0] is None or current[0]() is not None):
+                return  # already registered by another client
+            self._gauges[key] = (ref, func, help, aggregate, kind)
+
+    def _gauge_samples(self) -> list:
+        """Return [(name, help, aggregate, kind, samples)] of the gauges whose source is
+        alive.
+        """
+        with self._lock:
+            gauges = list(self._gauges.items())
+        result = []
+        for key, (ref, func, help, aggregate, kind) in gauges:
+            if ref is None:
+                samples = func()
+            else:
+                source = ref()
+                if source is None:
+                    with self._lock:
+                        if self._gauges.get(key, (None,))[0] is ref:
+                            del self._gauges[key]
+                    continue
+                samples = func(source)
+            result.append((key[0], help, aggregate, kind, samples))
+        return result
+
+    def _read_gauges(self) -> dict:
+        merged = {}
+        for name, help, aggregate, kind, samples in self._gauge_samples():
+            _, _, _, series = merged.setdefault(name, (help, aggregate, kind, {}))
+            for labels, value in samples:
+                key = tuple(sorted(labels.items()))
+                series.setdefault(key, (labels, []))[1].append(value)
+        return {
+            name: (
+                help,
+                kind,
+                [(labels, aggregate(values)) for labels, values in series.values()],
+            )
+            for name, (help, aggregate, kind, series) in merged.items()
+        }
+
+    def snapshot(self) -> dict:
+        """Return all the metrics as a dict."""
+        gauges = self._read_gauges()
+        with self._lock:
+            return {
+                "calls": {
+                    f"{method} {route}": histogram.to_dict()
+                    for (method, route), histogram in self.call_latency.items()
+                },
+                "requests": {
+                    f"{method} {route}": histogram.to_dict()
+                    for (method, route), histogram in self.request_latency.items()
+                },
+                "responses": {
+                    f"{method} {route} {status}": count
+                    for (method, route, status), count in self.responses.items()
+                },
+                "errors": {
+                    f"{method} {route} {exception}": count
+                    for (method, route, exception), count in self.errors.items()
+                },
+                "token_events": dict(self.token_events),
+                "in_flight": self.in_flight,
+                "gauges": {
+                    name: [(labels, value) for labels, value in samples]
+                    for name, (_, _, samples) in gauges.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Return all the metrics in the Prometheus text exposition format."""
+        prefix = self.prefix
+        lines = []
+
+        def header(name: str, kind: str, help: str):
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        with self._lock:
+            for name, histograms, help in (
+                ("call_duration_seconds", self.call_latency, "Duration of api calls."),
+                (
+                    "request_duration_seconds",
+                    self.request_latency,
+                    "Duration of http requests.",
+                ),
+            ):
+                header(name, "histogram", help)
+                for (method, route), histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        labels = _labels(
+                            method=method, route=route, le=_format_bound(bound)
+                        )
+                        lines.append(f"{prefix}_{name}_bucket{labels} {count}")
+                    labels = _labels(method=method, route=route)
+                    lines.append(f"{prefix}_{name}_sum{labels} {histogram.sum}")
+                    lines.append(f"{prefix}_{name}_count{labels} {histogram.count}")
+
+            header("responses_total", "counter", "Http responses by status.")
+            for (method, route, status), count in sorted(self.responses.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"{prefix}_responses_total{labels} {count}")
+            header("errors_total", "counter", "Failed api calls by exception.")
+            for (method, route, exception), count in sorted(self.errors.items()):
+                labels = _labels(method=method, route=route, exception=exception)
+                lines.append(f"{prefix}_errors_total{labels} {count}")
+            header("token_events_total", "counter", "Token fetches and refreshes.")
+            for event, count in sorted(self.token_events.items()):
+                lines.append(
+                    f"{prefix}_token_events_total{_labels(event=event)} {count}"
+                )
+            header("in_flight_requests", "gauge", "Http requests in progress.")
+            lines.append(f"{prefix}_in_flight_requests {self.in_flight}")
+
+        for name, (help, kind, samples) in self._read_gauges().items():
+            header(name, kind, help)
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{_labels(**labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _pools(session) -> list:
+    """Return the connection pools of the adapters of a requests Session."""
+    result = []
+    # the same adapter is usually mounted for both http:// and https://
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is not None:
+                result.append(pool)
+    return result
+
+
+def register_pool_gauges(metrics: MetricsRegistry, session) -> None:
+    """Report the connection pools of a requests Session, per host: connections opened,
+    idle connections and requests made. The pools of sessions sharing metrics are summed.
+    """
+    metrics.add_gauge(
+        "pool_connections",
+        lambda session: [
+            ({"host": pool.host}, pool.num_connections) for pool in _pools(session)
+        ],
+        "Connections opened by the pool.",
+        source=session,
+    )
+    metrics.add_gauge(
+        "pool_idle_connections",
+        lambda session: [
+            ({"host": pool.host}, pool.pool.qsize() if pool.pool else 0)
+            for pool in _pools(session)
+        ],
+        "Idle connections kept by the pool.",
+        source=session,
+    )
+    metrics.add_gauge(
+        "pool_requests_total",
+        lambda session: [
+            ({"host": pool.host}, pool.num_requests) for pool in _pools(session)
+        ],
+        "Requests sent through the pool.",
+        source=session,
+        kind="counter",
+    )
+
+
+def register_coalescer_gauges(metrics: MetricsRegistry, coalescer) -> None:
+    """Report the requests made through a RequestCoalescer and how many were coalesced."""
+    metrics.add_gauge(
+        "coalescer_requests_total",
+        lambda coalescer: [({}, coalescer.requests)],
+        "GET requests made through the coalescer.",
+        source=coalescer,
+        kind="counter",
+    )
+    metrics.add_gauge(
+        "coalescer_coalesced_requests_total",
+        lambda coalescer: [({}, coalescer.coalesced)],
+        "GET requests served by an identical request in flight.",
+        source=coalescer,
+        kind="counter",
+    )
+
+
+def register_circuit_breaker_gauges(metrics: MetricsRegistry, breaker) -> None:
+    """Report the state of the circuits of a CircuitBreaker, per route, and the calls it
+    rejected. With several breakers, a route reports its most open circuit.
+    """
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    metrics.add_gauge(
+        "circuit_breaker_state",
+        lambda breaker: [
+            ({"route": route}, states[circuit["state"]])
+            for route, circuit in breaker.stats()["routes"].items()
+        ],
+        "State of the circuit of the route: 0 closed, 1 half open, 2 open.",
+        source=breaker,
+        aggregate=max,
+    )
+    metrics.add_gauge(
+        "circuit_breaker_rejected_calls_total",
+        lambda breaker: [({}, breaker.rejected)],
+        "Calls rejected without reaching the api while a circuit was open.",
+        source=breaker,
+        kind="counter",
+    )
@@ -0,0 +1,622 @@
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from base64 import b64decode, urlsafe_b64encode
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from secrets import token_hex
+from socketserver import ThreadingMixIn
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+from helloasso_api.exceptions import ApiV5NoConfig
+from helloasso_api.utils import get_log, parse_date
+
+FORM_TYPES = ("Event", "Membership", "Donation", "Shop", "CrowdFunding")
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+
+def constant_latency(ms: float) -> Callable[[random.Random], float]:
+    return lambda rng: ms / 1000
+
+
+def uniform_latency(low_ms: float, high_ms: float) -> Callable[[random.Random], float]:
+    return lambda rng: rng.uniform(low_ms, high_ms) / 1000
+
+
+def lognormal_latency(
+    median_ms: float, sigma: float = 0.5
+) -> Callable[[random.Random], float]:
+    """Long tailed latency, as usually observed on a real api: p99 ~ median * e^(2.33 sigma)."""
+    mu = math.log(median_ms / 1000)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Build a latency distribution from "20" (ms), "uniform:10,50" or "lognormal:20,0.5"."""
+    kind, _, args = spec.rpartition(":")
+    values = [float(value) for value in args.split(",")]
+    builders = {
+        "": constant_latency,
+        "constant": constant_latency,
+        "uniform": uniform_latency,
+        "lognormal": lognormal_latency,
+    }
+    if kind not in builders:
+        raise ApiV5NoConfig(f"Unknown latency distribution {kind}")
+    return builders[kind](*values)
+
+
+def _b64(data: dict) -> str:
+    return urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+class MockApi(object):
+    """Local stand-in of the HelloAsso api, to load test code built on HaApiV5 with no network.
+
+    Serves /oauth2/token (client_credentials, refresh_token and authorization_code grants,
+    expiring JWT access tokens, refresh tokens rotated on use) and paginated organizations,
+    forms, orders and payments generated from a seed. Latency, errors and rate limits
+    (429 with Retry-After and X-RateLimit headers, per access token) are configurable.
+
+    Example:
+
+    with MockApi(orders=5000, latency=lognormal_latency(20), error_rate=0.01) as mock:
+        api = HaApiV5(api_base=mock.api_base, client_id="client_id", client_secret="client_secret")
+
+    Or from a shell: python -m helloasso_api.mock_server --port 8000 --orders 5000
+    """
+
+    def __init__(
+        self,
+        client_id: str = "client_id",
+        client_secret: str = "client_secret",
+        organization_slug: str = "mock-asso",
+        orders: int = 1000,
+        forms: int = 10,
+        access_token_lifetime: float = 1800,
+        refresh_token_lifetime: float = 30 * 24 * 3600,
+        latency: Callable[[random.Random], float] = None,
+        error_rate: float = 0.0,
+        error_statuses: tuple = (500, 502, 503),
+        rate_limit: int = None,
+        max_page_size: int = 100,
+        seed: int = 0,
+    ):
+        """
+        :param client_id: client_id accepted by /oauth2/token
+        :param client_secret: client_secret accepted by /oauth2/token
+        :param organization_slug: slug of the organization owning the dataset
+        :param orders: number of orders (and payments, one per order)
+        :param forms: number of forms the orders are spread on
+        :param access_token_lifetime: lifetime of access tokens in seconds
+        :param refresh_token_lifetime: lifetime of refresh tokens in seconds
+        :param latency: (optional) function of a random.Random returning the delay of a
+            response in seconds, see constant_latency, uniform_latency, lognormal_latency
+        :param error_rate: share of api calls answered with one of error_statuses
+        :param error_statuses: statuses of the injected errors
+        :param rate_limit: (optional) api calls allowed per second and per access token,
+            calls over the limit are answered 429
+        :param max_page_size: largest pageSize served
+        :param seed: seed of the dataset, the latency and the injected errors
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.organization_slug = organization_slug
+        self.access_token_lifetime = access_token_lifetime
+        self.refresh_token_lifetime = refresh_token_lifetime
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.rate_limit = rate_limit
+        self.max_page_size = max_page_size
+        self.random = random.Random(seed)
+        self.log = get_log("apiv5.mock_server")
+
+        self.forms = self.build_forms(forms)
+        self.orders = self.build_orders(orders)
+        self.payments = [
+            payment for order in self.orders for payment in order["payments"]
+        ]
+        self.orders_by_id = {order["id"]: order for order in self.orders}
+        self.payments_by_id = {payment["id"]: payment for payment in self.payments}
+
+        self.access_tokens = {}
+        self.refresh_tokens = {}
+        self.windows = {}
+        self._responses = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def build_forms(self, count: int) -> list:
+        return [
+            {
+                "formSlug": f"form-{i}",
+                "formType": FORM_TYPES[i % len(FORM_TYPES)],
+                "title": f"Form {i}",
+                "organizationSlug": self.organization_slug,
+                "state": "Public",
+                "currency": "EUR",
+            }
+            for i in range(max(count, 1))
+        ]
+
+    def build_orders(self, count: int) -> list:
+        start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        orders = []
+        for i in range(1, count + 1):
+            form = self.forms[i % len(self.forms)]
+            date = start + timedelta(minutes=37 * i)
+            updated = date + timedelta(minutes=self.random.choice((0, 0, 0, 90, 3000)))
+            amount = self.random.choice((500, 1000, 2500, 5000, 10000))
+            payer = {
+                "email": f"payer{i}@example.org",
+                "firstName": "Jeanne",
+                "lastName": f"Martin{i}",
+                "country": "FRA",
+            }
+            order = {
+                "id": i,
+                "date": date.isoformat(),
+                "formSlug": form["formSlug"],
+                "formType": form["formType"],
+                "organizationSlug": self.organization_slug,
+                "amount": {"total": amount, "vat": 0, "discount": 0},
+                "payer": payer,
+                "items": [
+                    {
+                        "id": i * 10,
+                        "name": form["title"],
+                        "type": form["formType"],
+                        "state": "Processed",
+                        "amount": amount,
+                        "priceCategory": "Fixed",
+                    }
+                ],
+                "meta": {
+                    "createdAt": date.isoformat(),
+                    "updatedAt": updated.isoformat(),
+                },
+                "isAnonymous": False,
+                "isAmountHidden": False,
+            }
+            order["payments"] = [
+                {
+                    "id": i * 100,
+                    "date": date.isoformat(),
+                    "amount": amount,
+                    "state": "Authorized",
+                    "paymentMeans": "Card",
+                    "order": {"id": i, "formSlug": form["formSlug"]},
+                    "payer": payer,
+                    "meta": order["meta"],
+                }
+            ]
+            orders.append(order)
+        return orders
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return self.random.random() < rate
+
+    def handle(self, method: str, url: str, headers, body: bytes) -> tuple:
+        """Answer a request, return (status, headers dict, body bytes)."""
+        if self.latency is not None:
+            with self._lock:
+                delay = self.latency(self.random)
+            time.sleep(max(delay, 0))
+        split = urlsplit(url)
+        if split.path == "/oauth2/token":
+            if method != "POST":
+                status, extra, result = 405, {}, {"message": "Method not allowed"}
+            else:
+                status, extra, result = self.token(headers, body)
+        else:
+            query = {key: values[-1] for key, values in parse_qs(split.query).items()}
+            status, extra, result = self.api_call(method, split.path, headers, query)
+        self._count(f"status_{status}")
+        content = result if isinstance(result, bytes) else json.dumps(result).encode()
+        response_headers = {"Content-Type": "application/json", **extra}
+        return status, response_headers, content
+
+    def new_tokens(self) -> dict:
+        now = time.time()
+        exp = now + self.access_token_lifetime
+        access_token = ".".join(
+            (
+                _b64({"alg": "none", "typ": "JWT"}),
+                _b64({"client_id": self.client_id, "exp": int(exp)}),
+                token_hex(16),
+            )
+        )
+        refresh_token = token_hex(24)
+        with self._lock:
+            if len(self.access_tokens) > 10000:
+                self.access_tokens = {
+                    token: expiry
+                    for token, expiry in self.access_tokens.items()
+                    if expiry > now
+                }
+            self.access_tokens[access_token] = exp
+            self.refresh_tokens[refresh_token] = now + self.refresh_token_lifetime
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": int(self.access_token_lifetime),
+        }
+
+    def token(self, headers, body: bytes) -> tuple:
+        form = {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+        client_id = form.get("client_id")
+        client_secret = form.get("client_secret")
+        authorization = headers.get("Authorization") or ""
+        if authorization.startswith("Basic "):
+            client_id, _, client_secret = (
+                b64decode(authorization[6:]).decode().partition(":")
+            )
+        grant_type = form.get("grant_type")
+        self._count(f"grant_{grant_type}")
+        if grant_type == "refresh_token":
+            # refresh requests are authenticated by the refresh token itself
+            with self._lock:
+                expiry = self.refresh_tokens.pop(form.get("refresh_token"), None)
+            if expiry is None or expiry <= time.time():
+                return (
+                    400,
+                    {},
+                    {
+                        "error": "access_denied",
+                        "error_description": "invalid refresh token",
+                    },
+                )
+            return 200, {}, self.new_tokens()
+        if client_id != self.client_id or client_secret != self.client_secret:
+            return (
+                401,
+                {},
+                {"error": "unauthorized_client", "error_description": "invalid client"},
+            )
+        if grant_type == "client_credentials":
+            return 200, {}, self.new_tokens()
+        if grant_type == "authorization_code":
+            if not form.get("code") or not form.get("code_verifier"):
+                return (
+                    400,
+                    {},
+                    {"error": "invalid_grant", "error_description": "invalid code"},
+                )
+            return (
+                200,
+                {},
+                {**self.new_tokens(), "organization_slug": self.organization_slug},
+            )
+        return 400, {}, {"error": "unsupported_grant_type"}
+
+    def check_rate_limit(self, access_token: str) -> dict:
+        """Count a call in the one second window of the token, return the headers to send
+        (with Retry-After when the limit is exceeded).
+        """
+        now = time.time()
+        window = int(now)
+        with self._lock:
+            start, count = self.windows.get(access_token, (window, 0))
+            if start != window:
+                start, count = window, 0
+            count += 1
+            self.windows[access_token] = (start, count)
+        reset = max(1, math.ceil(window + 1 - now))
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - count)),
+            "X-RateLimit-Reset": str(reset),
+        }
+        if count > self.rate_limit:
+            headers["Retry-After"] = str(reset)
+        return headers
+
+    def api_call(self, method: str, path: str, headers, query: dict) -> tuple:
+        authorization = headers.get("Authorization") or ""
+        access_token = (
+            authorization[7:] if authorization.startswith("Bearer ") else None
+        )
+        with self._lock:
+            expiry = self.access_tokens.get(access_token)
+        if expiry is None or expiry <= time.time():
+            return (
+                401,
+                {},
+                {"message": "Authorization has been denied for this request."},
+            )
+        extra = {}
+        if self.rate_limit:
+            extra = self.check_rate_limit(access_token)
+            if "Retry-After" in extra:
+                return 429, extra, {"message": "Too many requests"}
+        if self.error_rate and self._chance(self.error_rate):
+            with self._lock:
+                status = self.random.choice(self.error_statuses)
+            return status, extra, {"message": "Injected error"}
+        if method != "GET":
+            return 405, extra, {"message": "Method not allowed"}
+        # the dataset never changes: encoded responses are reused
+        key = (path, tuple(sorted(query.items())))
+        content = self._responses.get(key)
+        if content is None:
+            status, result = self.route(path, query)
+            if status != 200:
+                return status, extra, result
+            content = (
+                result if isinstance(result, bytes) else json.dumps(result).encode()
+            )
+            with self._lock:
+                if len(self._responses) >= 256:
+                    self._responses.clear()
+                self._responses[key] = content
+        return 200, extra, content
+
+    def route(self, path: str, query: dict) -> tuple:
+        if path == "/v5/users/me/organizations":
+            return 200, [self.organization()]
+        match = re.fullmatch(r"/v5/(orders|payments)/(\d+)", path)
+        if match:
+            items = self.orders_by_id if match[1] == "orders" else self.payments_by_id
+            item = items.get(int(match[2]))
+            return (200, item) if item is not None else (404, {"message": "Not found"})
+        match = re.fullmatch(
+            r"/v5/organizations/([^/]+)(?:/forms/([^/]+)/([^/]+))?(/orders|/payments|/forms)?",
+            path,
+        )
+        if not match or match[1] != self.organization_slug:
+            return 404, {"message": "Not found"}
+        _, form_type, form_slug, collection = match.groups()
+        if form_slug is not None:
+            form = next((f for f in self.forms if f["formSlug"] == form_slug), None)
+            if form is None or form["formType"] != form_type:
+                return 404, {"message": "Not found"}
+            if collection is None:
+                return 200, form
+        if collection is None:
+            return 200, self.organization()
+        if collection == "/forms" and form_slug is not None:
+            return 404, {"message": "Not found"}
+        return 200, self.page(self.collection(collection, form_slug, query), query)
+
+    def collection(self, collection: str, form_slug: str, query: dict) -> list:
+        """Return the forms, or the orders or payments (of a form) filtered and sorted as
+        query asks.
+        """
+        if collection == "/forms":
+            return self.forms
+        items = self.orders if collection == "/orders" else self.payments
+        if form_slug is not None:
+            items = [
+                item
+                for item in items
+                if item.get("formSlug", item.get("order", {}).get("formSlug"))
+                == form_slug
+            ]
+        return self.filter_dates(items, query)
+
+    def organization(self) -> dict:
+        return {
+            "organizationSlug": self.organization_slug,
+            "name": self.organization_slug.replace("-", " ").title(),
+            "type": "Association1901",
+        }
+
+    @staticmethod
+    def filter_dates(items: list, query: dict) -> list:
+        """Apply the from, to, sortField (Date or UpdateDate) and sortOrder parameters.
+        As on the api, from and to filter on the date of the items whatever the sortField.
+        Dates of the dataset are UTC isoformat strings, so they are compared as strings.
+        """
+        if query.get("sortField") == "UpdateDate":
+            sort_date = lambda item: item["meta"]["updatedAt"]  # noqa: E731
+        else:
+            sort_date = lambda item: item["date"]  # noqa: E731
+
+        def bound(name: str) -> str:
+            value = parse_date(query[name])
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.astimezone(timezone.utc).isoformat()
+
+        if "from" in query:
+            start = bound("from")
+            items = [item for item in items if item["date"] >= start]
+        if "to" in query:
+            end = bound("to")
+            items = [item for item in items if item["date"] < end]
+        return sorted(
+            items, key=sort_date, reverse=query.get("sortOrder", "Desc") != "Asc"
+        )
+
+    def page(self, items: list, query: dict) -> dict:
+        page_size = min(int(query.get("pageSize", 20)), self.max_page_size)
+        if "continuationToken" in query:
+            offset = int(query["continuationToken"], 16)
+        else:
+            offset = (int(query.get("pageIndex", 1)) - 1) * page_size
+        end = offset + page_size
+        total_pages = max(1, math.ceil(len(items) / page_size))
+        return {
+            "data": items[offset:end],
+            "pagination": {
+                "pageSize": page_size,
+                "totalCount": len(items),
+                "pageIndex": offset // page_size + 1,
+                "totalPages": total_pages,
+                "continuationToken": f"{end:x}",
+            },
+        }
+
+    def __call__(self, environ, start_response):
+        """WSGI application, to run the stand-in behind any WSGI server."""
+        url = environ.get("PATH_INFO", "/")
+        if environ.get("QUERY_STRING"):
+            url += "?" + environ["QUERY_STRING"]
+        headers = {"Authorization": environ.get("HTTP_AUTHORIZATION")}
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        status, response_headers, content = self.handle(
+            environ["REQUEST_METHOD"], url, headers, body
+        )
+        response_headers["Content-Length"] = str(len(content))
+        start_response(
+            f"{status} {STATUS_REASONS.get(status, '')}",
+            list(response_headers.items()),
+        )
+        return [content]
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve from a background thread and return the api_base to give to HaApiV5."""
+        if self._server is None:
+            self._server = _Server((host, port), _Handler)
+            self._server.api = self
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                kwargs={"poll_interval": 0.05},
+                name="helloasso-mock-server",
+                daemon=True,
+            )
+            self._thread.start()
+        return self.api_base
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        """Serve until interrupted."""
+        self._server = _Server((host, port), _Handler)
+        self._server.api = self
+        self.log.info(f"Serving on {self.api_base}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer only exists from python 3.7
+    daemon_threads = True
+    # load tests open more connections at once than the default listen backlog of 5
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients timing out close their connection before the delayed response is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super(_Server, self).handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, content = self.server.api.handle(
+            self.command, self.path, self.headers, body
+        )
+        self.send_response(status, STATUS_REASONS.get(status))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m helloasso_api.mock_server",
+        description="Local stand-in of the HelloAsso api.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--client-id", default="client_id")
+    parser.add_argument("--client-secret", default="client_secret")
+    parser.add_argument("--organization", default="mock-asso")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--forms", type=int, default=10)
+    parser.add_argument("--token-lifetime", type=float, default=1800)
+    parser.add_argument("--refresh-token-lifetime", type=float, default=30 * 24 * 3600)
+    parser.add_argument(
+        "--latency", help='"20" (ms), "uniform:10,50" or "lognormal:20,0.5"'
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, help="calls per second per token")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    api = MockApi(
+        client_id=args.client_id,
+        client_secret=args.client_secret,
+        organization_slug=args.organization,
+        orders=args.orders,
+        forms=args.forms,
+        access_token_lifetime=args.token_lifetime,
+        refresh_token_lifetime=args.refresh_token_lifetime,
+        latency=parse_latency(args.latency) if args.latency else None,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    print(f"HelloAsso stand-in serving on http://{args.host}:{args.port}")
+    try:
+        api.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
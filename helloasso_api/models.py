@@ -0,0 +1,287 @@
+import re
+from sys import intern
+
+_MODELS = {}
+
+
+def snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)([A-Z])", r"_\1", name).lower()
+
+
+class Nested(object):
+    """Attribute holding a nested model (or a list of them) decoded on first access.
+    The raw dict (or list of dicts) of the response is kept in `slot` until then.
+    """
+
+    __slots__ = ("slot", "model_name", "many")
+
+    def __init__(self, slot: str, model_name: str, many: bool):
+        self.slot = slot
+        self.model_name = model_name
+        self.many = many
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        model = _MODELS[self.model_name]
+        if self.many:
+            if value and isinstance(value[0], dict):
+                value = [model.from_dict(item) for item in value]
+                setattr(obj, self.slot, value)
+        elif isinstance(value, dict):
+            value = model.from_dict(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+class ModelMeta(type):
+    """Build the __slots__ of a model from its api `fields`.
+
+    Each field of the api (camelCase) becomes a snake_case attribute. Fields listed in
+    `nested` ({field: "Model"} or {field: ["Model"]} for lists) are decoded lazily. String
+    values of the fields listed in `interned` (states, types, slugs...) are shared between
+    objects instead of being held once per object.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields = namespace.get("fields", ())
+        nested = namespace.get("nested", {})
+        slots = []
+        keys = []
+        for key in fields:
+            attr = snake_case(key)
+            if key in nested:
+                model_name = nested[key]
+                many = isinstance(model_name, list)
+                slot = f"_{attr}"
+                namespace[attr] = Nested(
+                    slot, model_name[0] if many else model_name, many
+                )
+            else:
+                slot = attr
+            slots.append(slot)
+            keys.append((key, slot))
+        namespace["__slots__"] = tuple(namespace.get("__slots__", ())) + tuple(slots)
+        namespace["_keys"] = tuple(keys)
+        namespace["_slots_by_key"] = dict(keys)
+        namespace["_interned"] = frozenset(namespace.get("interned", ()))
+        cls = super().__new__(mcs, name, bases, namespace)
+        _MODELS[name] = cls
+        return cls
+
+
+class Model(object, metaclass=ModelMeta):
+    """Base of the api resources models.
+
+    Models hold the fields of a resource in __slots__ instead of a dict per object. Fields
+    the model does not know are kept in `extra`, missing fields are None, and to_dict gives
+    back the api representation (without null fields).
+    """
+
+    __slots__ = ("extra",)
+    fields = ()
+    nested = {}
+    interned = ()
+
+    def __init__(self, **kwargs):
+        for key, slot in self._keys:
+            setattr(self, slot, None)
+        self.extra = None
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Build the model from a decoded api response."""
+        obj = cls.__new__(cls)
+        for _, slot in cls._keys:
+            setattr(obj, slot, None)
+        extra = None
+        slots_by_key = cls._slots_by_key
+        interned = cls._interned
+        for key, value in data.items():
+            slot = slots_by_key.get(key)
+            if slot is None:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+            else:
+                if key in interned and type(value) is str:
+                    value = intern(value)
+                setattr(obj, slot, value)
+        obj.extra = extra
+        return obj
+
+    @classmethod
+    def from_list(cls, items: list) -> list:
+        return [cls.from_dict(item) for item in items]
+
+    def to_dict(self) -> dict:
+        """Return the api representation. Nested objects never accessed are returned as
+        they were received, without being decoded.
+        """
+        data = {}
+        for key, slot in self._keys:
+            value = getattr(self, slot)
+            if value is None:
+                continue
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, list) and value and isinstance(value[0], Model):
+                value = [item.to_dict() for item in value]
+            data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        # the first field identifies the resource (id, formSlug, organizationSlug...)
+        identity = getattr(self, self._keys[0][1]) if self._keys else ""
+        return f"<{type(self).__name__} {identity}>"
+
+
+class Payer(Model):
+    fields = (
+        "email",
+        "firstName",
+        "lastName",
+        "company",
+        "dateOfBirth",
+        "address",
+        "city",
+        "zipCode",
+        "country",
+    )
+    interned = ("city", "country")
+
+
+class Item(Model):
+    fields = (
+        "id",
+        "name",
+        "type",
+        "state",
+        "amount",
+        "initialAmount",
+        "priceCategory",
+        "discount",
+        "user",
+        "payer",
+        "customFields",
+        "options",
+        "payments",
+        "order",
+        "tierId",
+        "tierDescription",
+        "qrCode",
+        "membershipCardUrl",
+        "dayOfLevy",
+    )
+    nested = {"payer": "Payer", "order": "Order"}
+    interned = ("name", "type", "state", "priceCategory", "tierDescription")
+
+
+class Payment(Model):
+    fields = (
+        "id",
+        "date",
+        "state",
+        "type",
+        "amount",
+        "amountTip",
+        "paymentMeans",
+        "paymentOffLineMean",
+        "installmentNumber",
+        "cashOutState",
+        "cashOutDate",
+        "refundOperations",
+        "paymentReceiptUrl",
+        "fiscalReceiptUrl",
+        "order",
+        "payer",
+        "items",
+        "meta",
+    )
+    nested = {"order": "Order", "payer": "Payer", "items": ["Item"]}
+    interned = ("state", "type", "paymentMeans", "paymentOffLineMean", "cashOutState")
+
+
+class Order(Model):
+    fields = (
+        "id",
+        "date",
+        "formSlug",
+        "formType",
+        "formName",
+        "organizationSlug",
+        "organizationName",
+        "checkoutIntentId",
+        "amount",
+        "payer",
+        "items",
+        "payments",
+        "meta",
+        "isAnonymous",
+        "isAmountHidden",
+    )
+    nested = {"payer": "Payer", "items": ["Item"], "payments": ["Payment"]}
+    interned = (
+        "formSlug",
+        "formType",
+        "formName",
+        "organizationSlug",
+        "organizationName",
+    )
+
+
+class Form(Model):
+    fields = (
+        "formSlug",
+        "formType",
+        "title",
+        "description",
+        "state",
+        "organizationSlug",
+        "organizationName",
+        "url",
+        "widgetButtonUrl",
+        "widgetFullUrl",
+        "widgetVignetteHorizontalUrl",
+        "widgetVignetteVerticalUrl",
+        "startDate",
+        "endDate",
+        "currency",
+        "banner",
+        "logo",
+        "tiers",
+        "meta",
+    )
+
+
+class Organization(Model):
+    fields = (
+        "organizationSlug",
+        "name",
+        "type",
+        "category",
+        "role",
+        "description",
+        "url",
+        "logo",
+        "banner",
+        "address",
+        "city",
+        "zipCode",
+        "geolocation",
+        "fiscalReceiptEligibility",
+        "isAuthenticated",
+        "isCashInCompliant",
+        "updateDate",
+    )
@@ -0,0 +1,315 @@
+import json
+import queue
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from socketserver import ThreadingMixIn
+from typing import Callable
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from helloasso_api.exceptions import Apiv5ValueError
+from helloasso_api.models import Form, Order, Organization, Payment
+from helloasso_api.utils import get_log
+
+# fields a notification must carry to be processed without calling the api
+REQUIRED_FIELDS = {
+    "Order": ("id", "items", "payer"),
+    "Payment": ("id", "order", "payer", "state"),
+    "Form": ("formSlug", "formType", "organizationSlug"),
+}
+MODELS = {
+    "Order": Order,
+    "Payment": Payment,
+    "Form": Form,
+    "Organization": Organization,
+}
+
+
+class Notification(object):
+    """A HelloAsso notification (Order, Payment, Form... event).
+
+    When the payload lacks fields, details fetches the full object through the client
+    the first time it is read.
+    """
+
+    __slots__ = ("event_type", "data", "metadata", "key", "_client", "_details")
+
+    def __init__(
+        self, event_type: str, data: dict, metadata: dict, key: str, client=None
+    ):
+        self.event_type = event_type
+        self.data = data
+        self.metadata = metadata
+        self.key = key
+        self._client = client
+        self._details = None
+
+    @classmethod
+    def decode(cls, body: bytes, client=None) -> "Notification":
+        """Decode a notification payload, raise Apiv5ValueError if it is not one."""
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise Apiv5ValueError(f"Invalid notification payload: {e}")
+        if (
+            not isinstance(payload, dict)
+            or not payload.get("eventType")
+            or not isinstance(payload.get("data"), dict)
+        ):
+            raise Apiv5ValueError("Notification payload needs eventType and data")
+        # retried deliveries carry the same payload
+        digest = sha256(
+            json.dumps(payload["data"], sort_keys=True).encode()
+        ).hexdigest()
+        key = f"{payload['eventType']}:{payload['data'].get('id')}:{digest[:16]}"
+        return cls(
+            payload["eventType"], payload["data"], payload.get("metadata"), key, client
+        )
+
+    @property
+    def id(self):
+        return self.data.get("id")
+
+    @property
+    def complete(self) -> bool:
+        return all(
+            self.data.get(field) is not None
+            for field in REQUIRED_FIELDS.get(self.event_type, ())
+        )
+
+    def details_path(self) -> str:
+        """Return the api path of the object of the notification, None if unknown."""
+        if self.event_type == "Order":
+            return f"/v5/orders/{self.id}"
+        if self.event_type == "Payment":
+            return f"/v5/payments/{self.id}"
+        if self.event_type == "Form":
+            data = self.data
+            return (
+                f"/v5/organizations/{data['organizationSlug']}/forms/"
+                f"{data['formType']}/{data['formSlug']}/public"
+            )
+        return None
+
+    @property
+    def details(self) -> dict:
+        """Return data, fetched from the api if the payload is incomplete."""
+        if self._details is None:
+            path = self.details_path()
+            if self.complete or self._client is None or path is None:
+                self._details = self.data
+            else:
+                self._details = {**self.data, **self._client.call(path).json()}
+        return self._details
+
+    @property
+    def model(self):
+        """Return details decoded as an Order, Payment, Form or Organization model,
+        None for other events.
+        """
+        model = MODELS.get(self.event_type)
+        return model.from_dict(self.details) if model is not None else None
+
+
+class SeenIndex(object):
+    """Bounded set of the most recently seen keys."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key) -> bool:
+        """Add key, return False if it was already there."""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+            return True
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # bursts of deliveries overflow the default listen backlog of 5
+    request_queue_size = 128
+
+
+class _QuietHandler(WSGIRequestHandler):
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+class NotificationReceiver(object):
+    """Receive HelloAsso notifications and process them from a pool of worker threads.
+
+    receive() only decodes the payload, drops deliveries already seen and queues the
+    notification, so that HelloAsso is acknowledged right away. When the queue is full
+    the delivery is refused with a 503 and HelloAsso delivers it again later.
+    The receiver is a WSGI application, or can serve on its own with serve().
+
+    Example:
+
+    def handle(notification: Notification):
+        if notification.event_type == "Order":
+            save_order(notification.details)
+
+    with NotificationReceiver(handle, client=api) as receiver:
+        receiver.serve("0.0.0.0", 8000)
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Notification], None],
+        client=None,
+        workers: int = 4,
+        queue_size: int = 1000,
+        seen_size: int = 100000,
+        enqueue_timeout: float = 0,
+    ):
+        """
+        :param handler: function called with each Notification by the workers
+        :param client: (optional) ApiV5Client used to fetch the details of incomplete
+            notifications
+        :param workers: number of worker threads
+        :param queue_size: maximum number of notifications waiting for a worker
+        :param seen_size: number of notification keys remembered to drop duplicates
+        :param enqueue_timeout: seconds to wait for room in the queue before refusing a
+            notification
+        """
+        self.handler = handler
+        self.client = client
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.seen = SeenIndex(seen_size)
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self.log = get_log("apiv5.notifications")
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"helloasso-notifications-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Process the queued notifications and stop the workers."""
+        if self._server is not None:
+            self._server.shutdown()
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _work(self) -> None:
+        while True:
+            notification = self.queue.get()
+            if notification is None:
+                return
+            try:
+                self.handler(notification)
+                self._count("processed")
+            except Exception:
+                self._count("failed")
+                # forget it so that the next delivery is processed
+                self.seen.discard(notification.key)
+                self.log.exception(f"Failed to process notification {notification.key}")
+
+    def receive(self, body: bytes) -> int:
+        """Take a notification payload and return the http status to answer:
+        200 when queued or already seen, 400 when invalid, 503 when the queue is full.
+        """
+        self._count("received")
+        try:
+            notification = Notification.decode(body, self.client)
+        except Apiv5ValueError as e:
+            self.log.warning(str(e))
+            return 400
+        if not self.seen.add(notification.key):
+            self._count("duplicates")
+            return 200
+        try:
+            if self.enqueue_timeout:
+                self.queue.put(notification, timeout=self.enqueue_timeout)
+            else:
+                self.queue.put_nowait(notification)
+        except queue.Full:
+            self.seen.discard(notification.key)
+            self._count("rejected")
+            return 503
+        return 200
+
+    def __call__(self, environ, start_response):
+        """WSGI application accepting notifications posted on any path."""
+        if environ["REQUEST_METHOD"] != "POST":
+            status = 405
+        else:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            status = self.receive(environ["wsgi.input"].read(length))
+        reasons = {200: "OK", 400: "Bad Request", 405: "Method Not Allowed"}
+        start_response(
+            f"{status} {reasons.get(status, 'Service Unavailable')}",
+            [("Content-Type", "text/plain"), ("Content-Length", "0")],
+        )
+        return [b""]
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        """Serve the receiver over http until stop() is called."""
+        self.start()
+        self._server = make_server(
+            host, port, self, _ThreadingWSGIServer, handler_class=_QuietHandler
+        )
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queued": self.queue.qsize(),
+            "seen": len(self.seen),
+        }
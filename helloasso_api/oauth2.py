@@ -1,23 +1,49 @@
+import time
+
 import requests
-from oauthlib.oauth2 import (
-    AccessDeniedError,
-    BackendApplicationClient,
-    UnauthorizedClientError,
-)
 from requests.auth import HTTPBasicAuth
-from requests_oauthlib import OAuth2Session
 
+from helloasso_api.cache import TTLCache
 from helloasso_api.exceptions import (
     ApiV5AuthenticationError,
     ApiV5ConnectionError,
     Apiv5ExceptionError,
     ApiV5Timeout,
 )
-from helloasso_api.utils import get_log
+from helloasso_api.token_store import TokenPair, TokenStore
+from helloasso_api.utils import get_base_url, get_jwt_expiry, get_log
+
+
+class _AccessDenied(Exception):
+    """The token endpoint rejected the refresh token"""
+
+
+def parse_token_response(result) -> dict:
+    """Return the token payload of a token endpoint response.
+    OAuth2 errors are mapped to Python exceptions: unauthorized_client to
+    ApiV5AuthenticationError, any other error to Apiv5ExceptionError.
+    """
+    try:
+        payload = result.json()
+    except ValueError:
+        payload = {}
+    error = payload.get("error")
+    if error == "unauthorized_client":
+        raise ApiV5AuthenticationError(
+            f"Authentication Error : ({error}) {payload.get('error_description', '')}"
+        )
+    if error == "access_denied":
+        raise _AccessDenied(payload.get("error_description", ""))
+    if error or result.status_code >= 400 or "access_token" not in payload:
+        raise Apiv5ExceptionError(
+            f"Error : ({error or result.status_code}) {payload.get('error_description', '')}"
+        )
+    return payload
 
 
 class OAuth2Api(object):
     """Handle Authentication logic"""
+
     def __init__(
         self,
         api_base: str,
@@ -28,6 +54,12 @@ class OAuth2Api(object):
         refresh_token: str = None,
         oauth2_token_getter: callable = None,
         oauth2_token_setter: callable = None,
+        session: requests.Session = None,
+        token_renewal_margin: float = 60,
+        refresh_token_lifetime: float = 30 * 24 * 3600,
+        token_cache_ttl: float = None,
+        metrics=None,
+        token_store: TokenStore = None,
     ):
         self.api_base = api_base
         self.client_id = client_id
@@ -37,12 +69,83 @@ class OAuth2Api(object):
         self._refresh_token = refresh_token
         self.oauth2_token_getter = oauth2_token_getter
         self.oauth2_token_setter = oauth2_token_setter
-        self.client = BackendApplicationClient(client_id=client_id)
+        self.session = session
+        self.token_renewal_margin = token_renewal_margin
+        self.refresh_token_lifetime = refresh_token_lifetime
+        self.access_token_expires_at = None
+        self.refresh_token_expires_at = None
+        self._expiry_token = None
+        if token_cache_ttl is None and token_store is not None:
+            # reading the store is a query per token read, several per api call
+            token_cache_ttl = token_renewal_margin
+        self.token_cache = TTLCache(token_cache_ttl) if token_cache_ttl else None
+        self.metrics = metrics
+        self.token_store = token_store
+        self.token_store_key = client_id
+        self._stored_pair = None
         self.auth = HTTPBasicAuth(client_id, client_secret)
         self.log = get_log("apiv5.oauth2")
 
+    def token_event(self, event: str) -> None:
+        """Count a token event (fetch, refresh, refresh_skipped, refresh_denied,
+        authorization_code) in metrics.
+        """
+        if self.metrics is not None:
+            self.metrics.token_event(event)
+
     def _get_path(self) -> str:
-        return f"https://{self.api_base}/oauth2/token"
+        return f"{get_base_url(self.api_base)}/oauth2/token"
+
+    def request_token(self, data: dict, auth=None) -> requests.Response:
+        """POST a form to the token endpoint through the shared session, so token requests
+        reuse the connection pool of the Api calls.
+        Connection errors and timeouts are mapped to Python exceptions.
+        """
+        if self.session is None:
+            self.session = requests.Session()
+        try:
+            return self.session.post(
+                self._get_path(),
+                data=data,
+                headers=self._get_headers(),
+                auth=auth,
+                timeout=self.timeout,
+            )
+        except requests.exceptions.Timeout:
+            raise ApiV5Timeout(f"{self._get_path()} timeout : {str(self.timeout)} sec")
+        except requests.exceptions.ConnectionError:
+            raise ApiV5ConnectionError(
+                f"Failed to establish a new connection: Name or service not known : {self._get_path()}"
+            )
+
+    def _post(self, data: dict, auth=None) -> dict:
+        return parse_token_response(self.request_token(data, auth=auth))
+
+    def authorization_code_body(
+        self, code: str, redirect_url: str, code_verifier: str
+    ) -> dict:
+        """Return the token request body exchanging an authorization code for tokens."""
+        return {
+            "client_id": self.client_id.replace("-", ""),
+            "client_secret": self.client_secret,
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_url,
+            "code_verifier": code_verifier,
+        }
+
+    def exchange_authorization_code(
+        self, code: str, redirect_url: str, code_verifier: str
+    ) -> requests.Response:
+        """Exchange an authorization code for tokens, returning the token endpoint response.
+        The tokens of this client are left untouched: they belong to the organization that
+        granted the authorization.
+        """
+        self.log.info("OAUTH2 : Exchange Authorization Code")
+        self.token_event("authorization_code")
+        return self.request_token(
+            self.authorization_code_body(code, redirect_url, code_verifier)
+        )
 
     @staticmethod
     def _get_headers() -> dict:
@@ -56,18 +159,20 @@ class OAuth2Api(object):
         """Return an access token. If a getter has been provided at instantiation it will be used,
         else the property _access_token will be used.
         """
+        if self.token_store is not None:
+            return self._read_pair().access_token or self._access_token
         if self.oauth2_token_getter:
-            return (
-                self.oauth2_token_getter("access_token", self.client_id)
-                or self._access_token
-            )
+            return self._read_token("access_token") or self._access_token
         return self._access_token
 
     @access_token.setter
     def access_token(self, access_token: str):
         """Set the access token. If a setter has been provided at instantiation it will be used."""
-        if self.oauth2_token_setter:
+        if self.token_store is not None:
+            self._put_pair(self._read_pair()._replace(access_token=access_token))
+        elif self.oauth2_token_setter:
             self.oauth2_token_setter("access_token", self.client_id, access_token)
+            self._cache_token("access_token", access_token)
         self._access_token = access_token
 
     @property
@@ -75,20 +180,105 @@ class OAuth2Api(object):
         """Return a refresh token. If a getter has been provided at instantiation it will be used,
         else the property _refresh_token will be used.
         """
+        if self.token_store is not None:
+            return self._read_pair().refresh_token or self._refresh_token
         if self.oauth2_token_getter:
-            return (
-                self.oauth2_token_getter("refresh_token", self.client_id)
-                or self._refresh_token
-            )
+            return self._read_token("refresh_token") or self._refresh_token
         return self._refresh_token
 
     @refresh_token.setter
     def refresh_token(self, refresh_token: str):
         """Set the refresh token. If a setter has been provided at instantiation it will be used."""
-        if self.oauth2_token_setter:
+        if self.token_store is not None:
+            self._put_pair(self._read_pair()._replace(refresh_token=refresh_token))
+        elif self.oauth2_token_setter:
             self.oauth2_token_setter("refresh_token", self.client_id, refresh_token)
+            self._cache_token("refresh_token", refresh_token)
         self._refresh_token = refresh_token
 
+    def _read_token(self, token_key: str) -> str:
+        """Call the token getter, going through the local token cache if enabled."""
+        if self.token_cache is None:
+            return self.oauth2_token_getter(token_key, self.client_id)
+        token = self.token_cache.get((token_key, self.client_id))
+        if token is None:
+            token = self.oauth2_token_getter(token_key, self.client_id)
+            self._cache_token(token_key, token)
+        return token
+
+    def _read_pair(self) -> TokenPair:
+        """Read the token pair from the token store, going through the local token cache
+        if enabled.
+        """
+        key = ("tokens", self.token_store_key)
+        pair = self.token_cache.get(key) if self.token_cache is not None else None
+        if pair is None:
+            self._stored_pair = self.token_store.get(self.token_store_key)
+            pair = self._stored_pair or TokenPair(None, None)
+            self._cache_pair(pair)
+        return pair
+
+    def _put_pair(self, pair: TokenPair) -> None:
+        self.token_store.put(self.token_store_key, pair)
+        self._stored_pair = pair
+        self._cache_pair(pair)
+
+    def store_tokens(self, access_token: str, refresh_token: str) -> None:
+        """Store a new access and refresh token.
+        With a token store the pair is written at once, unless the stored pair changed since
+        it was read (renewed by a process not holding the refresh lock): the stored pair is
+        then kept and used.
+        """
+        if self.token_store is None:
+            self.access_token, self.refresh_token = access_token, refresh_token
+            return
+        pair = TokenPair(access_token, refresh_token)
+        if self.token_store.compare_and_set(
+            self.token_store_key, self._stored_pair, pair
+        ):
+            self._stored_pair = pair
+            self._cache_pair(pair)
+        else:
+            self.log.warning("OAUTH2 : tokens changed in the token store, keep them")
+            self.invalidate_token_cache()
+            pair = self._read_pair()
+        self._access_token, self._refresh_token = pair
+
+    def _cache_token(self, token_key: str, token: str) -> None:
+        """Store a token read from or written to the token storage in the local cache.
+        Access tokens are not cached past their renewal time.
+        """
+        if self.token_cache is None:
+            return
+        key = (token_key, self.client_id)
+        if not token:
+            self.token_cache.invalidate(key)
+            return
+        ttl = self._access_token_ttl(token) if token_key == "access_token" else None
+        self.token_cache.set(key, token, ttl)
+
+    def _cache_pair(self, pair: TokenPair) -> None:
+        """Store a token pair read from or written to the token store in the local cache."""
+        if self.token_cache is None:
+            return
+        key = ("tokens", self.token_store_key)
+        if not pair.access_token:
+            self.token_cache.invalidate(key)
+            return
+        self.token_cache.set(key, pair, self._access_token_ttl(pair.access_token))
+
+    def _access_token_ttl(self, access_token: str) -> float:
+        """Return how long an access token may be cached: until its renewal time."""
+        expires_at = get_jwt_expiry(access_token)
+        if expires_at is None:
+            return None
+        return max(expires_at - self.token_renewal_margin - time.time(), 0)
+
+    def invalidate_token_cache(self) -> None:
+        """Forget cached tokens so that the next read goes to the token storage."""
+        if self.token_cache is not None:
+            self.token_cache.invalidate()
+
     @property
     def credentials(self) -> dict:
         """Return the payload dict to authenticate to the Api."""
@@ -103,28 +293,71 @@ class OAuth2Api(object):
         HTTP errors are mapped to Python exceptions.
         """
         self.log.info("OAUTH2 : Get Token")
+        self.token_event("fetch")
         try:
-            oauth = OAuth2Session(client=self.client)
-            result = oauth.fetch_token(
-                token_url=self._get_path(), auth=self.auth, timeout=self.timeout
-            )
-            self.token_saver(result)
-            self.log.info(f"Token : {self._access_token}")
-        except requests.exceptions.ConnectionError:
-            raise ApiV5ConnectionError(
-                f"Failed to establish a new connection: Name or service not known : {self._get_path()}"
-            )
-        except requests.exceptions.Timeout:
-            raise ApiV5Timeout(f"{self._get_path()} timeout : {str(self.timeout)} sec")
-        except UnauthorizedClientError as e:
-            raise ApiV5AuthenticationError(f"Authentication Error : {str(e)}")
+            result = self._post({"grant_type": "client_credentials"}, auth=self.auth)
+        except (
+            ApiV5AuthenticationError,
+            ApiV5ConnectionError,
+            Apiv5ExceptionError,
+            ApiV5Timeout,
+        ):
+            raise
         except Exception as e:
             raise Apiv5ExceptionError(f"Error : {str(e)}")
+        self.token_saver(result)
+        self.log.info(f"Token : {self._access_token}")
 
     def token_saver(self, request):
         """Parse dict response from oauth2 library and store access and refresh tokens."""
-        self.access_token = request["access_token"]
-        self.refresh_token = request["refresh_token"]
+        self.store_tokens(request["access_token"], request["refresh_token"])
+        self.save_expiry(request)
+
+    def save_expiry(self, request) -> None:
+        """Track when the tokens of a token response expire.
+        The access token expiry comes from expires_in, or from the JWT exp claim if absent.
+        """
+        now = time.time()
+        expires_in = request.get("expires_in")
+        self._expiry_token = request["access_token"]
+        self.access_token_expires_at = (
+            now + float(expires_in)
+            if expires_in
+            else get_jwt_expiry(request["access_token"])
+        )
+        self.refresh_token_expires_at = (
+            now + self.refresh_token_lifetime if request.get("refresh_token") else None
+        )
+
+    def access_token_expiry(self, access_token: str = None) -> float:
+        """Return the expiry (epoch seconds) of the current access token, None if unknown.
+        Tokens set from elsewhere (setter, shared storage) fall back to their JWT exp claim.
+        :param access_token: (optional) the access token requests are sent with, when it is
+            not read through the access_token property (see AsyncOAuth2Api.load_token)
+        """
+        if access_token is None:
+            access_token = self.access_token
+        if access_token != self._expiry_token:
+            self._expiry_token = access_token
+            self.access_token_expires_at = get_jwt_expiry(access_token)
+        return self.access_token_expires_at
+
+    def access_token_needs_renewal(self, access_token: str = None) -> bool:
+        """Return True when the access token expires within token_renewal_margin seconds.
+        :param access_token: (optional) see access_token_expiry
+        """
+        expires_at = self.access_token_expiry(access_token)
+        return (
+            expires_at is not None
+            and expires_at - self.token_renewal_margin <= time.time()
+        )
+
+    def refresh_token_expired(self) -> bool:
+        """Return True when the refresh token is known to be expired."""
+        return (
+            self.refresh_token_expires_at is not None
+            and self.refresh_token_expires_at <= time.time()
+        )
 
     def refresh_tokens(self):
         """Refresh connection tokens. If tokens are not presents a new token will be requested instead.
@@ -132,31 +365,30 @@ class OAuth2Api(object):
         """
         self.log.info("OAUTH2 : Refresh Token")
         try:
-            if self.refresh_token is not None:
-                oauth = OAuth2Session(client=self.client, token=self.access_token)
-                result = oauth.refresh_token(
-                    token_url=self._get_path(), timeout=self.timeout, **self.credentials
-                )
+            if self.refresh_token is not None and not self.refresh_token_expired():
+                self.token_event("refresh")
+                result = self._post({"grant_type": "refresh_token", **self.credentials})
                 self.token_saver(result)
                 self.log.info(f"OAUTH2 : Refresh Token : {self._access_token}")
             else:
-                self.access_token, self.refresh_token = None, None
-                self.log.warning(f"OAUTH2 : the Refresh Token is empty, reset tokens.")
-        except requests.exceptions.ConnectionError:
-            raise ApiV5ConnectionError(
-                f"OAUTH2 : Failed to establish a new connection: Name or service not known : {self._get_path()}"
-            )
-        except requests.exceptions.Timeout:
-            raise ApiV5Timeout(
-                f"OAUTH2 : {self._get_path()} timeout : {str(self.timeout)} sec"
-            )
-        except UnauthorizedClientError as e:
-            raise ApiV5AuthenticationError(f"OAUTH2 : Authentication Error : {str(e)}")
-        except AccessDeniedError:
-            self.access_token, self.refresh_token = None, None
+                self.token_event("refresh_skipped")
+                self.store_tokens(None, None)
+                self.log.warning(
+                    f"OAUTH2 : the Refresh Token is empty or expired, reset tokens."
+                )
+        except _AccessDenied:
+            self.token_event("refresh_denied")
+            self.store_tokens(None, None)
             self.log.warning(
                 f"OAUTH2 : (access_denied) invalid token values, reset tokens"
             )
+        except (
+            ApiV5AuthenticationError,
+            ApiV5ConnectionError,
+            Apiv5ExceptionError,
+            ApiV5Timeout,
+        ):
+            raise
         except Exception as e:
             raise Apiv5ExceptionError(f"OAUTH2 : Error : {str(e)}")
         finally:
@@ -165,3 +397,22 @@ class OAuth2Api(object):
                     f"OAUTH2 : Access Token for Refresh Token not exist, requests a new Access Token"
                 )
                 self.get_token()
+
+
+class OrganizationOAuth2Api(OAuth2Api):
+    """Token state of an organization that granted access to a partner application through
+    the authorization code flow. Its tokens are refreshed with the refresh token, never
+    requested with client_credentials which would return the tokens of the partner itself.
+    """
+
+    def __init__(self, organization_slug: str, *args, **kwargs):
+        super(OrganizationOAuth2Api, self).__init__(*args, **kwargs)
+        self.organization_slug = organization_slug
+        self.token_store_key = f"{self.client_id}:{organization_slug}"
+        self.log = get_log("apiv5.organization_oauth2")
+
+    def get_token(self) -> None:
+        raise ApiV5AuthenticationError(
+            f"Authentication Error : no valid tokens for organization {self.organization_slug},"
+            " it must authorize the application again"
+        )
@@ -0,0 +1,210 @@
+import asyncio
+import queue
+import threading
+
+_DONE = object()
+
+
+class Paginator(object):
+    """Walk a paginated list endpoint (orders, payments, items, forms...) page by page.
+
+    Iterating yields the items of every page. Pages are requested with the continuationToken
+    of the previous page. With prefetch the next pages are fetched by a background thread while
+    the current one is processed; at most max_pages_in_memory pages are held at once.
+
+    Example:
+
+    for order in api.paginate("/v5/organizations/my-asso/orders", page_size=100, prefetch=True):
+        ...
+    """
+
+    def __init__(
+        self,
+        client,
+        sub_path: str,
+        params: dict = None,
+        page_size: int = 20,
+        prefetch: bool = False,
+        max_pages_in_memory: int = 2,
+        continuation_token: str = None,
+        page_index: int = None,
+    ):
+        """
+        :param client: ApiV5Client used to make the calls
+        :param sub_path: path of the list endpoint
+        :param params: (optional) query parameters sent with every page request
+        :param page_size: number of items per page
+        :param prefetch: (optional) fetch the next pages in a background thread
+        :param max_pages_in_memory: (optional) maximum number of pages held when prefetching
+        :param continuation_token: (optional) start from this continuation token
+        :param page_index: (optional) start from this page index (1 based) when there is no
+            continuation token, sent with the first request only
+        """
+        self._client = client
+        self.sub_path = sub_path
+        self.params = params or {}
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.max_pages_in_memory = max(max_pages_in_memory, 1)
+        self.continuation_token = continuation_token
+        self.page_index = page_index
+        self.pagination = None
+
+    def page_params(self, continuation_token: str = None) -> dict:
+        params = {**self.params, "pageSize": self.page_size}
+        if continuation_token:
+            params["continuationToken"] = continuation_token
+        elif self.page_index:
+            # the following pages are requested with the continuation token of the previous
+            params["pageIndex"] = self.page_index
+        return params
+
+    def is_last_page(self, page: dict) -> bool:
+        """Return True if no page follows page."""
+        data = page.get("data") or []
+        pagination = page.get("pagination") or {}
+        total_pages = pagination.get("totalPages")
+        if total_pages is not None and pagination.get("pageIndex", 0) >= total_pages:
+            return True
+        return not data or not pagination.get("continuationToken")
+
+    def fetch_page(self, continuation_token: str = None) -> dict:
+        return self._client.call(
+            self.sub_path, params=self.page_params(continuation_token)
+        ).json()
+
+    def _fetch_pages(self):
+        continuation_token = self.continuation_token
+        while True:
+            page = self.fetch_page(continuation_token)
+            yield page
+            if self.is_last_page(page):
+                return
+            continuation_token = page["pagination"]["continuationToken"]
+
+    def _produce_pages(self, slots, pages, stop):
+        """Put the fetched pages in the pages queue, then _DONE or the exception raised.
+        Run by the prefetch thread.
+        """
+        source = self._fetch_pages()
+        try:
+            while True:
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                page = next(source, _DONE)
+                pages.put(page)
+                if page is _DONE:
+                    return
+        except Exception as e:
+            pages.put(e)
+
+    def _prefetch_pages(self):
+        # a slot is taken before fetching a page and given back once the caller is done with
+        # it, so that fetched pages never exceed max_pages_in_memory
+        slots = threading.Semaphore(self.max_pages_in_memory)
+        pages = queue.Queue()
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=self._produce_pages,
+            args=(slots, pages, stop),
+            name="helloasso-prefetch",
+            daemon=True,
+        )
+        worker.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+                page = None
+                slots.release()
+        finally:
+            stop.set()
+
+    def pages(self):
+        """Yield the decoded pages (dict with data and pagination)."""
+        source = self._prefetch_pages() if self.prefetch else self._fetch_pages()
+        for page in source:
+            self.pagination = page.get("pagination")
+            yield page
+
+    def __iter__(self):
+        for page in self.pages():
+            yield from page.get("data") or []
+
+
+class AsyncPaginator(Paginator):
+    """Asyncio version of Paginator, iterate with `async for`.
+    With prefetch the next pages are fetched by a background task.
+    """
+
+    async def fetch_page(self, continuation_token: str = None) -> dict:
+        result = await self._client.call(
+            self.sub_path, params=self.page_params(continuation_token)
+        )
+        return result.json()
+
+    async def _fetch_pages(self):
+        continuation_token = self.continuation_token
+        while True:
+            page = await self.fetch_page(continuation_token)
+            yield page
+            if self.is_last_page(page):
+                return
+            continuation_token = page["pagination"]["continuationToken"]
+
+    async def _produce_pages(self, slots, pages):
+        """Put the fetched pages in the pages queue, then _DONE or the exception raised.
+        Run by the prefetch task.
+        """
+        source = self._fetch_pages()
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    page = await source.__anext__()
+                except StopAsyncIteration:
+                    page = _DONE
+                pages.put_nowait(page)
+                if page is _DONE:
+                    return
+        except Exception as e:
+            pages.put_nowait(e)
+
+    async def _prefetch_pages(self):
+        slots = asyncio.Semaphore(self.max_pages_in_memory)
+        pages = asyncio.Queue()
+        worker = asyncio.ensure_future(self._produce_pages(slots, pages))
+        try:
+            while True:
+                page = await pages.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+                page = None
+                slots.release()
+        finally:
+            worker.cancel()
+
+    async def pages(self):
+        """Yield the decoded pages (dict with data and pagination)."""
+        source = self._prefetch_pages() if self.prefetch else self._fetch_pages()
+        async for page in source:
+            self.pagination = page.get("pagination")
+            yield page
+
+    def __iter__(self):
+        raise TypeError("AsyncPaginator must be iterated with async for")
+
+    async def __aiter__(self):
+        async for page in self.pages():
+            for item in page.get("data") or []:
+                yield item
@@ -0,0 +1,139 @@
+import asyncio
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from helloasso_api.utils import get_log
+
+
+def retry_after(result) -> float:
+    """Return the delay in seconds asked by the Retry-After header of a response, None if
+    there is none.
+    """
+    headers = getattr(result, "headers", None)
+    if not hasattr(headers, "get"):
+        return None
+    return RateLimiter._parse_delay(headers.get("Retry-After"))
+
+
+class TokenBucket(object):
+    """Token bucket allowing rate requests per second with bursts of up to burst requests.
+
+    Callers reserve a token and are told how long to wait for it, so blocked callers are
+    served in arrival order instead of all retrying at once.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            if now > self.updated:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+            self.tokens -= 1
+            return self.updated - now + max(0.0, -self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no token for the next seconds, then allow a single request first."""
+        with self._lock:
+            self.updated = max(self.updated, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 1.0)
+
+
+class RateLimiter(object):
+    """Client side rate limiter for ApiV5Client and AsyncApiV5Client.
+
+    Requests are throttled with a default token bucket, or with the bucket of the first
+    route pattern (regex matched against the url path) they match. The limiter slows down
+    by itself when the api answers 429 with a Retry-After header, or reports through
+    RateLimit headers that no request is left.
+
+    Example:
+
+    limiter = RateLimiter(rate=10, burst=20, routes={r"/v5/organizations/[^/]+/orders": (2, 2)})
+    api = HaApiV5(..., rate_limiter=limiter)
+    """
+
+    default_retry_after = 1.0
+
+    def __init__(self, rate: float = 10, burst: int = None, routes: dict = None):
+        """
+        :param rate: requests per second allowed by default
+        :param burst: number of requests that can be sent at once (rate by default)
+        :param routes: (optional) {path regex: (rate, burst)} routes with their own bucket
+        """
+        self.log = get_log("apiv5.ratelimit")
+        self.default = TokenBucket(rate, burst)
+        self.routes = [
+            (re.compile(pattern), TokenBucket(*limits))
+            for pattern, limits in (routes or {}).items()
+        ]
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Return the bucket throttling url."""
+        path = urlsplit(url).path
+        for pattern, bucket in self.routes:
+            if pattern.match(path):
+                return bucket
+        return self.default
+
+    def acquire(self, url: str) -> float:
+        """Wait until a request to url is allowed. Return the time waited."""
+        delay = self.bucket(url).reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    async def acquire_async(self, url: str) -> float:
+        """Wait on the event loop until a request to url is allowed. Return the time waited."""
+        delay = self.bucket(url).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return max(delay, 0.0)
+
+    def update(self, url: str, result) -> None:
+        """Slow down according to the status and rate limit headers of a response."""
+        headers = getattr(result, "headers", None)
+        if not hasattr(headers, "get"):
+            return
+        pause = None
+        if result.status_code == 429:
+            pause = self._parse_delay(headers.get("Retry-After"))
+            if pause is None:
+                pause = self.default_retry_after
+        elif self._header(headers, "Remaining") == "0":
+            pause = self._parse_delay(self._header(headers, "Reset"))
+        if pause:
+            self.log.warning(f"Rate limited : pausing {url} for {pause:.2f} sec")
+            self.bucket(url).pause(pause)
+
+    @staticmethod
+    def _header(headers, name: str) -> str:
+        return headers.get(f"X-RateLimit-{name}") or headers.get(f"RateLimit-{name}")
+
+    @staticmethod
+    def _parse_delay(value: str) -> float:
+        """Parse a delay given in seconds, as an epoch timestamp or as an http date."""
+        if not value:
+            return None
+        try:
+            delay = float(value)
+            if delay > 10 ** 9:
+                delay -= time.time()
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return max(delay, 0.0)
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable
+
+from helloasso_api.exceptions import (
+    ApiV5ConnectionError,
+    ApiV5RateLimited,
+    ApiV5ServerError,
+    ApiV5Timeout,
+)
+from helloasso_api.ratelimit import retry_after
+from helloasso_api.utils import get_log
+
+RetryEvent = namedtuple(
+    "RetryEvent", ["method", "sub_path", "attempt", "error", "delay", "elapsed"]
+)
+RetryEvent.__doc__ = """Passed to the on_retry hook before sleeping `delay` seconds.
+`attempt` is the number of the retry (1 for the first one), `elapsed` the time spent on
+the call so far."""
+
+
+class RetryBudget(object):
+    """Cap retries to a ratio of the requests made over a sliding window, so that an
+    outage does not turn into a retry storm. min_retries_per_second keeps low traffic
+    clients able to retry.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_retries_per_second: float = 1, window: float = 10
+    ):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        for timestamps in (self._requests, self._retries):
+            while timestamps and timestamps[0] <= now - self.window:
+                timestamps.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Return True and count a retry if the budget allows it."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            allowed = (
+                self.ratio * len(self._requests)
+                + self.min_retries_per_second * self.window
+            )
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class RetryPolicy(object):
+    """Retry failed calls with exponential backoff and full jitter.
+
+    Only idempotent methods are retried unless retry_methods says otherwise. Rate limited
+    calls (429) are retried whatever their method, the api did not process them, and not
+    before the delay of their Retry-After header: a call asked to wait longer than
+    backoff_max is not retried.
+
+    Example:
+
+    def report(event: RetryEvent):
+        statsd.timing("helloasso.retry_delay", event.delay)
+
+    api = HaApiV5(..., retry_policy=RetryPolicy(max_retries=5, on_retry=report))
+    """
+
+    IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+        retry_on: tuple = (
+            ApiV5ServerError,
+            ApiV5Timeout,
+            ApiV5ConnectionError,
+            ApiV5RateLimited,
+        ),
+        retry_methods: tuple = IDEMPOTENT_METHODS,
+        budget: RetryBudget = None,
+        on_retry: Callable[[RetryEvent], None] = None,
+    ):
+        """
+        :param max_retries: maximum number of retries of a call
+        :param backoff_base: backoff of the first retry in seconds, doubled on each retry
+        :param backoff_max: maximum backoff in seconds
+        :param retry_on: exceptions triggering a retry
+        :param retry_methods: http methods that can be retried
+        :param budget: (optional) RetryBudget, a default one is created if not given
+        :param on_retry: (optional) function called with a RetryEvent before each retry
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = retry_on
+        self.retry_methods = retry_methods
+        self.budget = budget or RetryBudget()
+        self.on_retry = on_retry
+        self.log = get_log("apiv5.retry")
+
+    def backoff(self, attempt: int) -> float:
+        """Return a random delay between 0 and the exponential backoff of attempt."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        )
+
+    def _next_delay(self, method: str, sub_path: str, attempt: int, error, start):
+        """Return the delay before the next retry, None if the call must not be retried."""
+        rate_limited = isinstance(error, ApiV5RateLimited)
+        if attempt >= self.max_retries or (
+            method not in self.retry_methods and not rate_limited
+        ):
+            return None
+        delay = self.backoff(attempt)
+        if rate_limited:
+            delay = max(delay, retry_after(error.result) or 0.0)
+        if delay > self.backoff_max or not self.budget.try_spend():
+            return None
+        self.log.warning(
+            f"Retry {attempt + 1}/{self.max_retries} of {method} {sub_path} in {delay:.2f} sec : {repr(error)}"
+        )
+        if self.on_retry is not None:
+            self.on_retry(
+                RetryEvent(
+                    method, sub_path, attempt + 1, error, delay, time.monotonic() - start
+                )
+            )
+        return delay
+
+    def run(self, func: Callable, method: str, sub_path: str):
+        """Call func until it succeeds or the error cannot be retried."""
+        self.budget.record_request()
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except self.retry_on as error:
+                delay = self._next_delay(method, sub_path, attempt, error, start)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def run_async(self, func: Callable, method: str, sub_path: str):
+        """Await func() until it succeeds or the error cannot be retried."""
+        self.budget.record_request()
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except self.retry_on as error:
+                delay = self._next_delay(method, sub_path, attempt, error, start)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
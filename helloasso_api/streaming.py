@@ -0,0 +1,219 @@
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_NEED_MORE = object()
+
+(
+    _START,
+    _KEY_OR_END,
+    _COLON,
+    _VALUE,
+    _ITEM_OR_END,
+    _ITEM_SEPARATOR,
+    _VALUE_SEPARATOR,
+    _DONE,
+) = range(8)
+
+
+class ArrayMemberParser(object):
+    """Incremental parser of a JSON object whose `key` member is a (large) array.
+
+    Text is fed as it arrives; each complete element of the array is returned as soon as it
+    is parsed, the other members of the object are kept in metadata. Only the text of the
+    element being parsed is buffered.
+    """
+
+    def __init__(self, key: str = "data"):
+        self.key = key
+        self.metadata = {}
+        self.done = False
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = _START
+        self._member = None
+
+    def feed(self, text: str, final: bool = False) -> list:
+        """Parse text and return the array elements it completes.
+        :param final: True for the last piece of text, incomplete json then raises ValueError
+        """
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        items = []
+        while self._step(items, final):
+            pass
+        if final and not self.done:
+            raise ValueError("Incomplete json document")
+        return items
+
+    def _skip_whitespace(self) -> bool:
+        """Move to the next significant character, return False if there is none yet."""
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _expect(self, chars: str) -> str:
+        char = self._buffer[self._pos]
+        if char not in chars:
+            raise ValueError(
+                f"Expecting one of {chars!r} at position {self._pos}, got {char!r}"
+            )
+        self._pos += 1
+        return char
+
+    def _decode(self, final: bool):
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _NEED_MORE
+        if end == len(self._buffer) and not final:
+            # a number may continue in the next piece of text
+            return _NEED_MORE
+        self._pos = end
+        return value
+
+    def _step(self, items: list, final: bool) -> bool:
+        """Parse one token, return False when more text is needed."""
+        if self._state == _DONE or not self._skip_whitespace():
+            return False
+        return self._STEPS[self._state](self, items, final)
+
+    def _end(self) -> bool:
+        self._state = _DONE
+        self.done = True
+        return False
+
+    def _start(self, items: list, final: bool) -> bool:
+        self._expect("{")
+        self._state = _KEY_OR_END
+        return True
+
+    def _key_or_end(self, items: list, final: bool) -> bool:
+        if self._expect('}"') == "}":
+            return self._end()
+        self._pos -= 1
+        member = self._decode(final)
+        if member is _NEED_MORE:
+            return False
+        self._member = member
+        self._state = _COLON
+        return True
+
+    def _colon(self, items: list, final: bool) -> bool:
+        self._expect(":")
+        self._state = _VALUE
+        return True
+
+    def _value(self, items: list, final: bool) -> bool:
+        if self._member == self.key and self._buffer[self._pos] == "[":
+            self._pos += 1
+            self._state = _ITEM_OR_END
+            return True
+        value = self._decode(final)
+        if value is _NEED_MORE:
+            return False
+        self.metadata[self._member] = value
+        self._state = _VALUE_SEPARATOR
+        return True
+
+    def _item_or_end(self, items: list, final: bool) -> bool:
+        if self._buffer[self._pos] == "]":
+            self._pos += 1
+            self._state = _VALUE_SEPARATOR
+            return True
+        item = self._decode(final)
+        if item is _NEED_MORE:
+            return False
+        items.append(item)
+        self._state = _ITEM_SEPARATOR
+        return True
+
+    def _item_separator(self, items: list, final: bool) -> bool:
+        self._state = _ITEM_OR_END if self._expect(",]") == "," else _VALUE_SEPARATOR
+        return True
+
+    def _value_separator(self, items: list, final: bool) -> bool:
+        if self._expect(",}") == "}":
+            return self._end()
+        self._state = _KEY_OR_END
+        return True
+
+    # parsing step of each state, in the order of the state constants
+    _STEPS = (
+        _start,
+        _key_or_end,
+        _colon,
+        _value,
+        _item_or_end,
+        _item_separator,
+        _value_separator,
+    )
+
+
+class JsonArrayStream(object):
+    """Iterate the elements of the `key` array of a streamed JSON response body.
+
+    The other members of the response (pagination...) are available in metadata once the
+    iteration is over.
+
+    Example:
+
+    stream = api.stream("/v5/organizations/my-asso/orders", params={"pageSize": 100})
+    for order in stream:
+        ...
+    continuation_token = stream.pagination["continuationToken"]
+    """
+
+    def __init__(self, chunks, key: str = "data", close=None, encoding: str = "utf-8"):
+        """
+        :param chunks: iterable of bytes (response body)
+        :param key: name of the array member to stream
+        :param close: (optional) function called once the iteration is over
+        :param encoding: encoding of the body
+        """
+        self._chunks = chunks
+        self._close = close
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self.parser = ArrayMemberParser(key)
+
+    @property
+    def metadata(self) -> dict:
+        return self.parser.metadata
+
+    @property
+    def pagination(self) -> dict:
+        return self.parser.metadata.get("pagination")
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                yield from self.parser.feed(self._text.decode(chunk))
+            yield from self.parser.feed(self._text.decode(b"", final=True), final=True)
+        finally:
+            if self._close is not None:
+                self._close()
+
+
+class AsyncJsonArrayStream(JsonArrayStream):
+    """Asyncio version of JsonArrayStream, iterate with `async for`.
+    :param chunks: async iterable of bytes
+    """
+
+    def __iter__(self):
+        raise TypeError("AsyncJsonArrayStream must be iterated with async for")
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._chunks:
+                for item in self.parser.feed(self._text.decode(chunk)):
+                    yield item
+            for item in self.parser.feed(
+                self._text.decode(b"", final=True), final=True
+            ):
+                yield item
+        finally:
+            if self._close is not None:
+                await self._close()
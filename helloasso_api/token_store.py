@@ -0,0 +1,213 @@
+import abc
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from uuid import uuid4
+
+from helloasso_api.exceptions import ApiV5Timeout
+
+
+class TokenPair(namedtuple("TokenPair", ["access_token", "refresh_token"])):
+    """Access and refresh tokens, always read and written together."""
+
+    __slots__ = ()
+
+
+class TokenStore(abc.ABC):
+    """Storage of token pairs, by key (the client_id of a client), shared by every client
+    using the same credentials.
+
+    Pairs are read and written at once, so that a process never sees the access token of a
+    pair with the refresh token of another. Token renewals run under refresh_lock: a process
+    that waited for the lock finds the tokens renewed by the previous holder and uses them
+    instead of refreshing with a refresh token that was already rotated.
+
+    The refresh lock of this base class only excludes the threads of the current process,
+    stores shared between processes override it (see SQLiteTokenStore).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+
+    @abc.abstractmethod
+    def get(self, key: str) -> TokenPair:
+        """Return the token pair stored for key, None if there is none."""
+
+    @abc.abstractmethod
+    def put(self, key: str, pair: TokenPair) -> None:
+        """Store the token pair of key."""
+
+    def compare_and_set(self, key: str, expected: TokenPair, pair: TokenPair) -> bool:
+        """Store pair if the stored pair of key is still expected (None: no pair stored).
+        Return False, storing nothing, if it was changed in the meantime.
+        """
+        with self._lock:
+            if self.get(key) != expected:
+                return False
+            self.put(key, pair)
+            return True
+
+    @contextmanager
+    def refresh_lock(self, key: str, timeout: float = 30):
+        """Hold the lock renewing the tokens of key.
+        :param timeout: seconds to wait for the lock before raising ApiV5Timeout
+        """
+        with self._lock:
+            lock = self._refresh_locks.setdefault(key, threading.Lock())
+        if not lock.acquire(timeout=timeout):
+            raise ApiV5Timeout(f"Token refresh lock of {key} timeout : {timeout} sec")
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+class MemoryTokenStore(TokenStore):
+    """Token store in memory, shared by the clients of a process."""
+
+    def __init__(self):
+        super(MemoryTokenStore, self).__init__()
+        self._pairs = {}
+
+    def get(self, key: str) -> TokenPair:
+        return self._pairs.get(key)
+
+    def put(self, key: str, pair: TokenPair) -> None:
+        self._pairs[key] = TokenPair(*pair)
+
+
+class GetterSetterTokenStore(TokenStore):
+    """Adapt an oauth2_token_getter / oauth2_token_setter pair to the TokenStore interface,
+    the key being passed as their client_id argument.
+    Tokens are still read and written one by one: compare_and_set and refresh_lock are
+    only atomic between the threads of the current process.
+    """
+
+    def __init__(self, getter, setter):
+        super(GetterSetterTokenStore, self).__init__()
+        self.getter = getter
+        self.setter = setter
+
+    def get(self, key: str) -> TokenPair:
+        pair = TokenPair(
+            self.getter("access_token", key), self.getter("refresh_token", key)
+        )
+        if pair.access_token is None and pair.refresh_token is None:
+            return None
+        return pair
+
+    def put(self, key: str, pair: TokenPair) -> None:
+        self.setter("access_token", key, pair.access_token)
+        self.setter("refresh_token", key, pair.refresh_token)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Token store in a SQLite database file, shared by all the processes of a host.
+
+    Pairs are written in transactions. The refresh lock is a row leased for lock_lease
+    seconds, so that a process dying while renewing tokens does not block the others for
+    longer than that.
+    """
+
+    def __init__(self, path: str, lock_lease: float = 30, poll_interval: float = 0.05):
+        """
+        :param path: path of the database file, created if needed
+        :param lock_lease: seconds after which a refresh lock that was not released is
+            considered abandoned
+        :param poll_interval: seconds between two attempts to take the refresh lock
+        """
+        super(SQLiteTokenStore, self).__init__()
+        self.path = path
+        self.lock_lease = lock_lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tokens"
+                " (key TEXT PRIMARY KEY, access_token TEXT, refresh_token TEXT)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS refresh_locks"
+                " (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, sqlite3 connections are not shared."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a transaction holding the database write lock from the start."""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _select(db: sqlite3.Connection, key: str) -> TokenPair:
+        row = db.execute(
+            "SELECT access_token, refresh_token FROM tokens WHERE key = ?", (key,)
+        ).fetchone()
+        return TokenPair(*row) if row is not None else None
+
+    def get(self, key: str) -> TokenPair:
+        return self._select(self._connection(), key)
+
+    def put(self, key: str, pair: TokenPair) -> None:
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)", (key, *pair))
+
+    def compare_and_set(self, key: str, expected: TokenPair, pair: TokenPair) -> bool:
+        with self._transaction() as db:
+            if self._select(db, key) != expected:
+                return False
+            db.execute("INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)", (key, *pair))
+            return True
+
+    def _acquire(self, key: str, owner: str) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM refresh_locks WHERE key = ? AND expires_at <= ?",
+                (key, now),
+            )
+            db.execute(
+                "INSERT OR IGNORE INTO refresh_locks VALUES (?, ?, ?)",
+                (key, owner, now + self.lock_lease),
+            )
+            row = db.execute(
+                "SELECT owner FROM refresh_locks WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] == owner
+
+    def _release(self, key: str, owner: str) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM refresh_locks WHERE key = ? AND owner = ?", (key, owner)
+            )
+
+    @contextmanager
+    def refresh_lock(self, key: str, timeout: float = 30):
+        owner = uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self._acquire(key, owner):
+            if time.monotonic() >= deadline:
+                raise ApiV5Timeout(
+                    f"Token refresh lock of {key} timeout : {timeout} sec"
+                )
+            time.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            self._release(key, owner)
@@ -1,7 +1,72 @@
+import inspect
+import json
 import logging
+import os
+import re
+from base64 import urlsafe_b64decode
+from datetime import datetime
 
 
 def get_log(name: str):
     logger = logging.getLogger(name)
-    logger.addHandler(logging.NullHandler())
+    # loggers are global: add the handler once, not on every client instantiation
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
     return logger
+
+
+def get_base_url(api_base: str) -> str:
+    """Return the root url of the api. https is used unless api_base already has a scheme
+    (useful to target a local server, example: http://localhost:8080).
+    """
+    if "://" in api_base:
+        return api_base.rstrip("/")
+    return f"https://{api_base}"
+
+
+async def maybe_await(value):
+    """Await value if it is awaitable (coroutine returned by an async getter or setter)."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def get_jwt_expiry(token: str) -> float:
+    """Return the exp claim (epoch seconds) of a JWT, None if the token is not a JWT.
+    The signature is not checked: the value is only used to schedule token renewal.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(urlsafe_b64decode(payload))["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write data as json to path so that readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an api date (ISO 8601, up to 7 fractional digits). Naive dates are kept naive."""
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value.strip())
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    value = re.sub(r"([+-]\d{2}):(\d{2})$", r"\1\2", value)
+    for fmt in (
+        "%Y-%m-%dT%H:%M:%S.%f%z",
+        "%Y-%m-%dT%H:%M:%S%z",
+        "%Y-%m-%dT%H:%M:%S.%f",
+        "%Y-%m-%dT%H:%M:%S",
+    ):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date {value!r}")
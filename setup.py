@@ -20,12 +20,14 @@ setup(
     author_email="api.support@helloasso.org",
     maintainer='Helloasso',
     license='MIT License',
-    packages=find_packages(exclude=("tests", "docs")),
+    packages=find_packages(exclude=("tests", "docs", "benchmarks", "benchmarks.*")),
     install_requires=[
         "requests>=2.23.0",
-        "oauthlib~=3.1.0",
-        "requests-oauthlib~=1.3.0",
         "typing_extensions>=3.7.4.2",
     ],
+    extras_require={
+        "async": ["httpx>=0.23.0"],
+        "orjson": ["orjson>=3.6.0"],
+    },
     python_requires=">=3.6",
 )
@@ -1,6 +1,15 @@
 import pytest
 
-from helloasso_api import ApiV5Client, HaApiV5
+from helloasso_api import ApiV5Client, AsyncApiV5Client, HaApiV5
+
+try:
+    import httpx
+except ImportError:  # httpx requires python 3.7, as asyncio.run
+    httpx = None
+
+requires_async = pytest.mark.skipif(
+    httpx is None, reason="the async client requires httpx (python 3.7+)"
+)
 
 
 @pytest.fixture
@@ -15,8 +24,30 @@ def ha_api_v5_client() -> HaApiV5:
 
 
 @pytest.fixture
-def api_v5_client() -> ApiV5Client:
-    return ApiV5Client(
+def make_api_v5_client():
+    """Return a function building an ApiV5 Client, its keyword arguments being added to
+    the client parameters."""
+
+    def make(**kwargs) -> ApiV5Client:
+        return ApiV5Client(
+            api_base="base_api",
+            client_id="client_id_123",
+            client_secret="client_secret_123456",
+            access_token="token",
+            **kwargs
+        )
+
+    return make
+
+
+@pytest.fixture
+def api_v5_client(make_api_v5_client) -> ApiV5Client:
+    return make_api_v5_client()
+
+
+@pytest.fixture
+def async_api_v5_client() -> AsyncApiV5Client:
+    return AsyncApiV5Client(
         api_base="base_api",
         client_id="client_id_123",
         client_secret="client_secret_123456",
@@ -1,7 +1,10 @@
+import asyncio
 from unittest.mock import Mock
 
 from requests import Response
 
+from helloasso_api.exceptions import ApiV5ServerError
+
 
 class FakeResponse(Response):
     def __init__(self, data, status_code=200):
@@ -12,6 +15,17 @@ class FakeResponse(Response):
         return self.data
 
 
+def http_response(
+    status_code: int = 200, content: bytes = b"{}", headers=None
+) -> Response:
+    """Return a requests Response with the given status, body and headers."""
+    result = Response()
+    result.status_code = status_code
+    result._content = content
+    result.headers.update(headers or {})
+    return result
+
+
 class FakeErrorResponse(object):
     def __init__(self, status_code):
         self.request = {"method": 123}
@@ -40,3 +54,52 @@ class IterErrorRaiser(object):
         else:
             self.retry += 1
             return FakeErrorResponse(self.status_code)
+
+
+def fake_async_session(handler):
+    """Return an httpx.AsyncClient answering every request with handler(request)."""
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class FakePagedClient(object):
+    """Serve `total` items by pages, the continuation token being the next item index.
+    Without continuation token, start from the pageIndex page.
+    """
+
+    def __init__(self, total: int, fail_at: int = None):
+        self.total = total
+        self.fail_at = fail_at
+        self.calls = []
+
+    def page(self, params: dict) -> FakeResponse:
+        self.calls.append(params)
+        size = params["pageSize"]
+        start = int(
+            params.get("continuationToken") or (params.get("pageIndex", 1) - 1) * size
+        )
+        if start == self.fail_at:
+            raise ApiV5ServerError(FakeErrorResponse(500))
+        end = min(start + size, self.total)
+        return FakeResponse(
+            {
+                "data": [{"id": i} for i in range(start, end)],
+                "pagination": {
+                    "pageSize": size,
+                    "totalCount": self.total,
+                    "pageIndex": start // size + 1,
+                    "totalPages": -(-self.total // size),
+                    "continuationToken": str(end),
+                },
+            }
+        )
+
+    def call(self, sub_path, params=None):
+        return self.page(params)
+
+
+class FakeAsyncPagedClient(FakePagedClient):
+    async def call(self, sub_path, params=None):
+        await asyncio.sleep(0)
+        return self.page(params)
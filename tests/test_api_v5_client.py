@@ -1,3 +1,5 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, call, patch
 
 import pytest
@@ -25,6 +27,10 @@ from tests.fake_resources.fake_response import (
 )
 
 
+def fake_oauth() -> Mock:
+    return Mock(**{"access_token_needs_renewal.return_value": False})
+
+
 @pytest.mark.parametrize(
     "param",
     [
@@ -68,6 +74,12 @@ def test_api_client_should_initialize_with_base_parameters(fake_oauth: Mock):
                 refresh_token=None,
                 oauth2_token_getter=None,
                 oauth2_token_setter=None,
+                session=client.session,
+                token_renewal_margin=60,
+                refresh_token_lifetime=30 * 24 * 3600,
+                token_cache_ttl=None,
+                metrics=None,
+                token_store=None,
             )
         ]
     )
@@ -101,12 +113,92 @@ def test_api_client_should_initialize_with_tokens_and_token_getters(fake_oauth:
                 refresh_token="refresh",
                 oauth2_token_getter="getter",
                 oauth2_token_setter="setter",
+                session=client.session,
+                token_renewal_margin=60,
+                refresh_token_lifetime=30 * 24 * 3600,
+                token_cache_ttl=None,
+                metrics=None,
+                token_store=None,
             )
         ]
     )
     assert fake_oauth.get_token.call_count == 0
 
 
+@patch("helloasso_api.apiv5client.OAuth2Api")
+def test_api_client_with_lazy_auth_should_get_token_on_first_call(fake_oauth: Mock):
+    fake_oauth.return_value = fake_oauth
+    fake_oauth.access_token = None
+    fake_oauth.access_token_needs_renewal.return_value = False
+    fake_oauth.get_token.side_effect = lambda: setattr(
+        fake_oauth, "access_token", "token"
+    )
+
+    client = ApiV5Client(
+        "base_api", "client_id_123", "client_secret_123456", lazy_auth=True
+    )
+    assert fake_oauth.get_token.call_count == 0
+
+    with patch.object(
+        client.session, "get", Mock(return_value=FakeResponse({}))
+    ) as fake_get:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: client.call("/v5/ping"), range(8)))
+    assert fake_oauth.get_token.call_count == 1
+    assert fake_get.call_args[1]["headers"]["Authorization"] == "Bearer token"
+
+
+def test_api_client_should_configure_connection_pool():
+    client = ApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+        pool_connections=3,
+        pool_maxsize=42,
+        pool_block=True,
+    )
+    adapter = client.session.get_adapter("https://base_api/url")
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 42
+    assert adapter._pool_block is True
+    assert client.session.get_adapter("http://localhost/url") is adapter
+    assert client.oauth.session is client.session
+    assert client.session.headers["Connection"] == "keep-alive"
+
+
+def test_api_client_should_disable_keep_alive():
+    client = ApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+        keep_alive=False,
+    )
+    assert client.session.headers["Connection"] == "close"
+
+
+def test_api_client_should_close_session_on_exit():
+    client = ApiV5Client(
+        "base_api", "client_id_123", "client_secret_123456", access_token="token"
+    )
+    with patch.object(client.session, "close") as fake_close:
+        with client as entered:
+            assert entered is client
+        assert fake_close.call_count == 1
+
+
+def test_prepare_request_should_keep_explicit_scheme():
+    client = ApiV5Client(
+        "http://localhost:8080",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+    )
+    url, *_ = client.prepare_request("/url", None, None, None, None, True)
+    assert url == "http://localhost:8080/url"
+
+
 def test_get_header():
     assert ApiV5Client.header() == {"Content-Type": "application/json"}
 
@@ -152,6 +244,7 @@ def test_prepare_request(fake_oauth, api_v5_client: ApiV5Client):
                 params={"cc": 789},
                 data={"aa": 123},
                 timeout=None,
+                stream=False,
             ),
         ),
         (
@@ -193,8 +286,8 @@ def test_execute_request_should_work(
     params = {"cc": 789}
     headers = {"dd": "321"}
 
-    with patch("helloasso_api.apiv5client.requests") as fake_requests:
-        http_method = getattr(fake_requests, method.lower())
+    with patch.object(api_v5_client, "session") as fake_session:
+        http_method = getattr(fake_session, method.lower())
         http_method.return_value = FakeResponse({"success": "true"})
 
         result = api_v5_client.execute_request(url, method, headers, data, json, params)
@@ -228,9 +321,9 @@ def test_execute_request_should_handle_http_error(
     json = {"bb": 456}
     params = {"cc": 789}
     headers = {"dd": "321"}
-    with patch("helloasso_api.apiv5client.requests") as fake_requests:
+    with patch.object(api_v5_client, "session") as fake_session:
         for status_code in status_codes:
-            fake_requests.post.return_value = FakeErrorResponse(status_code)
+            fake_session.post.return_value = FakeErrorResponse(status_code)
             with pytest.raises(expected_exception):
                 api_v5_client.execute_request(url, "POST", headers, data, json, params)
 
@@ -245,7 +338,7 @@ def test_execute_request_should_raise_error_on_incorrect_http_method(
 
 @patch("helloasso_api.apiv5client.OAuth2Api", Mock())
 def test_execute_request_should_handle_timeout(api_v5_client: ApiV5Client):
-    with patch("helloasso_api.apiv5client.requests.post") as fake_post:
+    with patch.object(api_v5_client.session, "post") as fake_post:
         fake_post.side_effect = Timeout()
         with pytest.raises(ApiV5Timeout):
             api_v5_client.execute_request(None, "POST", None, None, None, None)
@@ -253,7 +346,7 @@ def test_execute_request_should_handle_timeout(api_v5_client: ApiV5Client):
 
 @patch("helloasso_api.apiv5client.OAuth2Api", Mock())
 def test_execute_request_should_handle_connection_error(api_v5_client: ApiV5Client):
-    with patch("helloasso_api.apiv5client.requests.post") as fake_post:
+    with patch.object(api_v5_client.session, "post") as fake_post:
         fake_post.side_effect = requests.exceptions.ConnectionError()
 
         with pytest.raises(ApiV5ConnectionError):
@@ -297,14 +390,15 @@ def test_call_should_work(api_v5_client: ApiV5Client):
                 data,
                 json,
                 params,
+                False,
             )
         ]
     )
 
 
 def test_call_should_handle_401_with_refresh_token(api_v5_client: ApiV5Client):
-    api_v5_client.oauth = Mock()
-    with patch("helloasso_api.apiv5client.requests.get") as fake_get:
+    api_v5_client.oauth = fake_oauth()
+    with patch.object(api_v5_client.session, "get") as fake_get:
         # raise one 401 then 200
         iter_error = IterErrorRaiser(401, max_retry=1)
         fake_get.side_effect = iter_error.get
@@ -318,8 +412,8 @@ def test_call_should_handle_401_with_refresh_token(api_v5_client: ApiV5Client):
 
 
 def test_call_should_handle_401_without_refresh_token(api_v5_client: ApiV5Client):
-    api_v5_client.oauth = Mock()
-    with patch("helloasso_api.apiv5client.requests.get") as fake_get:
+    api_v5_client.oauth = fake_oauth()
+    with patch.object(api_v5_client.session, "get") as fake_get:
         # raise one 401 then 200
         iter_error = IterErrorRaiser(401, max_retry=1)
         fake_get.side_effect = iter_error.get
@@ -333,10 +427,119 @@ def test_call_should_handle_401_without_refresh_token(api_v5_client: ApiV5Client
         assert fake_get.call_count == 2
 
 
+def test_call_should_replay_request_with_renewed_token(api_v5_client: ApiV5Client):
+    api_v5_client.oauth = fake_oauth()
+    api_v5_client.oauth.access_token = "old"
+
+    def refresh_tokens():
+        api_v5_client.oauth.access_token = "new"
+
+    def get(url, headers, **kwargs):
+        if headers["Authorization"] == "Bearer old":
+            return FakeErrorResponse(401)
+        return FakeResponse({})
+
+    api_v5_client.oauth.refresh_tokens.side_effect = refresh_tokens
+    with patch.object(api_v5_client.session, "get", Mock(side_effect=get)) as fake_get:
+        api_v5_client.call("/url", method="GET")
+
+    assert fake_get.call_count == 2
+    assert "auth" not in vars(api_v5_client)
+
+
+def test_call_should_raise_when_replayed_request_is_unauthorized(
+    api_v5_client: ApiV5Client,
+):
+    api_v5_client.oauth = fake_oauth()
+    with patch.object(
+        api_v5_client.session, "get", Mock(return_value=FakeErrorResponse(401))
+    ) as fake_get:
+        with pytest.raises(ApiV5Unauthorized):
+            api_v5_client.call("/url", method="GET")
+    assert fake_get.call_count == 2
+    assert api_v5_client.oauth.refresh_tokens.call_count == 1
+
+
+def test_call_should_refresh_tokens_once_across_threads(api_v5_client: ApiV5Client):
+    api_v5_client.oauth = fake_oauth()
+    api_v5_client.oauth.access_token = "old"
+
+    def refresh_tokens():
+        time.sleep(0.05)
+        api_v5_client.oauth.access_token = "new"
+
+    def get(url, headers, **kwargs):
+        if headers["Authorization"] == "Bearer old":
+            time.sleep(0.01)
+            return FakeErrorResponse(401)
+        return FakeResponse({})
+
+    api_v5_client.oauth.refresh_tokens.side_effect = refresh_tokens
+    with patch.object(api_v5_client.session, "get", Mock(side_effect=get)):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(
+                executor.map(lambda _: api_v5_client.call("/url"), range(32))
+            )
+
+    assert all(result.status_code == 200 for result in results)
+    assert api_v5_client.oauth.refresh_tokens.call_count == 1
+    assert api_v5_client.oauth.get_token.call_count == 0
+
+
+def test_call_should_renew_expiring_token_before_request(api_v5_client: ApiV5Client):
+    api_v5_client.oauth = fake_oauth()
+    api_v5_client.oauth.access_token = "old"
+    api_v5_client.oauth.access_token_needs_renewal.return_value = True
+
+    def refresh_tokens():
+        api_v5_client.oauth.access_token = "new"
+
+    api_v5_client.oauth.refresh_tokens.side_effect = refresh_tokens
+    with patch.object(
+        api_v5_client.session, "get", Mock(return_value=FakeResponse({}))
+    ) as fake_get:
+        api_v5_client.call("/url")
+
+    assert api_v5_client.oauth.refresh_tokens.call_count == 1
+    assert fake_get.call_count == 1
+    assert fake_get.call_args[1]["headers"]["Authorization"] == "Bearer new"
+
+
+def test_renew_tokens_should_read_token_storage_again(api_v5_client: ApiV5Client):
+    api_v5_client.oauth = fake_oauth()
+    api_v5_client.oauth.access_token = "renewed_by_another_process"
+
+    api_v5_client.renew_tokens("Bearer old")
+
+    assert api_v5_client.oauth.invalidate_token_cache.call_count == 1
+    assert api_v5_client.oauth.refresh_tokens.call_count == 0
+
+
+def test_token_refresher_should_renew_in_background(api_v5_client: ApiV5Client):
+    api_v5_client.oauth = fake_oauth()
+    api_v5_client.oauth.access_token = "old"
+    api_v5_client.oauth.access_token_needs_renewal.return_value = True
+    api_v5_client.oauth.access_token_expiry.return_value = None
+
+    def refresh_tokens():
+        api_v5_client.oauth.access_token = "new"
+        api_v5_client.oauth.access_token_needs_renewal.return_value = False
+
+    api_v5_client.oauth.refresh_tokens.side_effect = refresh_tokens
+    api_v5_client.start_token_refresher(min_interval=0.01)
+    time.sleep(0.1)
+    api_v5_client.close()
+
+    assert api_v5_client._token_refresher is None
+    assert api_v5_client.oauth.refresh_tokens.call_count == 1
+    assert api_v5_client.oauth.access_token_needs_renewal.call_count > 2
+
+
 @patch("helloasso_api.apiv5client.OAuth2Api", Mock())
 def test_call_should_let_error_raise(api_v5_client: ApiV5Client):
-    with patch(
-        "helloasso_api.apiv5client.requests.get",
+    with patch.object(
+        api_v5_client.session,
+        "get",
         Mock(return_value=FakeErrorResponse(status_code=444)),
     ):
         with pytest.raises(ApiV5BadRequest):
@@ -0,0 +1,315 @@
+import asyncio
+import json
+from base64 import urlsafe_b64encode
+from unittest.mock import Mock, patch
+
+import pytest
+
+from helloasso_api import AsyncApiV5Client, AsyncHaApiV5
+from helloasso_api.exceptions import (
+    ApiV5BadRequest,
+    ApiV5Conflict,
+    ApiV5ConnectionError,
+    ApiV5Forbidden,
+    ApiV5IncorrectMethod,
+    ApiV5NoConfig,
+    ApiV5NotFound,
+    ApiV5RateLimited,
+    ApiV5ServerError,
+    ApiV5Timeout,
+)
+from tests.fake_resources.fake_response import fake_async_session
+
+httpx = pytest.importorskip("httpx")
+
+
+def use_handler(client: AsyncApiV5Client, handler) -> Mock:
+    handler = Mock(side_effect=handler)
+    client.session = client.oauth.session = fake_async_session(handler)
+    return handler
+
+
+def token_response(access_token: str, refresh_token: str) -> httpx.Response:
+    return httpx.Response(
+        200,
+        json={
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": 1800,
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "param",
+    [
+        {"api_base": None},
+        {"client_id": None},
+        {"client_secret": None},
+        {"oauth2_token_getter": "something", "oauth2_token_setter": None},
+    ],
+)
+def test_async_client_should_raise_error_on_missing_param(param):
+    parameters = {
+        "api_base": "base_api",
+        "client_id": "client_id_123",
+        "client_secret": "client_secret_123456",
+    }
+    parameters.update(param)
+    with pytest.raises(ApiV5NoConfig):
+        AsyncApiV5Client(**parameters)
+
+
+def test_async_call_should_work(async_api_v5_client: AsyncApiV5Client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url == "https://base_api/url?cc=789"
+        assert request.headers["Authorization"] == "Bearer token"
+        assert request.headers["dd"] == "321"
+        assert json.loads(request.content) == {"bb": 456}
+        return httpx.Response(200, json={"success": "true"})
+
+    handler = use_handler(async_api_v5_client, handler)
+
+    result = asyncio.run(
+        async_api_v5_client.call(
+            "/url", {"cc": 789}, "POST", json={"bb": 456}, headers={"dd": "321"}
+        )
+    )
+
+    assert result.status_code == 200
+    assert result.json() == {"success": "true"}
+    assert handler.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "status_codes, expected_exception",
+    [
+        ([404, 410], ApiV5NotFound),
+        ([403], ApiV5Forbidden),
+        ([409], ApiV5Conflict),
+        ([429], ApiV5RateLimited),
+        ([400, 402, 444, 499, 501], ApiV5BadRequest),
+        ([500, 502, 666], ApiV5ServerError),
+    ],
+)
+def test_async_execute_request_should_handle_http_error(
+    status_codes, expected_exception, async_api_v5_client: AsyncApiV5Client
+):
+    for status_code in status_codes:
+        use_handler(async_api_v5_client, lambda request: httpx.Response(status_code))
+        with pytest.raises(expected_exception):
+            asyncio.run(
+                async_api_v5_client.execute_request(
+                    "https://base_api/url", "GET", {}, {}, {}, {}
+                )
+            )
+
+
+@pytest.mark.parametrize(
+    "error, expected_exception",
+    [
+        (httpx.ReadTimeout("timeout"), ApiV5Timeout),
+        (httpx.ConnectError("unknown host"), ApiV5ConnectionError),
+    ],
+)
+def test_async_execute_request_should_map_transport_errors(
+    error, expected_exception, async_api_v5_client: AsyncApiV5Client
+):
+    def handler(request):
+        raise error
+
+    use_handler(async_api_v5_client, handler)
+    with pytest.raises(expected_exception):
+        asyncio.run(
+            async_api_v5_client.execute_request(
+                "https://base_api/url", "GET", {}, {}, {}, {}
+            )
+        )
+
+
+def test_async_execute_request_should_raise_error_on_incorrect_http_method(
+    async_api_v5_client: AsyncApiV5Client,
+):
+    with pytest.raises(ApiV5IncorrectMethod):
+        asyncio.run(async_api_v5_client.execute_request(None, "TOTO", {}, {}, {}, {}))
+
+
+def test_async_call_should_refresh_token_on_401(async_api_v5_client: AsyncApiV5Client):
+    async_api_v5_client.oauth.refresh_token = "refresh"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth2/token":
+            assert b"grant_type=refresh_token" in request.content
+            assert b"refresh_token=refresh" in request.content
+            return token_response("new_token", "new_refresh")
+        if request.headers["Authorization"] == "Bearer token":
+            return httpx.Response(401)
+        return httpx.Response(200, json={})
+
+    handler = use_handler(async_api_v5_client, handler)
+
+    result = asyncio.run(async_api_v5_client.call("/url"))
+
+    assert result.status_code == 200
+    assert handler.call_count == 3
+    assert async_api_v5_client.oauth.access_token == "new_token"
+    assert async_api_v5_client.oauth.refresh_token == "new_refresh"
+
+
+def test_async_call_should_get_token_on_first_call():
+    client = AsyncApiV5Client("base_api", "client_id_123", "client_secret_123456")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth2/token":
+            assert b"grant_type=client_credentials" in request.content
+            assert request.headers["Authorization"].startswith("Basic ")
+            return token_response("access", "refresh")
+        assert request.headers["Authorization"] == "Bearer access"
+        return httpx.Response(200, json={})
+
+    handler = use_handler(client, handler)
+
+    asyncio.run(client.call("/url"))
+
+    assert handler.call_count == 2
+
+
+def test_async_call_should_use_async_token_getter_and_setter():
+    storage = {"access_token": "stored_token"}
+
+    async def getter(token_key, client_id):
+        return storage.get(token_key)
+
+    async def setter(token_key, client_id, token):
+        storage[token_key] = token
+
+    client = AsyncApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        oauth2_token_getter=getter,
+        oauth2_token_setter=setter,
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer stored_token"
+        return httpx.Response(200, json={})
+
+    use_handler(client, handler)
+
+    asyncio.run(client.call("/url"))
+    asyncio.run(client.set_refresh_token("refresh"))
+
+    assert storage["refresh_token"] == "refresh"
+
+
+def jwt(expires_at: float) -> str:
+    claims = json.dumps({"exp": expires_at}).encode()
+    return f"header.{urlsafe_b64encode(claims).decode()}.signature"
+
+
+def test_async_clients_sharing_a_getter_should_refresh_once():
+    clock = [2780.0]
+    storage = {"access_token": jwt(2800), "refresh_token": "refresh"}
+    grants = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/oauth2/token"):
+            grants.append(request.content)
+            return token_response(jwt(clock[0] + 1800), "new_refresh")
+        assert request.headers["Authorization"] == f"Bearer {storage['access_token']}"
+        return httpx.Response(200, json={})
+
+    def new_client() -> AsyncApiV5Client:
+        # both clients start with a local copy of the stored tokens
+        client = AsyncApiV5Client(
+            "base_api",
+            "client_id_123",
+            "client_secret_123456",
+            access_token=storage["access_token"],
+            refresh_token=storage["refresh_token"],
+            oauth2_token_getter=lambda token_key, client_id: storage.get(token_key),
+            oauth2_token_setter=lambda token_key, client_id, token: storage.update(
+                {token_key: token}
+            ),
+        )
+        use_handler(client, handler)
+        return client
+
+    async def run():
+        first, second = new_client(), new_client()
+        await first.call("/url")  # the shared token expires soon: refreshed
+        await second.call("/url")  # uses the refreshed token, its copy is stale
+        await first.close()
+        await second.close()
+
+    with patch("helloasso_api.oauth2.time.time", lambda: clock[0]):
+        asyncio.run(run())
+    assert len(grants) == 1
+    assert b"grant_type=refresh_token" in grants[0]
+
+
+def test_async_authorization_exchange_authorization_token():
+    api = AsyncHaApiV5(
+        "api.base_api", "client_id_123", "client_secret_123456", access_token="token"
+    )
+    payload = {
+        "access_token": "access_token",
+        "refresh_token": "refresh_token",
+        "token_type": "token_type",
+        "expires_in": "expires_in",
+        "organization_slug": "organization_slug",
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "Authorization" not in request.headers
+        assert b"grant_type=authorization_code" in request.content
+        return httpx.Response(200, json=payload)
+
+    use_handler(api, handler)
+
+    response = asyncio.run(
+        api.authorization.exchange_authorization_token("123456", "redirect", "abcd")
+    )
+
+    assert response == payload
+
+
+def test_async_client_should_close_session():
+    async def run():
+        async with AsyncApiV5Client(
+            "base_api", "client_id_123", "client_secret_123456"
+        ) as client:
+            pass
+        return client
+
+    assert asyncio.run(run()).session.is_closed
+
+
+def test_async_call_should_refresh_tokens_once_across_coroutines(
+    async_api_v5_client: AsyncApiV5Client,
+):
+    async_api_v5_client.oauth.refresh_token = "refresh"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth2/token":
+            return token_response("new_token", "new_refresh")
+        if request.headers["Authorization"] == "Bearer token":
+            return httpx.Response(401)
+        return httpx.Response(200, json={})
+
+    handler = use_handler(async_api_v5_client, handler)
+
+    async def run():
+        return await asyncio.gather(
+            *(async_api_v5_client.call("/url") for _ in range(50))
+        )
+
+    results = asyncio.run(run())
+
+    assert all(result.status_code == 200 for result in results)
+    token_calls = [
+        c for c in handler.call_args_list if c[0][0].url.path == "/oauth2/token"
+    ]
+    assert len(token_calls) == 1
@@ -0,0 +1,85 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from helloasso_api.async_oauth2 import AsyncOAuth2Api, parse_token_response
+from helloasso_api.exceptions import ApiV5AuthenticationError, Apiv5ExceptionError
+from tests.fake_resources.fake_response import fake_async_session
+
+httpx = pytest.importorskip("httpx")
+
+
+def get_oauth(handler) -> AsyncOAuth2Api:
+    return AsyncOAuth2Api(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        123,
+        session=fake_async_session(Mock(side_effect=handler)),
+    )
+
+
+@pytest.mark.parametrize(
+    "response, expected_exception",
+    [
+        (
+            httpx.Response(400, json={"error": "unauthorized_client"}),
+            ApiV5AuthenticationError,
+        ),
+        (httpx.Response(400, json={"error": "invalid_grant"}), Apiv5ExceptionError),
+        (httpx.Response(500, text="oops"), Apiv5ExceptionError),
+        (httpx.Response(200, json={}), Apiv5ExceptionError),
+    ],
+)
+def test_parse_token_response_should_map_errors(response, expected_exception):
+    with pytest.raises(expected_exception):
+        parse_token_response(response)
+
+
+def test_async_refresh_tokens_should_reset_and_get_token_on_access_denied():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if b"grant_type=refresh_token" in request.content:
+            return httpx.Response(400, json={"error": "access_denied"})
+        return httpx.Response(
+            200, json={"access_token": "access", "refresh_token": "refresh"}
+        )
+
+    oauth = get_oauth(handler)
+    oauth.refresh_token = "revoked"
+
+    asyncio.run(oauth.refresh_tokens())
+
+    assert oauth.access_token == "access"
+    assert oauth.refresh_token == "refresh"
+
+
+def test_async_refresh_tokens_should_get_token_without_refresh_token():
+    oauth = get_oauth(
+        lambda request: httpx.Response(
+            200, json={"access_token": "access", "refresh_token": "refresh"}
+        )
+    )
+    oauth.access_token = "expired"
+
+    asyncio.run(oauth.refresh_tokens())
+
+    assert oauth.access_token == "access"
+    assert oauth.session._transport.handler.call_count == 1
+
+
+def raise_error(request: httpx.Request):
+    raise RuntimeError("unexpected")
+
+
+@pytest.mark.parametrize("method", ["get_token", "refresh_tokens"])
+@pytest.mark.parametrize(
+    "handler",
+    [lambda request: httpx.Response(200, json=["not", "a", "token"]), raise_error],
+)
+def test_async_token_requests_should_wrap_unexpected_errors(method, handler):
+    oauth = get_oauth(handler)
+    oauth.refresh_token = "refresh"
+
+    with pytest.raises(Apiv5ExceptionError):
+        asyncio.run(getattr(oauth, method)())
@@ -4,8 +4,8 @@ from urllib.parse import urlparse
 import pytest
 
 from helloasso_api import HaApiV5
-from helloasso_api.exceptions import Apiv5ValueError
-from tests.fake_resources.fake_response import FakeResponse
+from helloasso_api.exceptions import ApiV5BadRequest, Apiv5ValueError
+from tests.fake_resources.fake_response import FakeErrorResponse, FakeResponse
 
 
 def test_authorization_generate_authorize_request(ha_api_v5_client: HaApiV5):
@@ -38,9 +38,9 @@ def test_authorization_generate_authorize_request_should_raise_exception_on_inco
         ha_api_v5_client.authorization.generate_authorize_request("redirect", state)
 
 
-@patch("helloasso_api.apiv5client.ApiV5Client.call")
+@patch("helloasso_api.oauth2.OAuth2Api.request_token")
 def test_authorization_exchange_authorization_token(
-    fake_call: Mock, ha_api_v5_client: HaApiV5
+    fake_request_token: Mock, ha_api_v5_client: HaApiV5
 ):
     fake_response = {
         "access_token": "access_token",
@@ -49,7 +49,7 @@ def test_authorization_exchange_authorization_token(
         "expires_in": "expires_in",
         "organization_slug": "organization_slug",
     }
-    fake_call.return_value = FakeResponse(fake_response)
+    fake_request_token.return_value = FakeResponse(fake_response)
 
     response = ha_api_v5_client.authorization.exchange_authorization_token(
         "123456", "redirect", "abcd"
@@ -57,22 +57,29 @@ def test_authorization_exchange_authorization_token(
 
     assert response == fake_response
 
-    assert fake_call.call_count == 1
-    fake_call.assert_has_calls(
+    assert fake_request_token.call_count == 1
+    fake_request_token.assert_has_calls(
         [
             call(
-                "/oauth2/token",
-                method="POST",
-                data={
+                {
                     "client_id": "client_id_123",
                     "client_secret": "client_secret_123456",
                     "grant_type": "authorization_code",
                     "code": "123456",
                     "redirect_uri": "redirect",
                     "code_verifier": "abcd",
-                },
-                headers={"content-type": "application/x-www-form-urlencoded"},
-                include_auth=False,
+                }
             )
         ]
     )
+
+
+@patch("helloasso_api.oauth2.OAuth2Api.request_token")
+def test_authorization_exchange_authorization_token_should_map_http_errors(
+    fake_request_token: Mock, ha_api_v5_client: HaApiV5
+):
+    fake_request_token.return_value = FakeErrorResponse(400)
+    with pytest.raises(ApiV5BadRequest):
+        ha_api_v5_client.authorization.exchange_authorization_token(
+            "123456", "redirect", "abcd"
+        )
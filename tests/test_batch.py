@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+from helloasso_api import ApiV5Client, AsyncApiV5Client
+from helloasso_api.batch import CallResult, call_many, call_many_as_completed
+from helloasso_api.exceptions import ApiV5NotFound
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import (
+    FakeErrorResponse,
+    FakeResponse,
+    fake_async_session,
+)
+
+
+class SlowClient(object):
+    """Answer after `delay` seconds, track the number of concurrent calls."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def call(self, sub_path, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        if sub_path == "/missing":
+            raise ApiV5NotFound(FakeErrorResponse(404))
+        return FakeResponse({"path": sub_path, **kwargs})
+
+
+def test_call_many_should_return_results_in_order():
+    client = SlowClient()
+    calls = [f"/forms/{i}" for i in range(20)]
+    calls.insert(3, {"sub_path": "/missing"})
+    calls.append({"sub_path": "/forms", "params": {"pageSize": 10}})
+
+    start = time.monotonic()
+    results = call_many(client, calls=calls, max_concurrency=8)
+    elapsed = time.monotonic() - start
+
+    assert [result.index for result in results] == list(range(22))
+    assert results[0].response.json() == {"path": "/forms/0"}
+    assert results[-1].response.json() == {"path": "/forms", "params": {"pageSize": 10}}
+    assert not results[3].ok
+    assert isinstance(results[3].error, ApiV5NotFound)
+    assert results[3].request == {"sub_path": "/missing"}
+    assert all(result.ok for i, result in enumerate(results) if i != 3)
+    assert client.max_running == 8
+    assert elapsed < 22 * client.delay / 2
+
+
+def test_call_many_as_completed_should_yield_every_result():
+    client = SlowClient()
+    results = list(call_many_as_completed(client, ["/a", "/missing", "/b"], 2))
+    assert sorted(result.index for result in results) == [0, 1, 2]
+    assert all(isinstance(result, CallResult) for result in results)
+
+
+def test_client_call_many_should_share_the_client():
+    client = ApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+        pool_maxsize=4,
+    )
+    client.session.get = Mock(return_value=FakeResponse({}))
+    results = client.call_many(["/a", "/b", "/c"])
+    assert [result.ok for result in results] == [True, True, True]
+    assert client.session.get.call_count == 3
+
+
+@requires_async
+def test_async_call_many_should_bound_concurrency():
+    client = AsyncApiV5Client(
+        "base_api", "client_id_123", "client_secret_123456", access_token="token"
+    )
+    running = []
+    max_running = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        running.append(1)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        if request.url.path == "/missing":
+            return httpx.Response(404, request=request)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    client.session = fake_async_session(handler)
+
+    async def run():
+        results = await client.call_many(
+            [f"/forms/{i}" for i in range(50)] + ["/missing"], max_concurrency=10
+        )
+        completed = [
+            result async for result in client.call_many_as_completed(["/a", "/b"])
+        ]
+        return results, completed
+
+    results, completed = asyncio.run(run())
+
+    assert [result.response.json()["path"] for result in results[:50]] == [
+        f"/forms/{i}" for i in range(50)
+    ]
+    assert isinstance(results[50].error, ApiV5NotFound)
+    assert max(max_running) == 10
+    assert sorted(result.index for result in completed) == [0, 1]
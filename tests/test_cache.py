@@ -0,0 +1,49 @@
+from unittest.mock import Mock, patch
+
+from helloasso_api.cache import TTLCache
+
+
+@patch("helloasso_api.cache.time.monotonic")
+def test_ttl_cache_should_expire_entries(fake_monotonic: Mock):
+    fake_monotonic.return_value = 100
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    cache.set("c", 3, ttl=50)
+
+    fake_monotonic.return_value = 106
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    fake_monotonic.return_value = 111
+    assert cache.get("c", "default") == "default"
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+def test_ttl_cache_should_evict_least_recently_used():
+    cache = TTLCache(ttl=10, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_should_report_evicted_entries():
+    evicted = []
+    cache = TTLCache(ttl=10, maxsize=2, on_evict=lambda *entry: evicted.append(entry))
+    for key in "abc":
+        cache.set(key, key.upper())
+    assert evicted == [("a", "A")]
+
+
+def test_ttl_cache_should_invalidate():
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.invalidate()
+    assert len(cache) == 0
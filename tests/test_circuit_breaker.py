@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+from helloasso_api import ApiV5Client, AsyncApiV5Client, CircuitBreaker, MetricsRegistry
+from helloasso_api.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from helloasso_api.exceptions import (
+    ApiV5CircuitOpen,
+    ApiV5NotFound,
+    ApiV5ServerError,
+    ApiV5Timeout,
+)
+from helloasso_api.mock_server import MockApi
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import FakeErrorResponse, fake_async_session
+
+ORDERS = "https://api.helloasso.com/v5/organizations/asso-1/orders"
+OTHER_ORDERS = "https://api.helloasso.com/v5/organizations/asso-2/orders"
+FORMS = "https://api.helloasso.com/v5/organizations/asso-1/forms"
+ROUTE = "/v5/organizations/{organizationSlug}/orders"
+
+
+def calls(breaker, url, count, duration=0.01, error=None):
+    for _ in range(count):
+        breaker.record(breaker.acquire(url), duration, error)
+
+
+def test_failures_should_open_the_circuit_of_the_route():
+    events = []
+    breaker = CircuitBreaker(
+        window_size=10, minimum_calls=4, on_state_change=events.append
+    )
+    calls(breaker, ORDERS, 2)
+    calls(breaker, ORDERS, 1, error=ApiV5Timeout("timeout"))
+    assert breaker.state(ORDERS) == CLOSED
+    calls(breaker, ORDERS, 1, error=ApiV5Timeout("timeout"))
+    assert breaker.state(OTHER_ORDERS) == OPEN
+    assert breaker.state(FORMS) == CLOSED
+    assert [tuple(event) for event in events] == [(ROUTE, CLOSED, OPEN, 0.5, 0.0)]
+    with pytest.raises(ApiV5CircuitOpen):
+        breaker.acquire(OTHER_ORDERS)
+    breaker.acquire(FORMS)
+    assert breaker.rejected == 1
+
+
+def test_api_answers_should_not_count_as_failures():
+    breaker = CircuitBreaker(window_size=4, minimum_calls=4)
+    calls(breaker, ORDERS, 4, error=ApiV5NotFound(FakeErrorResponse(404)))
+    calls(breaker, ORDERS, 4, error=ValueError("bad json"))
+    assert breaker.state(ORDERS) == CLOSED
+    assert breaker.stats()["routes"][ROUTE]["failure_rate"] == 0.0
+
+
+def test_slow_calls_should_open_the_circuit():
+    breaker = CircuitBreaker(
+        window_size=4,
+        minimum_calls=4,
+        slow_call_duration=1,
+        slow_call_rate_threshold=0.75,
+    )
+    calls(breaker, ORDERS, 2, duration=2)
+    calls(breaker, ORDERS, 2)
+    assert breaker.state(ORDERS) == CLOSED
+    calls(breaker, ORDERS, 2, duration=2)
+    assert breaker.state(ORDERS) == CLOSED
+    # the first slow calls left the window
+    calls(breaker, ORDERS, 1, duration=2)
+    assert breaker.state(ORDERS) == OPEN
+
+
+def test_half_open_circuit_should_probe_then_close():
+    events = []
+    breaker = CircuitBreaker(
+        window_size=2,
+        minimum_calls=2,
+        open_duration=0.05,
+        half_open_calls=2,
+        on_state_change=events.append,
+    )
+    calls(breaker, ORDERS, 2, error=ApiV5Timeout("timeout"))
+    time.sleep(0.06)
+    first, second = breaker.acquire(ORDERS), breaker.acquire(ORDERS)
+    assert breaker.state(ORDERS) == HALF_OPEN
+    with pytest.raises(ApiV5CircuitOpen):
+        breaker.acquire(ORDERS)
+    breaker.record(first, 0.01)
+    breaker.record(second, 0.01)
+    assert breaker.state(ORDERS) == CLOSED
+    assert [event.new_state for event in events] == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_failed_probe_should_open_the_circuit_again():
+    breaker = CircuitBreaker(
+        window_size=2, minimum_calls=2, open_duration=0.05, half_open_calls=2
+    )
+    calls(breaker, ORDERS, 2, error=ApiV5Timeout("timeout"))
+    time.sleep(0.06)
+    cancelled = breaker.acquire(ORDERS)
+    breaker.record(cancelled, 0.01, KeyboardInterrupt())
+    probe = breaker.acquire(ORDERS)
+    late = breaker.acquire(ORDERS)
+    breaker.record(probe, 0.01, ApiV5Timeout("timeout"))
+    assert breaker.state(ORDERS) == OPEN
+    # a probe landing after the circuit opened again is not counted
+    breaker.record(late, 0.01)
+    assert breaker.stats()["routes"][ROUTE] == {
+        "state": OPEN,
+        "calls": 0,
+        "failure_rate": 0.0,
+        "slow_call_rate": 0.0,
+    }
+
+
+def test_closed_circuits_should_be_dropped_beyond_max_routes():
+    users = "https://api.helloasso.com/v5/users/me/organizations"
+    breaker = CircuitBreaker(window_size=2, minimum_calls=2, max_routes=2)
+    calls(breaker, ORDERS, 2, error=ApiV5Timeout("timeout"))
+    permit = breaker.acquire(FORMS)
+    calls(breaker, users, 1)
+    assert list(breaker.stats()["routes"]) == [ROUTE, "/v5/users/me/organizations"]
+    # the outcome of a call to a dropped circuit is not recorded
+    breaker.record(permit, 0.01, ApiV5Timeout("timeout"))
+    assert len(breaker.stats()["routes"]) == 2
+    # open circuits are kept beyond max_routes
+    calls(breaker, users, 1, error=ApiV5Timeout("timeout"))
+    calls(breaker, FORMS, 1)
+    assert breaker.state(ORDERS) == breaker.state(users) == OPEN
+    assert len(breaker.stats()["routes"]) == 3
+
+
+def test_client_should_fail_fast_while_the_circuit_is_open():
+    breaker = CircuitBreaker(window_size=4, minimum_calls=4)
+    metrics = MetricsRegistry()
+    with MockApi(error_rate=1.0, error_statuses=(503,)) as mock:
+        client = ApiV5Client(
+            api_base=mock.api_base,
+            client_id="client_id",
+            client_secret="client_secret",
+            circuit_breaker=breaker,
+            metrics=metrics,
+        )
+        for _ in range(4):
+            with pytest.raises(ApiV5ServerError):
+                client.call("/v5/organizations/mock-asso")
+        for _ in range(10):
+            with pytest.raises(ApiV5CircuitOpen):
+                client.call("/v5/organizations/mock-asso")
+        stats = mock.stats()
+    assert stats["status_503"] == 4
+    gauges = metrics.snapshot()["gauges"]
+    assert gauges["circuit_breaker_state"] == [
+        ({"route": "/v5/organizations/{organizationSlug}"}, 2)
+    ]
+    assert gauges["circuit_breaker_rejected_calls_total"] == [({}, 10)]
+
+
+def test_organization_clients_should_share_the_circuit_breaker():
+    breaker = CircuitBreaker()
+    client = ApiV5Client(
+        api_base="base_api",
+        client_id="client_id",
+        client_secret="client_secret",
+        access_token="token",
+        circuit_breaker=breaker,
+    )
+    organization = client.for_organization("asso-1", access_token="token-1")
+    assert organization.circuit_breaker is breaker
+
+
+@requires_async
+def test_async_client_should_fail_fast_while_the_circuit_is_open():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        raise httpx.ConnectTimeout("timeout", request=request)
+
+    async def run():
+        client = AsyncApiV5Client(
+            api_base="base_api",
+            client_id="client_id",
+            client_secret="client_secret",
+            access_token="token",
+            circuit_breaker=CircuitBreaker(window_size=2, minimum_calls=2),
+        )
+        client.session = client.oauth.session = fake_async_session(handler)
+        errors = []
+        for _ in range(5):
+            try:
+                await client.call("/v5/organizations/mock-asso")
+            except (ApiV5Timeout, ApiV5CircuitOpen) as e:
+                errors.append(type(e))
+        await client.close()
+        return errors
+
+    errors = asyncio.run(run())
+    assert errors == [ApiV5Timeout] * 2 + [ApiV5CircuitOpen] * 3
+    assert len(requests) == 2
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+from helloasso_api import (
+    ApiV5Client,
+    AsyncApiV5Client,
+    MetricsRegistry,
+    RequestCoalescer,
+)
+from helloasso_api.exceptions import ApiV5Timeout
+from helloasso_api.mock_server import MockApi, constant_latency
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import fake_async_session
+
+ORGANIZATION = "/v5/organizations/mock-asso"
+
+
+def test_identical_gets_should_share_one_request():
+    coalescer = RequestCoalescer()
+    metrics = MetricsRegistry()
+    with MockApi(latency=constant_latency(100)) as mock:
+        client = ApiV5Client(
+            api_base=mock.api_base,
+            client_id="client_id",
+            client_secret="client_secret",
+            coalescer=coalescer,
+            metrics=metrics,
+        )
+        results = client.call_many([ORGANIZATION] * 8, max_concurrency=8)
+        client.call(ORGANIZATION, params={"other": 1})
+    bodies = [result.response.json() for result in results]
+    assert all(body == bodies[0] for body in bodies)
+    assert len({id(body) for body in bodies}) == 8
+    assert len({id(result.response) for result in results}) == 8
+    assert coalescer.stats()["requests"] == 9
+    assert coalescer.stats()["coalesced"] >= 4
+    assert mock.stats()["status_200"] == 1 + 9 - coalescer.coalesced
+    assert len(coalescer) == 0
+    gauges = metrics.snapshot()["gauges"]
+    assert gauges["coalescer_coalesced_requests_total"] == [({}, coalescer.coalesced)]
+
+
+def test_coalesced_callers_should_get_the_error():
+    coalescer = RequestCoalescer()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def send():
+        started.set()
+        release.wait()
+        raise ApiV5Timeout("timeout")
+
+    def call(send):
+        try:
+            coalescer.run("key", send, lambda result: result)
+        except ApiV5Timeout as e:
+            errors.append(e)
+
+    def follow():
+        call(lambda: "not called")
+
+    leader = threading.Thread(target=call, args=(send,))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=follow) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while coalescer.requests < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert len(errors) == 4
+    assert coalescer.stats()["coalescing_rate"] == 0.75
+
+
+def test_requests_of_different_tokens_should_not_be_coalesced():
+    key = RequestCoalescer.key
+    assert key("url", {"a": 1}, "Bearer 1") == key("url", {"a": "1"}, "Bearer 1")
+    assert key("url", {"a": 1}, "Bearer 1") != key("url", {"a": 1}, "Bearer 2")
+    assert key("url", {"a": 1}, "Bearer 1") != key("url", {"a": 2}, "Bearer 1")
+
+
+@requires_async
+def test_async_identical_gets_should_share_one_request():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"organizationSlug": "mock-asso"})
+
+    async def run():
+        client = AsyncApiV5Client(
+            api_base="base_api",
+            client_id="client_id",
+            client_secret="client_secret",
+            access_token="token",
+            coalescer=RequestCoalescer(),
+        )
+        client.session = client.oauth.session = fake_async_session(handler)
+        results = await asyncio.gather(*(client.call(ORGANIZATION) for _ in range(5)))
+        await client.close()
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert len(requests) == 1
+    assert [result.json() for result in results] == [
+        {"organizationSlug": "mock-asso"}
+    ] * 5
+    assert len({id(result) for result in results}) == 5
+    assert client.coalescer.stats()["coalesced"] == 4
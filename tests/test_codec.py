@@ -0,0 +1,111 @@
+import asyncio
+import gc
+import json
+import weakref
+from unittest.mock import Mock, patch
+
+import pytest
+
+from helloasso_api import AsyncApiV5Client
+from helloasso_api.codec import JsonCodec, OrjsonCodec, get_codec, orjson
+from helloasso_api.exceptions import ApiV5NoConfig
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import fake_async_session, http_response
+
+requires_orjson = pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+
+
+def test_get_codec():
+    assert get_codec(None) is None
+    assert isinstance(get_codec("json"), JsonCodec)
+    assert isinstance(
+        get_codec("auto"), OrjsonCodec if orjson is not None else JsonCodec
+    )
+    codec = JsonCodec()
+    assert get_codec(codec) is codec
+    with pytest.raises(ApiV5NoConfig):
+        get_codec("yaml")
+
+
+@patch("helloasso_api.codec.orjson", None)
+def test_get_codec_should_fall_back_to_json_module():
+    assert type(get_codec("auto")) is JsonCodec
+    with pytest.raises(ApiV5NoConfig):
+        get_codec("orjson")
+
+
+@pytest.mark.parametrize(
+    "name", ["json", pytest.param("orjson", marks=requires_orjson)]
+)
+def test_codecs_should_round_trip(name):
+    codec = get_codec(name)
+    data = {"name": "Fête", "amount": 1000, "items": [{"id": 1}], "paid": True}
+    assert json.loads(codec.dumps(data)) == data
+    assert codec.loads(codec.dumps(data)) == data
+    assert codec.encode(b'{"a":1}') == b'{"a":1}'
+    assert codec.encode('{"a":1}') == b'{"a":1}'
+
+
+@requires_orjson
+def test_client_should_encode_payloads_with_codec(make_api_v5_client):
+    client = make_api_v5_client(json_codec="orjson")
+    with patch.object(
+        client.session, "post", Mock(return_value=http_response())
+    ) as post:
+        client.call("/url", method="POST", json={"amount": 1000})
+    assert post.call_args[1]["data"] == b'{"amount":1000}'
+    assert post.call_args[1]["json"] is None
+
+
+def test_client_should_send_serialized_payloads_as_they_are(make_api_v5_client):
+    client = make_api_v5_client(json_codec=None)
+    with patch.object(
+        client.session, "post", Mock(return_value=http_response())
+    ) as post:
+        client.call("/url", method="POST", json=b'{"amount": 1000}')
+    assert post.call_args[1]["data"] == b'{"amount": 1000}'
+
+
+def test_client_should_decode_responses_with_codec(make_api_v5_client):
+    codec = JsonCodec()
+    codec.loads = Mock(return_value={"decoded": True})
+    client = make_api_v5_client(json_codec=codec)
+    with patch.object(client.session, "get", Mock(return_value=http_response())):
+        assert client.call("/url").json() == {"decoded": True}
+    codec.loads.assert_called_once_with(b"{}")
+
+
+def test_decoded_responses_should_be_freed_without_garbage_collection():
+    result = JsonCodec().decode_response(http_response(content=b'{"id": 1}'))
+    assert result.json() == {"id": 1}
+    freed = weakref.ref(result)
+    gc.disable()
+    try:
+        del result
+        assert freed() is None
+    finally:
+        gc.enable()
+
+
+@requires_async
+@requires_orjson
+def test_async_client_should_use_codec():
+    client = AsyncApiV5Client(
+        api_base="base_api",
+        client_id="client_id_123",
+        client_secret="client_secret_123456",
+        access_token="token",
+        json_codec="orjson",
+    )
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=b'{"id": 1}')
+
+    client.session = client.oauth.session = fake_async_session(handler)
+
+    result = asyncio.run(client.call("/url", method="POST", json={"amount": 1000}))
+    assert result.json() == {"id": 1}
+    assert requests[0].content == b'{"amount":1000}'
+    assert requests[0].headers["Content-Type"] == "application/json"
@@ -0,0 +1,121 @@
+import csv
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from helloasso_api.exceptions import ApiV5ServerError, Apiv5ValueError
+from helloasso_api.export import Exporter, flatten
+from tests.fake_resources.fake_response import FakePagedClient, FakeResponse
+
+
+def read_ndjson(path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_exporter_should_write_ndjson_and_remove_checkpoint(tmp_path):
+    path = tmp_path / "orders.ndjson"
+    client = FakePagedClient(total=25)
+    exporter = Exporter(client, str(path), page_size=10)
+
+    stats = exporter.export_orders("my-asso")
+
+    assert read_ndjson(path) == [{"id": i} for i in range(25)]
+    assert not (tmp_path / "orders.ndjson.checkpoint").exists()
+    assert (stats.items, stats.requests) == (25, 3)
+    assert stats.bytes == path.stat().st_size
+    assert stats.items_per_second > 0
+
+
+def test_exporter_should_write_flattened_csv(tmp_path):
+    path = tmp_path / "payments.csv"
+    items = [
+        {"id": 1, "amount": 1000, "payer": {"email": "a@b.c"}, "items": [{"id": 3}]},
+        {"id": 2, "amount": 500, "payer": {"email": "d@e.f"}, "items": []},
+    ]
+    client = Mock(**{"call.return_value": FakeResponse({"data": items})})
+    Exporter(client, str(path), format="csv").export_payments("my-asso")
+
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "amount", "payer.email", "items"]
+    assert rows[1] == ["1", "1000", "a@b.c", '[{"id": 3}]']
+    assert len(rows) == 3
+
+
+def test_exporter_should_resume_after_a_crash(tmp_path):
+    path = tmp_path / "orders.ndjson"
+    client = FakePagedClient(total=45, fail_at=30)
+    exporter = Exporter(client, str(path), page_size=10)
+
+    with pytest.raises(ApiV5ServerError):
+        exporter.export_orders("my-asso")
+    checkpoint = json.loads((tmp_path / "orders.ndjson.checkpoint").read_text())
+    assert checkpoint["continuation_token"] == "30"
+    assert checkpoint["page_index"] == 3
+    assert checkpoint["offset"] == path.stat().st_size
+    # a partial page written after the checkpoint is discarded
+    with open(path, "a") as f:
+        f.write('{"id": 30}\n{"i')
+
+    client.fail_at = None
+    stats = exporter.export_orders("my-asso")
+
+    assert read_ndjson(path) == [{"id": i} for i in range(45)]
+    assert client.calls[-2]["continuationToken"] == "30"
+    assert (stats.items, stats.requests) == (15, 2)
+
+
+def test_exporter_should_resume_csv_identical_to_an_uninterrupted_export(tmp_path):
+    path = tmp_path / "orders.csv"
+    Exporter(FakePagedClient(total=95), str(path), format="csv", page_size=10).export(
+        "/v5/organizations/my-asso/orders"
+    )
+    expected = path.read_text()
+    client = FakePagedClient(total=95, fail_at=60)
+    exporter = Exporter(client, str(path), format="csv", page_size=10)
+    with pytest.raises(ApiV5ServerError):
+        exporter.export_orders("my-asso")
+    # resumed by page index when the checkpoint has no continuation token
+    checkpoint_path = tmp_path / "orders.csv.checkpoint"
+    checkpoint = json.loads(checkpoint_path.read_text())
+    checkpoint_path.write_text(json.dumps({**checkpoint, "continuation_token": None}))
+
+    client.fail_at = None
+    client.calls.clear()
+    exporter.export_orders("my-asso")
+
+    assert path.read_text().splitlines() == expected.splitlines()
+    assert client.calls[0]["pageIndex"] == 7
+    assert all("pageIndex" not in params for params in client.calls[1:])
+
+
+def test_exporter_should_save_a_checkpoint_every_few_pages(tmp_path):
+    exporter = Exporter(
+        FakePagedClient(total=95),
+        str(tmp_path / "orders.ndjson"),
+        page_size=10,
+        checkpoint_every=4,
+    )
+    saved = []
+    exporter.save_checkpoint = lambda checkpoint: saved.append(checkpoint["items"])
+
+    exporter.export_orders("my-asso")
+
+    assert saved == [40, 80]
+
+
+def test_exporter_should_refuse_checkpoint_of_another_export(tmp_path):
+    path = tmp_path / "orders.ndjson"
+    client = FakePagedClient(total=30, fail_at=10)
+    exporter = Exporter(client, str(path), page_size=10)
+    with pytest.raises(ApiV5ServerError):
+        exporter.export_orders("my-asso")
+
+    with pytest.raises(Apiv5ValueError):
+        exporter.export_payments("my-asso")
+
+
+def test_flatten_should_use_dotted_keys():
+    assert flatten({"a": {"b": {"c": 1}}, "d": [1]}) == {"a.b.c": 1, "d": "[1]"}
@@ -0,0 +1,193 @@
+import json
+import os
+from unittest.mock import patch
+
+from helloasso_api.feed import ChangeFeed, get_field
+from helloasso_api.utils import parse_date
+from tests.fake_resources.fake_response import FakeResponse
+
+RECORDED_PAGES = os.path.join(
+    os.path.dirname(__file__), "fake_resources", "orders_by_update_date.json"
+)
+
+
+class FakeOrdersClient(object):
+    """Serve orders sorted by meta.updatedAt. As on the api, the `from` parameter would
+    filter on the order date, the feed must not send it.
+    """
+
+    def __init__(self):
+        self.orders = []
+        self.calls = []
+
+    def add(self, order_id: int, updated_at: str = None):
+        self.orders = [order for order in self.orders if order["id"] != order_id]
+        meta = {"updatedAt": updated_at} if updated_at else {}
+        self.orders.append({"id": order_id, "meta": meta})
+
+    def call(self, sub_path, params=None):
+        self.calls.append(params)
+        assert "from" not in params
+        orders = sorted(
+            self.orders,
+            key=lambda order: parse_date(
+                order["meta"].get("updatedAt") or "1970-01-01T00:00:00Z"
+            ),
+            reverse=params["sortOrder"] == "Desc",
+        )
+        start = int(params.get("continuationToken") or 0)
+        end = start + params["pageSize"]
+        return FakeResponse(
+            {"data": orders[start:end], "pagination": {"continuationToken": str(end)}}
+        )
+
+
+class RecordedOrdersClient(object):
+    """Replay pages of orders as the api answers them, sorted by descending update date."""
+
+    def __init__(self):
+        with open(RECORDED_PAGES) as f:
+            pages = json.load(f)
+        self.pages = {None: pages[0]}
+        for page, following in zip(pages, pages[1:]):
+            self.pages[page["pagination"]["continuationToken"]] = following
+        self.calls = []
+
+    def call(self, sub_path, params=None):
+        self.calls.append(params)
+        assert (params["sortField"], params["sortOrder"]) == ("UpdateDate", "Desc")
+        return FakeResponse(self.pages[params.get("continuationToken")])
+
+
+def test_feed_should_yield_only_new_and_updated_items(tmp_path):
+    client = FakeOrdersClient()
+    for order_id in range(5):
+        client.add(order_id, f"2022-01-01T10:00:0{order_id}+01:00")
+    client.add(5, "2022-01-01T10:00:04+01:00")
+    feed = ChangeFeed.orders(client, "my-asso", page_size=2, since=None)
+
+    assert sorted(order["id"] for order in feed.poll()) == [0, 1, 2, 3, 4, 5]
+    assert feed.watermark["date"] == "2022-01-01T10:00:04+01:00"
+    assert sorted(feed.watermark["ids"]) == [4, 5]
+    requests = feed.requests
+    assert feed.poll() == []
+    # stopped at the first page holding an item older than the watermark
+    assert feed.requests - requests == 2
+    assert client.calls[-1]["sortOrder"] == "Desc"
+
+    client.add(1, "2022-01-01T10:00:07+01:00")
+    client.add(6, "2022-01-01T10:00:08+01:00")
+    assert [order["id"] for order in feed.poll()] == [6, 1]
+    assert feed.stats()["changes"] == 8
+
+
+def test_feed_should_persist_watermark(tmp_path):
+    path = str(tmp_path / "orders.watermark")
+    client = FakeOrdersClient()
+    client.add(1, "2022-01-01T10:00:00Z")
+    ChangeFeed.orders(client, "my-asso", watermark_path=path).poll()
+
+    client.add(2, "2022-01-01T11:00:00Z")
+    feed = ChangeFeed.orders(client, "my-asso", watermark_path=path)
+    assert [order["id"] for order in feed.poll()] == [2]
+    assert feed.watermark == {"date": "2022-01-01T11:00:00Z", "ids": [2]}
+
+
+def test_feed_should_not_advance_watermark_of_unconsumed_pages():
+    client = FakeOrdersClient()
+    for order_id in range(4):
+        client.add(order_id, f"2022-01-01T10:00:0{order_id}Z")
+    feed = ChangeFeed.orders(client, "my-asso", page_size=2, since=None)
+    changes = feed.changes()
+    next(changes)
+    changes.close()
+
+    assert feed.watermark["date"] is None
+    assert [order["id"] for order in feed.poll()] == [3, 2, 1, 0]
+
+
+def test_feed_should_skip_items_without_date():
+    client = FakeOrdersClient()
+    client.add(1, "2022-01-01T10:00:00Z")
+    client.add(2)
+    feed = ChangeFeed.orders(client, "my-asso", since=None)
+
+    assert [order["id"] for order in feed.poll()] == [1]
+    assert feed.poll() == []
+
+
+def test_feed_should_stop_at_the_watermark_on_recorded_pages():
+    client = RecordedOrdersClient()
+    feed = ChangeFeed.orders(client, "my-asso", page_size=3, since=None)
+    assert [order["id"] for order in feed.poll()] == [8, 3, 7, 6, 5, 4, 2, 1]
+    assert len(client.calls) == 3
+
+    # the orders 3 and 7 were updated at the same time, only 7 was yielded
+    feed.watermark = {"date": "2023-03-01T18:40:12.453+01:00", "ids": [7]}
+    client.calls.clear()
+    assert [order["id"] for order in feed.poll()] == [8, 3]
+    assert feed.watermark == {"date": "2023-03-02T09:15:03.917+01:00", "ids": [8]}
+    assert len(client.calls) == 2
+
+    client.calls.clear()
+    assert feed.poll() == []
+    assert len(client.calls) == 1
+    assert "from" not in client.calls[0]
+
+
+def test_feed_should_start_from_now_without_watermark():
+    client = RecordedOrdersClient()
+    feed = ChangeFeed.orders(client, "my-asso", page_size=3)
+    # the history is not paged through, only the most recent update is recorded
+    assert feed.poll() == []
+    assert len(client.calls) == 1
+    assert feed.watermark == {"date": "2023-03-02T09:15:03.917+01:00", "ids": [8]}
+
+    client = FakeOrdersClient()
+    feed = ChangeFeed.orders(client, "my-asso")
+    assert feed.poll() == []
+    client.add(1, "2000-01-01T10:00:00Z")
+    client.add(2, "2999-01-01T10:00:00Z")
+    assert [order["id"] for order in feed.poll()] == [2]
+
+
+def test_feed_should_start_from_since_without_watermark():
+    client = RecordedOrdersClient()
+    feed = ChangeFeed.orders(
+        client, "my-asso", page_size=3, since="2023-03-01T18:40:12.453+01:00"
+    )
+    assert [order["id"] for order in feed.poll()] == [8, 3, 7]
+    assert len(client.calls) == 2
+
+
+def test_feed_should_adapt_poll_interval():
+    feed = ChangeFeed(None, "/url", min_interval=1, max_interval=10, backoff=2)
+    assert [feed.adapt_interval(0) for _ in range(5)] == [2, 4, 8, 10, 10]
+    assert [feed.adapt_interval(3) for _ in range(5)] == [5, 2.5, 1.25, 1, 1]
+
+
+def test_feed_iteration_should_wait_between_polls():
+    client = FakeOrdersClient()
+    client.add(1, "2022-01-01T10:00:00Z")
+    feed = ChangeFeed.orders(client, "my-asso", min_interval=1, since=None)
+    waits = []
+
+    def wait(delay):
+        waits.append(delay)
+        if len(waits) == 3:
+            feed.stop()
+
+    with patch.object(feed._stop, "wait", wait):
+        assert [order["id"] for order in feed] == [1]
+    assert waits == [1, 2, 4]
+
+
+def test_get_field_should_follow_dotted_path():
+    assert get_field({"meta": {"updatedAt": "date"}}, "meta.updatedAt") == "date"
+    assert get_field({"meta": None}, "meta.updatedAt") is None
+
+
+def test_parse_date_should_accept_api_dates():
+    assert parse_date("2022-05-12T14:05:32.1234567+02:00").microsecond == 123456
+    assert parse_date("2022-05-12T14:05:32Z").utcoffset().total_seconds() == 0
+    assert parse_date("2022-05-12T14:05:32").tzinfo is None
@@ -0,0 +1,119 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+
+from helloasso_api import AsyncApiV5Client, ResponseCache
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import fake_async_session, http_response
+
+
+def test_cache_should_serve_fresh_responses(make_api_v5_client):
+    client = make_api_v5_client(response_cache=ResponseCache(default_ttl=60))
+    fake_get = Mock(return_value=http_response(content=b'{"name": "asso"}'))
+    with patch.object(client.session, "get", fake_get):
+        client.call("/v5/organizations/asso")
+        result = client.call("/v5/organizations/asso")
+    assert fake_get.call_count == 1
+    assert result.json() == {"name": "asso"}
+    assert client.response_cache.stats()["hits"] == 1
+
+
+def test_cache_should_key_on_params_and_token(make_api_v5_client):
+    client = make_api_v5_client(response_cache=ResponseCache(default_ttl=60))
+    with patch.object(
+        client.session, "get", Mock(return_value=http_response())
+    ) as fake_get:
+        client.call("/v5/forms", params={"pageSize": 10})
+        client.call("/v5/forms", params={"pageSize": 20})
+        client.oauth.access_token = "other_token"
+        client.call("/v5/forms", params={"pageSize": 10})
+    assert fake_get.call_count == 3
+
+
+@patch("helloasso_api.http_cache.time.monotonic")
+def test_cache_should_revalidate_stale_responses(
+    fake_monotonic: Mock, make_api_v5_client
+):
+    fake_monotonic.return_value = 100
+    client = make_api_v5_client(response_cache=ResponseCache(default_ttl=60))
+    responses = [
+        http_response(content=b'{"id": 1}', headers={"ETag": '"v1"'}),
+        http_response(304, b"", headers={"ETag": '"v1"'}),
+    ]
+    with patch.object(client.session, "get", Mock(side_effect=responses)) as fake_get:
+        client.call("/v5/organizations/asso")
+        fake_monotonic.return_value = 200
+        result = client.call("/v5/organizations/asso")
+        fake_monotonic.return_value = 230
+        client.call("/v5/organizations/asso")
+    assert fake_get.call_count == 2
+    assert fake_get.call_args[1]["headers"]["If-None-Match"] == '"v1"'
+    assert result.status_code == 200
+    assert result.json() == {"id": 1}
+    stats = client.response_cache.stats()
+    assert (stats["hits"], stats["stale"], stats["revalidations"]) == (1, 1, 1)
+
+
+def test_cache_should_not_store_other_methods_or_uncacheable_responses(
+    make_api_v5_client,
+):
+    cache = ResponseCache(routes={r"/v5/users/me$": 0})
+    client = make_api_v5_client(response_cache=cache)
+    with patch.object(client.session, "get", Mock(return_value=http_response())):
+        client.call("/v5/users/me")
+    with patch.object(
+        client.session,
+        "get",
+        Mock(return_value=http_response(headers={"Cache-Control": "no-store"})),
+    ):
+        client.call("/v5/forms")
+    with patch.object(client.session, "post", Mock(return_value=http_response())):
+        client.call("/v5/forms", method="POST", json={})
+    assert len(cache) == 0
+
+
+def test_cache_should_evict_least_recently_used_entries():
+    cache = ResponseCache(max_entries=2)
+    for url in ("https://api/a", "https://api/b"):
+        cache.store(cache.key(url, None, "token"), url, http_response())
+    cache.get(cache.key("https://api/a", None, "token"))
+    cache.store(
+        cache.key("https://api/c", None, "token"), "https://api/c", http_response()
+    )
+    assert cache.get(cache.key("https://api/b", None, "token")) is None
+    assert cache.get(cache.key("https://api/a", None, "token")) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_should_bound_its_size_in_bytes():
+    cache = ResponseCache(max_bytes=2500)
+    for url in ("https://api/a", "https://api/b", "https://api/c"):
+        cache.store(cache.key(url, None, None), url, http_response(content=b"x" * 1000))
+    cache.store(
+        cache.key("https://api/d", None, None),
+        "https://api/d",
+        http_response(content=b"x" * 5000),
+    )
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] <= 2500
+
+
+@requires_async
+def test_async_client_should_use_cache():
+    cache = ResponseCache()
+    client = AsyncApiV5Client(
+        api_base="base_api",
+        client_id="client_id_123",
+        client_secret="client_secret_123456",
+        access_token="token",
+        response_cache=cache,
+    )
+    handler = Mock(return_value=httpx.Response(200, json={"name": "asso"}))
+    client.session = client.oauth.session = fake_async_session(handler)
+
+    async def run():
+        await client.call("/v5/organizations/asso")
+        return await client.call("/v5/organizations/asso")
+
+    assert asyncio.run(run()).json() == {"name": "asso"}
+    assert handler.call_count == 1
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def loaded_modules(code: str) -> set:
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys\n{code}\n"
+            "print(' '.join(m for m in ('requests', 'oauthlib', 'requests_oauthlib',"
+            " 'httpx') if m in sys.modules))",
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    return set(output.split())
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="names are imported lazily from python 3.7"
+)
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("import helloasso_api", set()),
+        ("from helloasso_api import HaApiV5", {"requests"}),
+        (
+            "from helloasso_api import HaApiV5\n"
+            "HaApiV5('api.helloasso.com', 'id', 'secret', lazy_auth=True)",
+            {"requests"},
+        ),
+    ],
+)
+def test_heavy_modules_should_be_imported_when_needed(code, expected):
+    assert loaded_modules(code) == expected
+
+
+def test_package_should_export_public_names():
+    import helloasso_api
+
+    for name in helloasso_api.__all__:
+        assert getattr(helloasso_api, name).__name__ == name
+    with pytest.raises(AttributeError):
+        helloasso_api.Unknown
@@ -0,0 +1,195 @@
+import asyncio
+import gc
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from helloasso_api import (
+    ApiV5Client,
+    AsyncApiV5Client,
+    CircuitBreaker,
+    MetricsRegistry,
+)
+from helloasso_api.exceptions import ApiV5ConnectionError, ApiV5NotFound
+from helloasso_api.metrics import Histogram
+from helloasso_api.mock_server import MockApi
+from helloasso_api.oauth2 import OAuth2Api
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import (
+    FakeResponse,
+    fake_async_session,
+    http_response,
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        (
+            "/v5/organizations/my-asso/orders",
+            "/v5/organizations/{organizationSlug}/orders",
+        ),
+        (
+            "/v5/organizations/my-asso/forms/Event/gala/items",
+            "/v5/organizations/{organizationSlug}/forms/{formType}/{formSlug}/items",
+        ),
+        ("https://api.helloasso.com/v5/orders/1234", "/v5/orders/{id}"),
+        ("/v5/payments/12/refund?comment=x", "/v5/payments/{id}/refund"),
+        ("/v5/users/me/organizations", "/v5/users/me/organizations"),
+    ],
+)
+def test_route_should_template_paths(url, expected):
+    assert MetricsRegistry().route(url) == expected
+
+
+def test_route_should_apply_custom_rules_first():
+    metrics = MetricsRegistry(routes={r"/partners/[^/]+": "/partners/{partner}"})
+    assert (
+        metrics.route("/v5/partners/acme/orders/1")
+        == "/v5/partners/{partner}/orders/{id}"
+    )
+
+
+def test_histogram_should_count_per_bucket():
+    histogram = Histogram((0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 2), (1, 3), (float("inf"), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(3.65)
+
+
+def test_client_should_record_calls_statuses_and_errors(make_api_v5_client):
+    metrics = MetricsRegistry()
+    client = make_api_v5_client(metrics=metrics)
+    responses = [http_response(200), http_response(404)]
+    with patch.object(client.session, "get", Mock(side_effect=responses)):
+        client.call("/v5/orders/1")
+        with pytest.raises(ApiV5NotFound):
+            client.call("/v5/orders/2")
+    with patch.object(
+        client.session, "get", Mock(side_effect=requests.exceptions.ConnectionError)
+    ):
+        with pytest.raises(ApiV5ConnectionError):
+            client.call("/v5/orders/3")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["calls"]["GET /v5/orders/{id}"]["count"] == 3
+    assert snapshot["requests"]["GET /v5/orders/{id}"]["count"] == 3
+    assert snapshot["responses"] == {
+        "GET /v5/orders/{id} 200": 1,
+        "GET /v5/orders/{id} 404": 1,
+    }
+    assert snapshot["errors"] == {
+        "GET /v5/orders/{id} ApiV5NotFound": 1,
+        "GET /v5/orders/{id} ApiV5ConnectionError": 1,
+    }
+    assert snapshot["in_flight"] == 0
+
+
+def test_client_should_record_nothing_without_metrics(api_v5_client: ApiV5Client):
+    client = api_v5_client
+    with patch.object(client.session, "get", Mock(return_value=http_response())):
+        client.call("/v5/orders/1")
+    assert client.metrics is None
+    assert client.oauth.metrics is None
+
+
+def test_prometheus_text_should_export_histograms_counters_and_gauges(
+    make_api_v5_client,
+):
+    metrics = MetricsRegistry(buckets=(0.1, 1))
+    client = make_api_v5_client(metrics=metrics)
+    with patch.object(client.session, "get", Mock(return_value=http_response())):
+        client.call("/v5/orders/1")
+    metrics.add_gauge("queue_size", lambda: [({"queue": "a"}, 3)], "Queue size.")
+    text = metrics.to_prometheus()
+
+    labels = 'method="GET",route="/v5/orders/{id}"'
+    assert "# TYPE helloasso_call_duration_seconds histogram" in text
+    assert f'helloasso_call_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"helloasso_request_duration_seconds_count{{{labels}}} 1" in text
+    assert f'helloasso_responses_total{{{labels},status="200"}} 1' in text
+    assert "helloasso_in_flight_requests 0" in text
+    assert 'helloasso_queue_size{queue="a"} 3' in text
+    assert "# TYPE helloasso_pool_connections gauge" in text
+    assert "# TYPE helloasso_pool_requests_total counter" in text
+
+
+def test_clients_sharing_a_registry_should_report_each_gauge_once():
+    metrics = MetricsRegistry()
+    breaker = CircuitBreaker()
+    with MockApi() as mock:
+        clients = [
+            ApiV5Client(
+                mock.api_base,
+                "client_id",
+                "client_secret",
+                metrics=metrics,
+                circuit_breaker=breaker,
+            )
+            for _ in range(2)
+        ]
+        for client in clients:
+            client.call("/v5/organizations/mock-asso")
+        gauges = metrics.snapshot()["gauges"]
+        # the token request and the call of each client, summed per host
+        assert gauges["pool_requests_total"] == [({"host": "127.0.0.1"}, 4)]
+        assert gauges["circuit_breaker_state"] == [
+            ({"route": "/v5/organizations/{organizationSlug}"}, 0)
+        ]
+        assert gauges["circuit_breaker_rejected_calls_total"] == [({}, 0)]
+
+        clients.pop().close()
+        del client
+        gc.collect()
+        gauges = metrics.snapshot()["gauges"]
+        assert gauges["pool_requests_total"] == [({"host": "127.0.0.1"}, 2)]
+
+
+def test_oauth_should_count_token_events():
+    metrics = MetricsRegistry()
+    oauth = OAuth2Api(
+        "base_api", "client_id_123", "client_secret_123456", 123, metrics=metrics
+    )
+    oauth.session = Mock()
+    oauth.session.post.side_effect = [
+        FakeResponse({"access_token": "access", "refresh_token": "refresh"}),
+        FakeResponse({"error": "access_denied"}, 400),
+        FakeResponse({"access_token": "access", "refresh_token": "refresh"}),
+        FakeResponse({"access_token": "access", "refresh_token": "refresh"}),
+    ]
+    oauth.get_token()
+    oauth.refresh_tokens()
+    oauth.refresh_token = None
+    oauth.refresh_tokens()
+    assert metrics.snapshot()["token_events"] == {
+        "fetch": 3,
+        "refresh": 1,
+        "refresh_denied": 1,
+        "refresh_skipped": 1,
+    }
+
+
+@requires_async
+def test_async_client_should_record_calls():
+    metrics = MetricsRegistry()
+    client = AsyncApiV5Client(
+        api_base="base_api",
+        client_id="client_id_123",
+        client_secret="client_secret_123456",
+        access_token="token",
+        metrics=metrics,
+    )
+    client.session = client.oauth.session = fake_async_session(
+        lambda request: httpx.Response(500, json={})
+    )
+
+    with pytest.raises(Exception):
+        asyncio.run(client.call("/v5/organizations/asso/orders"))
+    snapshot = metrics.snapshot()
+    route = "GET /v5/organizations/{organizationSlug}/orders"
+    assert snapshot["calls"][route]["count"] == 1
+    assert snapshot["responses"] == {f"{route} 500": 1}
+    assert snapshot["errors"] == {f"{route} ApiV5ServerError": 1}
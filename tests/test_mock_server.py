@@ -0,0 +1,124 @@
+import io
+import random
+
+import pytest
+import requests
+
+from helloasso_api import ApiV5Client
+from helloasso_api.exceptions import ApiV5NoConfig, ApiV5RateLimited, ApiV5ServerError
+from helloasso_api.mock_server import MockApi, parse_latency
+
+
+def client_for(mock: MockApi) -> ApiV5Client:
+    return ApiV5Client(
+        api_base=mock.api_base, client_id="client_id", client_secret="client_secret"
+    )
+
+
+def test_client_should_authenticate_and_paginate():
+    with MockApi(orders=45) as mock:
+        client = client_for(mock)
+        orders = list(
+            client.paginate("/v5/organizations/mock-asso/orders", page_size=20)
+        )
+        payment = client.call("/v5/payments/4500").json()
+    assert len(orders) == 45
+    assert len({order["id"] for order in orders}) == 45
+    assert payment["order"]["id"] == 45
+    assert mock.stats()["grant_client_credentials"] == 1
+
+
+def test_client_should_refresh_expired_tokens():
+    with MockApi(orders=5) as mock:
+        client = client_for(mock)
+        client.call("/v5/organizations/mock-asso")
+        mock.access_tokens.clear()
+        organization = client.call("/v5/organizations/mock-asso").json()
+    assert organization["organizationSlug"] == "mock-asso"
+    assert mock.stats()["grant_refresh_token"] == 1
+    assert mock.stats()["status_401"] == 1
+
+
+def test_refresh_tokens_should_be_rotated():
+    with MockApi() as mock:
+        url = f"{mock.api_base}/oauth2/token"
+        tokens = requests.post(
+            url,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": "client_id",
+                "client_secret": "client_secret",
+            },
+        ).json()
+        refresh = {
+            "grant_type": "refresh_token",
+            "refresh_token": tokens["refresh_token"],
+        }
+        assert requests.post(url, data=refresh).status_code == 200
+        result = requests.post(url, data=refresh)
+        bad_client = requests.post(
+            url, data={"grant_type": "client_credentials"}, auth=("client_id", "wrong")
+        )
+    assert result.status_code == 400
+    assert result.json()["error"] == "access_denied"
+    assert bad_client.json()["error"] == "unauthorized_client"
+
+
+def test_rate_limit_should_answer_429_with_retry_after():
+    with MockApi(rate_limit=2) as mock:
+        client = client_for(mock)
+        client.call("/v5/users/me/organizations")
+        result = client.call("/v5/users/me/organizations")
+        assert result.headers["X-RateLimit-Remaining"] == "0"
+        with pytest.raises(ApiV5RateLimited) as error:
+            client.call("/v5/users/me/organizations")
+    assert int(error.value.args[0].headers["Retry-After"]) >= 1
+
+
+def test_errors_should_be_injected():
+    with MockApi(error_rate=1, error_statuses=(503,)) as mock:
+        with pytest.raises(ApiV5ServerError):
+            client_for(mock).call("/v5/organizations/mock-asso/orders")
+
+
+def test_lists_should_filter_and_sort_by_date():
+    mock = MockApi(orders=100)
+    status, result = mock.route(
+        "/v5/organizations/mock-asso/forms/Membership/form-1/orders",
+        {"from": "2022-01-01T12:00:00", "sortOrder": "Asc", "pageSize": "100"},
+    )
+    dates = [order["date"] for order in result["data"]]
+    assert status == 200
+    assert dates and dates == sorted(dates)
+    assert all(order["formSlug"] == "form-1" for order in result["data"])
+    assert all(date >= "2022-01-01T12:00:00+00:00" for date in dates)
+    assert mock.route("/v5/organizations/other/orders", {})[0] == 404
+    assert mock.route("/v5/orders/1000", {})[0] == 404
+
+
+def test_wsgi_application_should_serve_tokens():
+    mock = MockApi()
+    body = (
+        b"grant_type=client_credentials&client_id=client_id&client_secret=client_secret"
+    )
+    statuses = []
+    content = mock(
+        {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/oauth2/token",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+        },
+        lambda status, headers: statuses.append(status),
+    )
+    assert statuses == ["200 OK"]
+    assert b"access_token" in content[0]
+
+
+def test_parse_latency():
+    rng = random.Random(0)
+    assert parse_latency("20")(rng) == 0.02
+    assert 0.01 <= parse_latency("uniform:10,50")(rng) <= 0.05
+    assert parse_latency("lognormal:20,0.5")(rng) > 0
+    with pytest.raises(ApiV5NoConfig):
+        parse_latency("gamma:1")
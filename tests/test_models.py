@@ -0,0 +1,84 @@
+import pytest
+
+from helloasso_api.models import Form, Item, Order, Payer, Payment, snake_case
+from helloasso_api.notifications import Notification
+
+ORDER = {
+    "id": 12,
+    "formSlug": "adhesion",
+    "formType": "Membership",
+    "amount": {"total": 2500},
+    "payer": {"email": "a@b.c", "firstName": "Jeanne"},
+    "items": [{"id": 120, "amount": 2500, "type": "Membership"}],
+    "payments": [{"id": 1200, "amount": 2500, "state": "Authorized"}],
+    "unknownField": "kept",
+}
+
+
+def test_models_should_use_slots():
+    order = Order.from_dict(ORDER)
+    assert not hasattr(order, "__dict__")
+    with pytest.raises(AttributeError):
+        order.not_a_field = 1
+
+
+def test_models_should_expose_snake_case_fields():
+    order = Order.from_dict(ORDER)
+    assert order.id == 12
+    assert order.form_slug == "adhesion"
+    assert order.amount == {"total": 2500}
+    assert order.meta is None
+    assert order.extra == {"unknownField": "kept"}
+
+
+def test_nested_models_should_be_decoded_on_first_access():
+    order = Order.from_dict(ORDER)
+    assert isinstance(order._payer, dict)
+
+    assert isinstance(order.payer, Payer)
+    assert order.payer.first_name == "Jeanne"
+    assert order.payer is order.payer
+    assert [type(item) for item in order.items] == [Item]
+    assert order.payments[0].state == "Authorized"
+    assert isinstance(order.payments[0], Payment)
+
+
+def test_to_dict_should_give_back_the_api_representation():
+    order = Order.from_dict(ORDER)
+    assert order.to_dict() == ORDER
+    order.payer.email = "d@e.f"
+    order.items
+    assert order.to_dict() == {**ORDER, "payer": {**ORDER["payer"], "email": "d@e.f"}}
+
+
+def test_models_should_compare_by_value():
+    assert Order.from_dict(ORDER) == Order.from_dict(dict(ORDER))
+    assert Order.from_dict(ORDER) != Order.from_dict({**ORDER, "id": 13})
+
+
+def test_models_can_be_built_from_attributes():
+    form = Form(form_slug="gala", form_type="Event", title="Gala")
+    assert form.to_dict() == {"formSlug": "gala", "formType": "Event", "title": "Gala"}
+    assert repr(form) == "<Form gala>"
+
+
+def test_enumerated_strings_should_be_shared():
+    first = Order.from_dict({"formSlug": "".join(["adh", "esion"])})
+    second = Order.from_dict({"formSlug": "".join(["adhe", "sion"])})
+    assert first.form_slug is second.form_slug
+
+
+def test_notification_model_should_match_event_type():
+    notification = Notification.decode(
+        b'{"eventType": "Order", "data": {"id": 1, "items": [], "payer": {}}}'
+    )
+    assert isinstance(notification.model, Order)
+    assert notification.model.id == 1
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("id", "id"), ("formSlug", "form_slug"), ("isAmountHidden", "is_amount_hidden")],
+)
+def test_snake_case(name, expected):
+    assert snake_case(name) == expected
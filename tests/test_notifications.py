@@ -0,0 +1,110 @@
+import io
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from helloasso_api.exceptions import Apiv5ValueError
+from helloasso_api.notifications import Notification, NotificationReceiver, SeenIndex
+from tests.fake_resources.fake_response import FakeResponse
+
+
+def payload(event_type: str = "Order", **data) -> bytes:
+    data.setdefault("id", 1)
+    return json.dumps(
+        {"eventType": event_type, "data": data, "metadata": {"ref": "abc"}}
+    ).encode()
+
+
+def test_decode_should_build_notification():
+    notification = Notification.decode(payload("Payment", id=12, state="Authorized"))
+    assert notification.event_type == "Payment"
+    assert notification.id == 12
+    assert notification.metadata == {"ref": "abc"}
+    assert notification.key.startswith("Payment:12:")
+
+
+@pytest.mark.parametrize(
+    "body", [b"not json", b"[]", b'{"data": {}}', b'{"eventType": "Order"}']
+)
+def test_decode_should_refuse_invalid_payloads(body):
+    with pytest.raises(Apiv5ValueError):
+        Notification.decode(body)
+
+
+def test_details_should_be_fetched_once_for_incomplete_payloads():
+    client = Mock(
+        **{"call.return_value": FakeResponse({"id": 1, "items": [], "payer": {}})}
+    )
+    notification = Notification.decode(payload("Order", id=1), client)
+    assert not notification.complete
+    assert notification.details == {"id": 1, "items": [], "payer": {}}
+    assert notification.details["items"] == []
+    client.call.assert_called_once_with("/v5/orders/1")
+
+
+def test_details_should_not_call_api_for_complete_payloads():
+    client = Mock()
+    notification = Notification.decode(
+        payload(items=[], payer={"email": "a@b.c"}), client
+    )
+    assert notification.details["payer"] == {"email": "a@b.c"}
+    assert client.call.call_count == 0
+
+
+def test_seen_index_should_be_bounded():
+    seen = SeenIndex(maxsize=2)
+    assert seen.add("a") and seen.add("b")
+    assert not seen.add("a")
+    assert seen.add("c")
+    assert "b" not in seen and "a" in seen
+    assert len(seen) == 2
+
+
+def test_receiver_should_process_notifications_once():
+    handler = Mock()
+    with NotificationReceiver(handler, workers=2) as receiver:
+        assert receiver.receive(payload(id=1)) == 200
+        assert receiver.receive(payload(id=1)) == 200
+        assert receiver.receive(payload(id=2)) == 200
+        assert receiver.receive(b"{") == 400
+    assert handler.call_count == 2
+    assert receiver.stats()["duplicates"] == 1
+    assert receiver.stats()["processed"] == 2
+
+
+def test_receiver_should_refuse_notifications_when_queue_is_full():
+    receiver = NotificationReceiver(Mock(), queue_size=1)
+    assert receiver.receive(payload(id=1)) == 200
+    assert receiver.receive(payload(id=2)) == 503
+    assert receiver.stats()["rejected"] == 1
+    # the refused notification is accepted once there is room again
+    receiver.start()
+    receiver.stop()
+    assert receiver.receive(payload(id=2)) == 200
+
+
+def test_receiver_should_accept_redelivery_of_failed_notifications():
+    handler = Mock(side_effect=[ValueError("db down"), None])
+    with NotificationReceiver(handler, workers=1) as receiver:
+        receiver.receive(payload(id=1))
+    with receiver:
+        receiver.receive(payload(id=1))
+    assert handler.call_count == 2
+    assert receiver.stats()["failed"] == 1
+
+
+def test_receiver_should_be_a_wsgi_application():
+    receiver = NotificationReceiver(Mock())
+    start_response = Mock()
+    body = payload()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    assert receiver(environ, start_response) == [b""]
+    assert start_response.call_args[0][0] == "200 OK"
+
+    receiver({"REQUEST_METHOD": "GET"}, start_response)
+    assert start_response.call_args[0][0] == "405 Method Not Allowed"
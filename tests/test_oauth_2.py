@@ -1,13 +1,10 @@
+import json
+from base64 import urlsafe_b64encode
 from logging import Logger
 from unittest.mock import Mock, call, patch
 
 import pytest
 import requests
-from oauthlib.oauth2 import (
-    AccessDeniedError,
-    BackendApplicationClient,
-    UnauthorizedClientError,
-)
 from requests.auth import HTTPBasicAuth
 
 from helloasso_api.exceptions import (
@@ -17,10 +14,23 @@ from helloasso_api.exceptions import (
     ApiV5Timeout,
 )
 from helloasso_api.oauth2 import OAuth2Api
+from tests.fake_resources.fake_response import FakeResponse
+
+
+def get_oauth(session=None):
+    return OAuth2Api(
+        "base_api", "client_id_123", "client_secret_123456", 123, session=session
+    )
 
 
-def get_oauth():
-    return OAuth2Api("base_api", "client_id_123", "client_secret_123456", 123)
+def fake_session(data: dict = None, status_code: int = 200, side_effect=None) -> Mock:
+    session = Mock()
+    session.post.return_value = FakeResponse(
+        data if data is not None else {"access_token": 1, "refresh_token": 2},
+        status_code,
+    )
+    session.post.side_effect = side_effect
+    return session
 
 
 def test_oauth2_should_initialize():
@@ -32,7 +42,6 @@ def test_oauth2_should_initialize():
     assert oauth._refresh_token is None
     assert oauth.oauth2_token_getter is None
     assert oauth.oauth2_token_setter is None
-    assert isinstance(oauth.client, BackendApplicationClient)
     assert isinstance(oauth.auth, HTTPBasicAuth)
     assert isinstance(oauth.log, Logger)
 
@@ -55,7 +64,6 @@ def test_oauth2_should_initialize_with_optional_params():
     assert oauth._refresh_token == "refresh_token"
     assert oauth.oauth2_token_getter == "getter"
     assert oauth.oauth2_token_setter == "setter"
-    assert isinstance(oauth.client, BackendApplicationClient)
     assert isinstance(oauth.auth, HTTPBasicAuth)
     assert isinstance(oauth.log, Logger)
 
@@ -128,20 +136,20 @@ def test_credentials_should_work():
 
 
 @patch("helloasso_api.oauth2.OAuth2Api.token_saver")
-@patch("helloasso_api.oauth2.OAuth2Session")
-def test_get_token_should_work(OAuth2Session, fake_token_saver):
-    OAuth2Session.return_value = OAuth2Session
-    oauth = get_oauth()
+def test_get_token_should_work(fake_token_saver):
+    session = fake_session({"access_token": "access", "refresh_token": "refresh"})
+    oauth = get_oauth(session)
     oauth.auth = "AUTH OBJECT"
-    OAuth2Session.fetch_token.return_value = "fetch_token_return_value"
 
     oauth.get_token()
 
-    assert OAuth2Session.fetch_token.call_count == 1
-    OAuth2Session.fetch_token.assert_has_calls(
+    assert session.post.call_count == 1
+    session.post.assert_has_calls(
         [
             call(
-                token_url="https://base_api/oauth2/token",
+                "https://base_api/oauth2/token",
+                data={"grant_type": "client_credentials"},
+                headers=oauth._get_headers(),
                 auth="AUTH OBJECT",
                 timeout=123,
             )
@@ -149,25 +157,42 @@ def test_get_token_should_work(OAuth2Session, fake_token_saver):
     )
 
     assert fake_token_saver.call_count == 1
-    fake_token_saver.assert_has_calls([call("fetch_token_return_value")])
+    fake_token_saver.assert_has_calls(
+        [call({"access_token": "access", "refresh_token": "refresh"})]
+    )
+
+
+def test_oauth2_should_create_a_session_when_none_is_shared():
+    oauth = get_oauth()
+    with patch("helloasso_api.oauth2.requests.Session") as Session:
+        Session.return_value = fake_session()
+        oauth.get_token()
+        oauth.get_token()
+    assert Session.call_count == 1
+    assert oauth.access_token == 1
 
 
 @pytest.mark.parametrize(
-    "initial_exception, expected_exception",
+    "session, expected_exception",
     [
-        (requests.exceptions.ConnectionError, ApiV5ConnectionError),
-        (requests.exceptions.Timeout, ApiV5Timeout),
-        (UnauthorizedClientError, ApiV5AuthenticationError),
-        (Exception, Apiv5ExceptionError),
+        (
+            fake_session(side_effect=requests.exceptions.ConnectionError()),
+            ApiV5ConnectionError,
+        ),
+        (fake_session(side_effect=requests.exceptions.Timeout()), ApiV5Timeout),
+        (
+            fake_session({"error": "unauthorized_client"}, 401),
+            ApiV5AuthenticationError,
+        ),
+        (fake_session({"error": "invalid_request"}, 400), Apiv5ExceptionError),
+        (fake_session({}, 500), Apiv5ExceptionError),
+        (fake_session(side_effect=Exception()), Apiv5ExceptionError),
     ],
 )
-def test_get_token_should_map_exception(initial_exception, expected_exception):
-    with patch("helloasso_api.oauth2.OAuth2Session") as OAuth2Session:
-        OAuth2Session.fetch_token.side_effect = initial_exception()
-        OAuth2Session.return_value = OAuth2Session
-        oauth = get_oauth()
-        with pytest.raises(expected_exception):
-            oauth.get_token()
+def test_get_token_should_map_exception(session, expected_exception):
+    oauth = get_oauth(session)
+    with pytest.raises(expected_exception):
+        oauth.get_token()
 
 
 def test_token_saver_should_work():
@@ -183,66 +208,184 @@ def test_token_saver_should_work():
 
 
 @patch("helloasso_api.oauth2.OAuth2Api.token_saver")
-@patch("helloasso_api.oauth2.OAuth2Session")
 @patch("helloasso_api.oauth2.OAuth2Api.credentials", {"a": 1})
 @patch("helloasso_api.oauth2.OAuth2Api.get_token", Mock())
-def test_refresh_tokens_should_work_when_auth_token_is_set(
-    OAuth2Session, fake_token_saver
-):
-    OAuth2Session.return_value = OAuth2Session
-    oauth = get_oauth()
+def test_refresh_tokens_should_work_when_auth_token_is_set(fake_token_saver):
+    session = fake_session()
+    oauth = get_oauth(session)
     oauth.refresh_token = 123
-    OAuth2Session.refresh_token.return_value = "fetch_token_return_value"
     oauth.refresh_tokens()
-    assert OAuth2Session.refresh_token.call_count == 1
-    OAuth2Session.refresh_token.assert_has_calls(
-        [call(token_url="https://base_api/oauth2/token", timeout=123, a=1)]
+    assert session.post.call_count == 1
+    session.post.assert_has_calls(
+        [
+            call(
+                "https://base_api/oauth2/token",
+                data={"grant_type": "refresh_token", "a": 1},
+                headers=oauth._get_headers(),
+                auth=None,
+                timeout=123,
+            )
+        ]
     )
+    fake_token_saver.assert_has_calls([call({"access_token": 1, "refresh_token": 2})])
     assert oauth.get_token.call_count == 1
 
 
 @patch("helloasso_api.oauth2.OAuth2Api.get_token")
-@patch("helloasso_api.oauth2.OAuth2Session")
-def test_refresh_tokens_should_work_when_auth_token_is_not_set(
-    OAuth2Session, fake_get_token
-):
-    OAuth2Session.return_value = OAuth2Session
-    oauth = get_oauth()
+def test_refresh_tokens_should_work_when_auth_token_is_not_set(fake_get_token):
+    session = fake_session()
+    oauth = get_oauth(session)
     oauth.access_token = 123
     oauth.refresh_tokens()
-    assert OAuth2Session.refresh_token.call_count == 0
+    assert session.post.call_count == 0
     assert oauth.access_token is None
     assert oauth.refresh_token is None
     assert fake_get_token.call_count == 1
 
 
 @pytest.mark.parametrize(
-    "initial_exception, expected_exception",
+    "session, expected_exception",
     [
-        (requests.exceptions.ConnectionError, ApiV5ConnectionError),
-        (requests.exceptions.Timeout, ApiV5Timeout),
-        (UnauthorizedClientError, ApiV5AuthenticationError),
-        (Exception, Apiv5ExceptionError),
+        (
+            fake_session(side_effect=requests.exceptions.ConnectionError()),
+            ApiV5ConnectionError,
+        ),
+        (fake_session(side_effect=requests.exceptions.Timeout()), ApiV5Timeout),
+        (
+            fake_session({"error": "unauthorized_client"}, 401),
+            ApiV5AuthenticationError,
+        ),
+        (fake_session({"error": "invalid_grant"}, 400), Apiv5ExceptionError),
+        (fake_session(side_effect=Exception()), Apiv5ExceptionError),
     ],
 )
-def test_refresh_tokens_should_map_exception(initial_exception, expected_exception):
-    with patch("helloasso_api.oauth2.OAuth2Session") as OAuth2Session:
-        OAuth2Session.refresh_token.side_effect = initial_exception()
-        OAuth2Session.return_value = OAuth2Session
-        oauth = get_oauth()
-        oauth.refresh_token = 123
-        with pytest.raises(expected_exception):
-            oauth.refresh_tokens()
+def test_refresh_tokens_should_map_exception(session, expected_exception):
+    oauth = get_oauth(session)
+    oauth.refresh_token = 123
+    with pytest.raises(expected_exception):
+        oauth.refresh_tokens()
 
 
 @patch("helloasso_api.oauth2.OAuth2Api.get_token")
 def test_refresh_tokens_should_handle_access_denied_error(fake_get_token):
-    with patch("helloasso_api.oauth2.OAuth2Session") as OAuth2Session:
-        OAuth2Session.refresh_token.side_effect = AccessDeniedError()
-        OAuth2Session.return_value = OAuth2Session
-        oauth = get_oauth()
-        oauth.refresh_token = 123
-        oauth.refresh_tokens()
-        assert oauth.access_token is None
-        assert oauth.refresh_token is None
-        assert fake_get_token.call_count == 1
+    oauth = get_oauth(fake_session({"error": "access_denied"}, 400))
+    oauth.refresh_token = 123
+    oauth.refresh_tokens()
+    assert oauth.access_token is None
+    assert oauth.refresh_token is None
+    assert fake_get_token.call_count == 1
+
+
+def test_exchange_authorization_code_should_not_change_client_tokens():
+    session = fake_session({"access_token": "org_access", "refresh_token": "org"})
+    oauth = get_oauth(session)
+    oauth.access_token = "client_access"
+    result = oauth.exchange_authorization_code("code", "redirect", "verifier")
+    assert result.json()["access_token"] == "org_access"
+    assert oauth.access_token == "client_access"
+    assert session.post.call_args[1]["data"] == {
+        "client_id": "client_id_123",
+        "client_secret": "client_secret_123456",
+        "grant_type": "authorization_code",
+        "code": "code",
+        "redirect_uri": "redirect",
+        "code_verifier": "verifier",
+    }
+
+
+def make_jwt(payload: dict) -> str:
+    body = urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    return f"header.{body}.signature"
+
+
+@patch("helloasso_api.oauth2.time.time", Mock(return_value=1000))
+def test_token_saver_should_track_expiry_from_expires_in():
+    oauth = get_oauth()
+    oauth.token_saver({"access_token": 123, "refresh_token": 456, "expires_in": 1800})
+    assert oauth.access_token_expires_at == 2800
+    assert oauth.refresh_token_expires_at == 1000 + 30 * 24 * 3600
+    assert oauth.access_token_expiry() == 2800
+
+
+def test_token_saver_should_track_expiry_from_jwt():
+    oauth = get_oauth()
+    token = make_jwt({"exp": 1234567890})
+    oauth.token_saver({"access_token": token, "refresh_token": 456})
+    assert oauth.access_token_expires_at == 1234567890
+
+
+def test_access_token_expiry_should_follow_tokens_set_elsewhere():
+    oauth = get_oauth()
+    oauth.token_saver({"access_token": "abc", "refresh_token": 456, "expires_in": 60})
+    oauth.access_token = make_jwt({"exp": 42})
+    assert oauth.access_token_expiry() == 42
+    oauth.access_token = "not a jwt"
+    assert oauth.access_token_expiry() is None
+    assert oauth.access_token_needs_renewal() is False
+
+
+@pytest.mark.parametrize("expires_in, expected", [(30, True), (61, True), (120, False)])
+@patch("helloasso_api.oauth2.time.time", Mock(return_value=1000))
+def test_access_token_needs_renewal(expires_in, expected):
+    oauth = OAuth2Api("base_api", "id", "secret", 123, token_renewal_margin=90)
+    oauth.token_saver({"access_token": 1, "refresh_token": 2, "expires_in": expires_in})
+    assert oauth.access_token_needs_renewal() is expected
+
+
+@patch("helloasso_api.oauth2.OAuth2Api.get_token")
+def test_refresh_tokens_should_get_token_when_refresh_token_expired(fake_get_token):
+    session = fake_session()
+    oauth = get_oauth(session)
+    oauth.token_saver({"access_token": 1, "refresh_token": 2, "expires_in": 60})
+    oauth.refresh_token_expires_at = 0
+    oauth.refresh_tokens()
+    assert session.post.call_count == 0
+    assert fake_get_token.call_count == 1
+
+
+def test_token_cache_should_limit_getter_calls():
+    storage = {"access_token": "stored", "refresh_token": "refresh"}
+    getter = Mock(side_effect=lambda token_key, client_id: storage.get(token_key))
+    setter = Mock(
+        side_effect=lambda token_key, client_id, token: storage.update({token_key: token})
+    )
+    oauth = OAuth2Api(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        123,
+        oauth2_token_getter=getter,
+        oauth2_token_setter=setter,
+        token_cache_ttl=60,
+    )
+    for _ in range(10):
+        assert oauth.access_token == "stored"
+        assert oauth.refresh_token == "refresh"
+    assert getter.call_count == 2
+
+    oauth.access_token = "new"
+    assert oauth.access_token == "new"
+    assert getter.call_count == 2
+
+    storage["access_token"] = "renewed_elsewhere"
+    oauth.invalidate_token_cache()
+    assert oauth.access_token == "renewed_elsewhere"
+    assert getter.call_count == 3
+    assert oauth.token_cache.stats()["hits"] == 19
+    assert oauth.token_cache.stats()["misses"] == 3
+
+
+def test_token_cache_should_not_keep_access_token_past_renewal_time():
+    getter = Mock(return_value=make_jwt({"exp": 0}))
+    oauth = OAuth2Api(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        123,
+        oauth2_token_getter=getter,
+        oauth2_token_setter=Mock(),
+        token_cache_ttl=60,
+    )
+    oauth.access_token
+    oauth.access_token
+    assert getter.call_count == 2
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+import pytest
+
+from helloasso_api import HaApiV5, MetricsRegistry, OrganizationClient
+from helloasso_api.exceptions import ApiV5AuthenticationError, ApiV5NoConfig
+from helloasso_api.mock_server import MockApi
+from helloasso_api.token_store import MemoryTokenStore
+
+
+def partner_for(mock: MockApi, **kwargs) -> HaApiV5:
+    return HaApiV5(
+        api_base=mock.api_base,
+        client_id="client_id",
+        client_secret="client_secret",
+        lazy_auth=True,
+        **kwargs,
+    )
+
+
+def authorize(api: HaApiV5) -> dict:
+    return api.authorization.exchange_authorization_token(
+        "code", "redirect", "verifier"
+    )
+
+
+def authorized_organization(api: HaApiV5, slug: str) -> OrganizationClient:
+    tokens = authorize(api)
+    return api.for_organization(slug, tokens["access_token"], tokens["refresh_token"])
+
+
+def test_organization_client_should_call_with_the_organization_tokens():
+    with MockApi(orders=5) as mock:
+        partner = partner_for(mock)
+        tokens = authorize(partner)
+        organization = partner.for_organization(
+            tokens["organization_slug"], tokens["access_token"], tokens["refresh_token"]
+        )
+        result = organization.call("/v5/organizations/mock-asso")
+    assert isinstance(organization, OrganizationClient)
+    assert result.json()["organizationSlug"] == "mock-asso"
+    assert result.request.headers["Authorization"] == f"Bearer {tokens['access_token']}"
+    assert organization.session is partner.session
+    assert partner.for_organization("mock-asso") is organization
+    assert partner.oauth.access_token is None
+    assert mock.stats().get("grant_client_credentials") is None
+
+
+def test_organization_client_should_refresh_its_own_tokens():
+    with MockApi(orders=5) as mock:
+        partner = partner_for(mock)
+        first = authorized_organization(partner, "first")
+        second = authorized_organization(partner, "second")
+        second_token = second.oauth.access_token
+        mock.access_tokens.pop(first.oauth.access_token)
+        first.call("/v5/organizations/mock-asso")
+        second.call("/v5/organizations/mock-asso")
+    assert mock.stats()["grant_refresh_token"] == 1
+    assert second.oauth.access_token == second_token
+    assert mock.stats().get("grant_client_credentials") is None
+
+
+def test_organization_client_should_not_fall_back_to_client_credentials():
+    with MockApi(orders=5) as mock:
+        partner = partner_for(mock)
+        organization = partner.for_organization("mock-asso", "revoked", "revoked")
+        with pytest.raises(ApiV5AuthenticationError):
+            organization.call("/v5/organizations/mock-asso")
+    assert mock.stats().get("grant_client_credentials") is None
+    assert organization.oauth.access_token is None
+
+
+def test_organization_clients_should_be_bounded_and_read_tokens_from_storage():
+    storage = {}
+    metrics = MetricsRegistry()
+    with MockApi(orders=5) as mock:
+        partner = partner_for(
+            mock,
+            organization_token_getter=lambda key, slug: storage.get((key, slug)),
+            organization_token_setter=lambda key, slug, token: storage.update(
+                {(key, slug): token}
+            ),
+            max_organizations=2,
+            metrics=metrics,
+        )
+        tokens = authorize(partner)
+        with patch.object(OrganizationClient, "close") as close:
+            for slug in ("a", "b", "c"):
+                partner.for_organization(
+                    slug, tokens["access_token"], tokens["refresh_token"]
+                )
+        assert len(partner._organizations) == 2
+        assert close.call_count == 1
+        assert storage[("access_token", "a")] == tokens["access_token"]
+        result = partner.for_organization("a").call("/v5/organizations/mock-asso")
+    assert result.status_code == 200
+    assert len(partner._organizations) == 2
+    assert metrics.snapshot()["token_events"] == {"authorization_code": 1}
+
+
+def test_for_organization_should_require_tokens():
+    with MockApi() as mock:
+        partner = partner_for(mock)
+        with pytest.raises(ApiV5NoConfig):
+            partner.for_organization("unknown")
+        with pytest.raises(ApiV5NoConfig):
+            partner_for(mock, organization_token_getter=lambda key, slug: None)
+
+
+def test_organization_clients_should_be_kept_without_token_storage():
+    with MockApi(orders=5) as mock:
+        with pytest.raises(ApiV5NoConfig):
+            partner_for(mock, max_organizations=2)
+        partner = partner_for(mock)
+        tokens = authorize(partner)
+        for slug in range(1500):
+            partner.for_organization(
+                str(slug), tokens["access_token"], tokens["refresh_token"]
+            )
+    # the clients hold the only copy of the (rotated) refresh tokens
+    assert len(partner._organizations) == 1500
+
+
+def test_organization_tokens_should_go_to_the_token_store():
+    store = MemoryTokenStore()
+    with MockApi(orders=5) as mock:
+        partner = partner_for(mock, token_store=store)
+        organization = authorized_organization(partner, "mock-asso")
+        organization.call("/v5/organizations/mock-asso")
+    assert store.get("client_id:mock-asso") == (
+        organization.oauth.access_token,
+        organization.oauth.refresh_token,
+    )
+    assert store.get("client_id") is None
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from helloasso_api.exceptions import ApiV5ServerError
+from helloasso_api.pagination import AsyncPaginator, Paginator
+from tests.conftest import requires_async
+from tests.fake_resources.fake_response import (
+    FakeAsyncPagedClient,
+    FakePagedClient,
+    FakeResponse,
+)
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_paginator_should_yield_all_items(prefetch):
+    client = FakePagedClient(total=95)
+    paginator = Paginator(
+        client, "/v5/orders", params={"from": "2022"}, page_size=10, prefetch=prefetch
+    )
+
+    assert [item["id"] for item in paginator] == list(range(95))
+    assert len(client.calls) == 10
+    assert client.calls[0] == {"from": "2022", "pageSize": 10}
+    assert client.calls[1] == {
+        "from": "2022",
+        "pageSize": 10,
+        "continuationToken": "10",
+    }
+    assert paginator.pagination["pageIndex"] == 10
+
+
+def test_paginator_should_stop_on_empty_page():
+    client = FakePagedClient(total=20)
+    paginator = Paginator(client, "/v5/orders", page_size=10)
+    client.page = Mock(
+        side_effect=[
+            FakeResponse(
+                {"data": [{"id": 1}], "pagination": {"continuationToken": "a"}}
+            ),
+            FakeResponse({"data": [], "pagination": {"continuationToken": "b"}}),
+        ]
+    )
+    assert list(paginator) == [{"id": 1}]
+
+
+def test_paginator_should_resume_from_continuation_token():
+    client = FakePagedClient(total=30)
+    paginator = Paginator(client, "/v5/orders", page_size=10, continuation_token="20")
+    assert [item["id"] for item in paginator] == list(range(20, 30))
+
+
+def test_paginator_prefetch_should_overlap_and_cap_pages_in_memory():
+    client = FakePagedClient(total=100)
+    held = []
+    max_held = []
+    lock = threading.Lock()
+    page = client.page
+
+    def tracked_page(params):
+        result = page(params)
+        with lock:
+            held.append(1)
+            max_held.append(len(held))
+        return result
+
+    client.page = tracked_page
+    paginator = Paginator(
+        client, "/v5/orders", page_size=10, prefetch=True, max_pages_in_memory=3
+    )
+    for page_ in paginator.pages():
+        time.sleep(0.01)
+        with lock:
+            held.pop()
+
+    assert max(max_held) == 3
+    assert len(client.calls) == 10
+
+
+def test_paginator_prefetch_should_raise_errors():
+    client = FakePagedClient(total=100, fail_at=30)
+    paginator = Paginator(client, "/v5/orders", page_size=10, prefetch=True)
+    items = []
+    with pytest.raises(ApiV5ServerError):
+        for item in paginator:
+            items.append(item)
+    assert len(items) == 30
+
+
+def test_paginator_prefetch_should_stop_when_closed_early():
+    client = FakePagedClient(total=1000)
+    pages = Paginator(client, "/v5/orders", page_size=10, prefetch=True).pages()
+    next(pages)
+    pages.close()
+    time.sleep(0.3)
+    assert len(client.calls) <= 3
+    assert not any(t.name == "helloasso-prefetch" for t in threading.enumerate())
+
+
+@requires_async
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_async_paginator_should_yield_all_items(prefetch):
+    client = FakeAsyncPagedClient(total=45)
+    paginator = AsyncPaginator(client, "/v5/orders", page_size=10, prefetch=prefetch)
+
+    async def run():
+        return [item["id"] async for item in paginator]
+
+    assert asyncio.run(run()) == list(range(45))
+    assert len(client.calls) == 5
+
+
+@requires_async
+def test_async_paginator_should_raise_errors():
+    client = FakeAsyncPagedClient(total=100, fail_at=20)
+    paginator = AsyncPaginator(client, "/v5/orders", page_size=10, prefetch=True)
+
+    async def run():
+        return [item async for item in paginator]
+
+    with pytest.raises(ApiV5ServerError):
+        asyncio.run(run())
+
+
+def test_client_paginate(api_v5_client):
+    responses = FakePagedClient(total=3)
+    api_v5_client.session.get = Mock(
+        side_effect=lambda url, params=None, **kwargs: responses.page(params)
+    )
+    paginator = api_v5_client.paginate("/v5/orders", page_size=2)
+    assert isinstance(paginator, Paginator)
+    assert [item["id"] for item in paginator] == [0, 1, 2]
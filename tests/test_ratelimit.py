@@ -0,0 +1,140 @@
+import asyncio
+import time
+from email.utils import formatdate
+from unittest.mock import Mock, patch
+
+import pytest
+
+from helloasso_api.apiv5client import ApiV5Client
+from helloasso_api.exceptions import ApiV5RateLimited
+from helloasso_api.mock_server import MockApi
+from helloasso_api.ratelimit import RateLimiter, TokenBucket
+from helloasso_api.retry import RetryPolicy
+from tests.conftest import requires_async
+from tests.fake_resources.fake_response import FakeErrorResponse
+
+
+def response(status_code: int, headers: dict) -> FakeErrorResponse:
+    result = FakeErrorResponse(status_code)
+    result.headers = headers
+    return result
+
+
+@patch("helloasso_api.ratelimit.time.monotonic", Mock(return_value=100))
+def test_token_bucket_should_queue_callers_in_order():
+    bucket = TokenBucket(rate=2, burst=2)
+    delays = [bucket.reserve() for _ in range(5)]
+    assert delays == [0, 0, 0.5, 1.0, 1.5]
+
+
+@patch("helloasso_api.ratelimit.time.monotonic")
+def test_token_bucket_should_refill_up_to_burst(fake_monotonic: Mock):
+    fake_monotonic.return_value = 100
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    fake_monotonic.return_value = 200
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+
+@patch("helloasso_api.ratelimit.time.monotonic", Mock(return_value=100))
+def test_token_bucket_pause_should_delay_next_requests():
+    bucket = TokenBucket(rate=2, burst=5)
+    bucket.pause(3)
+    assert [bucket.reserve() for _ in range(3)] == [3, 3.5, 4]
+
+
+def test_rate_limiter_should_use_route_buckets():
+    limiter = RateLimiter(rate=10, routes={r"/v5/organizations/[^/]+/orders": (1, 1)})
+    orders = limiter.bucket("https://api/v5/organizations/my-asso/orders?pageSize=10")
+    assert orders is not limiter.default
+    assert orders.rate == 1
+    assert limiter.bucket("https://api/v5/organizations/my-asso") is limiter.default
+
+
+@pytest.mark.parametrize(
+    "headers, expected_pause",
+    [
+        ({"Retry-After": "7"}, 7),
+        ({"Retry-After": formatdate(1000030, usegmt=True)}, 30),
+        ({}, RateLimiter.default_retry_after),
+    ],
+)
+@patch("helloasso_api.ratelimit.time.time", Mock(return_value=1000000))
+def test_rate_limiter_should_honor_retry_after(headers, expected_pause):
+    limiter = RateLimiter()
+    with patch.object(limiter.default, "pause") as fake_pause:
+        limiter.update("https://api/url", response(429, headers))
+    assert fake_pause.call_args[0][0] == pytest.approx(expected_pause)
+
+
+def test_rate_limiter_should_honor_rate_limit_headers():
+    limiter = RateLimiter()
+    with patch.object(limiter.default, "pause") as fake_pause:
+        limiter.update(
+            "https://api/url",
+            response(200, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "10"}),
+        )
+        assert fake_pause.call_count == 0
+        limiter.update(
+            "https://api/url",
+            response(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "10"}),
+        )
+    fake_pause.assert_called_once_with(10)
+
+
+def test_rate_limiter_acquire_should_wait(monkeypatch):
+    limiter = RateLimiter(rate=1, burst=1)
+    fake_sleep = Mock()
+    monkeypatch.setattr("helloasso_api.ratelimit.time.sleep", fake_sleep)
+    assert limiter.acquire("https://api/url") == 0
+    assert limiter.acquire("https://api/url") == pytest.approx(1, abs=0.1)
+    assert fake_sleep.call_count == 1
+
+
+@requires_async
+def test_rate_limiter_acquire_async_should_wait():
+    limiter = RateLimiter(rate=100, burst=1)
+
+    async def run():
+        return await asyncio.gather(
+            *(limiter.acquire_async("https://api/url") for _ in range(3))
+        )
+
+    start = time.monotonic()
+    delays = asyncio.run(run())
+    assert delays[0] == 0
+    assert delays[2] == pytest.approx(0.02, abs=0.005)
+    assert time.monotonic() - start >= 0.015
+
+
+def test_client_should_throttle_and_slow_down_on_429():
+    limiter = Mock()
+    client = ApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+        rate_limiter=limiter,
+    )
+    rate_limited = response(429, {"Retry-After": "2"})
+    with patch.object(client.session, "get", Mock(return_value=rate_limited)):
+        with pytest.raises(ApiV5RateLimited):
+            client.call("/url")
+    limiter.acquire.assert_called_once_with("https://base_api/url")
+    limiter.update.assert_called_once_with("https://base_api/url", rate_limited)
+
+
+def test_client_should_retry_rate_limited_calls():
+    with MockApi(rate_limit=2) as mock:
+        client = ApiV5Client(
+            mock.api_base,
+            "client_id",
+            "client_secret",
+            retry_policy=RetryPolicy(),
+        )
+        # at most 4 of them fit in the (one second) windows they span
+        results = [client.call("/v5/organizations/mock-asso") for _ in range(5)]
+        stats = mock.stats()
+    assert [result.status_code for result in results] == [200] * 5
+    assert stats["status_429"] >= 1
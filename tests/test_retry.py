@@ -0,0 +1,154 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+from helloasso_api.apiv5client import ApiV5Client
+from helloasso_api.exceptions import (
+    ApiV5BadRequest,
+    ApiV5ConnectionError,
+    ApiV5RateLimited,
+    ApiV5ServerError,
+    ApiV5Timeout,
+)
+from helloasso_api.retry import RetryBudget, RetryPolicy
+from tests.conftest import requires_async
+from tests.fake_resources.fake_response import FakeErrorResponse, FakeResponse
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("helloasso_api.retry.time.sleep", Mock())
+
+
+def flaky(*errors, result="ok"):
+    return Mock(side_effect=[*errors, result])
+
+
+@patch("helloasso_api.retry.random.uniform", Mock(side_effect=lambda a, b: b))
+def test_backoff_should_be_exponential_and_capped():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=3)
+    assert [policy.backoff(attempt) for attempt in range(5)] == [0.5, 1, 2, 3, 3]
+
+
+def test_run_should_retry_transient_errors():
+    on_retry = Mock()
+    policy = RetryPolicy(max_retries=3, on_retry=on_retry)
+    func = flaky(ApiV5Timeout(), ApiV5ConnectionError(), ApiV5ServerError(FakeErrorResponse(500)))
+
+    assert policy.run(func, "GET", "/url") == "ok"
+    assert func.call_count == 4
+    events = [c[0][0] for c in on_retry.call_args_list]
+    assert [event.attempt for event in events] == [1, 2, 3]
+    assert all(event.method == "GET" and event.sub_path == "/url" for event in events)
+    assert isinstance(events[0].error, ApiV5Timeout)
+
+
+def test_run_should_stop_after_max_retries():
+    policy = RetryPolicy(max_retries=2)
+    func = Mock(side_effect=ApiV5Timeout())
+    with pytest.raises(ApiV5Timeout):
+        policy.run(func, "GET", "/url")
+    assert func.call_count == 3
+
+
+def test_run_should_not_retry_other_errors():
+    func = flaky(ApiV5BadRequest(FakeErrorResponse(400)))
+    with pytest.raises(ApiV5BadRequest):
+        RetryPolicy().run(func, "GET", "/url")
+    assert func.call_count == 1
+
+
+@pytest.mark.parametrize("method, calls", [("POST", 1), ("PATCH", 1), ("PUT", 2)])
+def test_run_should_only_retry_idempotent_methods(method, calls):
+    func = flaky(ApiV5Timeout())
+    try:
+        RetryPolicy().run(func, method, "/url")
+    except ApiV5Timeout:
+        pass
+    assert func.call_count == calls
+
+
+def rate_limited(retry_after: str = None) -> ApiV5RateLimited:
+    result = FakeErrorResponse(429)
+    result.headers = {"Retry-After": retry_after} if retry_after else {}
+    return ApiV5RateLimited(result)
+
+
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_run_should_retry_rate_limited_calls_after_retry_after(method):
+    func = flaky(rate_limited("2"), rate_limited())
+    with patch("helloasso_api.retry.time.sleep") as sleep:
+        assert RetryPolicy(backoff_base=0.5).run(func, method, "/url") == "ok"
+    assert func.call_count == 3
+    assert sleep.call_args_list[0][0][0] == 2
+    assert sleep.call_args_list[1][0][0] <= 1
+
+
+def test_run_should_not_wait_longer_than_backoff_max():
+    func = flaky(rate_limited("3600"))
+    with pytest.raises(ApiV5RateLimited):
+        RetryPolicy(backoff_max=30).run(func, "GET", "/url")
+    assert func.call_count == 1
+
+
+def test_run_should_retry_non_idempotent_methods_when_asked():
+    func = flaky(ApiV5Timeout())
+    assert RetryPolicy(retry_methods=("POST",)).run(func, "POST", "/url") == "ok"
+
+
+def test_retry_budget_should_cap_retries():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0, window=10)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+
+
+@patch("helloasso_api.retry.time.monotonic")
+def test_retry_budget_should_forget_old_traffic(fake_monotonic: Mock):
+    fake_monotonic.return_value = 100
+    budget = RetryBudget(ratio=1, min_retries_per_second=0, window=10)
+    budget.record_request()
+    assert budget.try_spend()
+    fake_monotonic.return_value = 111
+    assert not budget.try_spend()
+
+
+def test_run_should_stop_when_budget_is_spent():
+    policy = RetryPolicy(
+        max_retries=10, budget=RetryBudget(ratio=0, min_retries_per_second=0.1)
+    )
+    func = Mock(side_effect=ApiV5Timeout())
+    with pytest.raises(ApiV5Timeout):
+        policy.run(func, "GET", "/url")
+    assert func.call_count == 2
+
+
+@requires_async
+def test_run_async_should_retry():
+    async def sleep(delay):
+        pass
+
+    policy = RetryPolicy()
+    calls = flaky(ApiV5Timeout())
+
+    async def func():
+        return calls()
+
+    with patch("asyncio.sleep", sleep):
+        assert asyncio.run(policy.run_async(func, "GET", "/url")) == "ok"
+    assert calls.call_count == 2
+
+
+def test_client_call_should_retry_server_errors():
+    client = ApiV5Client(
+        "base_api",
+        "client_id_123",
+        "client_secret_123456",
+        access_token="token",
+        retry_policy=RetryPolicy(),
+    )
+    responses = [FakeErrorResponse(503), FakeErrorResponse(502), FakeResponse({})]
+    with patch.object(client.session, "get", Mock(side_effect=responses)) as fake_get:
+        assert client.call("/url").status_code == 200
+    assert fake_get.call_count == 3
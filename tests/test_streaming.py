@@ -0,0 +1,123 @@
+import asyncio
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from helloasso_api import ApiV5Client
+from helloasso_api.exceptions import ApiV5ServerError
+from helloasso_api.mock_server import MockApi
+from helloasso_api.streaming import (
+    ArrayMemberParser,
+    AsyncJsonArrayStream,
+    JsonArrayStream,
+)
+from tests.conftest import httpx, requires_async
+from tests.fake_resources.fake_response import fake_async_session
+
+PAGE = {
+    "data": [
+        {"id": i, "payer": {"firstName": "Zoé" * i}, "amount": i * 100, "paid": i % 2 == 0}
+        for i in range(50)
+    ],
+    "pagination": {"pageSize": 50, "pageIndex": 1, "continuationToken": "abc"},
+}
+
+
+def chunked(raw: bytes, size: int) -> list:
+    return [raw[i : i + size] for i in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 4096])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_array_stream_should_decode_items_and_metadata(size, indent):
+    raw = json.dumps(PAGE, indent=indent).encode()
+    stream = JsonArrayStream(chunked(raw, size))
+
+    assert list(stream) == PAGE["data"]
+    assert stream.pagination == PAGE["pagination"]
+
+
+def test_json_array_stream_should_handle_members_in_any_order():
+    raw = b'{"pagination": {"a": 1}, "data": [1, 2.5, 12345, "x", null], "total": 3}'
+    stream = JsonArrayStream(chunked(raw, 2))
+    assert list(stream) == [1, 2.5, 12345, "x", None]
+    assert stream.metadata == {"pagination": {"a": 1}, "total": 3}
+
+
+def test_json_array_stream_should_yield_items_as_they_arrive():
+    parser = ArrayMemberParser()
+    assert parser.feed('{"data": [{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(': 2}, 3') == [{"id": 2}]
+    assert parser.feed("4]}") == [34]
+    assert parser.done
+
+
+@pytest.mark.parametrize(
+    "raw", [b'{"data": [1, 2', b'{"data": [1 2]}', b'[1, 2]', b'{"data": [1], "a": tru}']
+)
+def test_json_array_stream_should_raise_on_invalid_json(raw):
+    with pytest.raises(ValueError):
+        list(JsonArrayStream([raw]))
+
+
+def test_json_array_stream_should_close_response():
+    close = Mock()
+    list(JsonArrayStream([b'{"data": []}'], close=close))
+    assert close.call_count == 1
+
+
+def test_client_stream_should_read_body_by_chunks(api_v5_client):
+    raw = json.dumps(PAGE).encode()
+    response = Mock(encoding="utf-8")
+    response.iter_content.return_value = iter(chunked(raw, 100))
+    api_v5_client.call = Mock(return_value=response)
+
+    stream = api_v5_client.stream("/v5/orders", params={"pageSize": 50}, chunk_size=100)
+
+    assert list(stream) == PAGE["data"]
+    api_v5_client.call.assert_called_once_with(
+        "/v5/orders", params={"pageSize": 50}, stream=True
+    )
+    response.iter_content.assert_called_once_with(100)
+    assert response.close.call_count == 1
+
+
+def test_client_stream_should_release_the_connection_of_error_responses():
+    with MockApi() as mock:
+        client = ApiV5Client(mock.api_base, "client_id", "client_secret", pool_maxsize=1)
+        client.call("/v5/organizations/mock-asso")
+        mock.access_tokens.clear()  # 401, then the call is sent again
+        assert list(client.stream("/v5/organizations/mock-asso/orders"))
+        mock.error_rate = 1.0
+        for _ in range(2):
+            with pytest.raises(ApiV5ServerError):
+                client.stream("/v5/organizations/mock-asso/orders")
+        stats = mock.stats()
+        manager = client.session.get_adapter(mock.api_base).poolmanager
+    (pool,) = [manager.pools[key] for key in manager.pools.keys()]
+    assert stats["status_401"] == 1
+    # the connection of each error response went back to the pool and was reused
+    assert pool.num_connections == 1
+
+
+@requires_async
+def test_async_client_stream(async_api_v5_client):
+    raw = json.dumps(PAGE).encode()
+
+    async def body():
+        for chunk in chunked(raw, 64):
+            yield chunk
+
+    async_api_v5_client.session = fake_async_session(
+        lambda request: httpx.Response(200, content=body())
+    )
+
+    async def run():
+        stream = await async_api_v5_client.stream("/v5/orders")
+        assert isinstance(stream, AsyncJsonArrayStream)
+        return [item async for item in stream], stream.pagination
+
+    items, pagination = asyncio.run(run())
+    assert items == PAGE["data"]
+    assert pagination == PAGE["pagination"]
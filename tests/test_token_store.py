@@ -0,0 +1,186 @@
+import subprocess
+import sys
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from helloasso_api import ApiV5Client
+from helloasso_api.exceptions import ApiV5NoConfig, ApiV5Timeout
+from helloasso_api.mock_server import MockApi
+from helloasso_api.oauth2 import OAuth2Api
+from helloasso_api.token_store import (
+    GetterSetterTokenStore,
+    MemoryTokenStore,
+    SQLiteTokenStore,
+    TokenPair,
+    TokenStore,
+)
+from tests.fake_resources.fake_response import http_response
+
+CHILD = """
+import sys
+from helloasso_api import ApiV5Client
+from helloasso_api.token_store import SQLiteTokenStore
+
+client = ApiV5Client(
+    api_base=sys.argv[1],
+    client_id="client_id",
+    client_secret="client_secret",
+    token_store=SQLiteTokenStore(sys.argv[2]),
+)
+for _ in range(5):
+    client.call("/v5/users/me/organizations")
+"""
+
+
+@pytest.fixture(params=["memory", "sqlite", "getter_setter"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTokenStore()
+    if request.param == "sqlite":
+        return SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    storage = {}
+    return GetterSetterTokenStore(
+        lambda token_key, client_id: storage.get((token_key, client_id)),
+        lambda token_key, client_id, token: storage.update(
+            {(token_key, client_id): token}
+        ),
+    )
+
+
+def test_store_should_get_and_put_pairs(store):
+    assert store.get("client") is None
+    store.put("client", TokenPair("access", "refresh"))
+    assert store.get("client") == TokenPair("access", "refresh")
+    assert store.get("other") is None
+
+
+def test_store_should_compare_and_set(store):
+    assert store.compare_and_set("client", None, TokenPair("a1", "r1"))
+    assert not store.compare_and_set("client", None, TokenPair("a2", "r2"))
+    assert not store.compare_and_set(
+        "client", TokenPair("a0", "r0"), TokenPair("a2", "r2")
+    )
+    assert store.compare_and_set("client", TokenPair("a1", "r1"), TokenPair("a2", "r2"))
+    assert store.get("client") == TokenPair("a2", "r2")
+
+
+def test_refresh_lock_should_exclude_other_holders(store):
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with store.refresh_lock("client"):
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    with pytest.raises(ApiV5Timeout):
+        with store.refresh_lock("client", timeout=0.1):
+            pass
+    with store.refresh_lock("other", timeout=0.1):
+        pass
+    release.set()
+    thread.join()
+    with store.refresh_lock("client", timeout=0.1):
+        pass
+
+
+def test_token_store_should_require_get_and_put():
+    class IncompleteStore(TokenStore):
+        def get(self, key: str) -> TokenPair:
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+def test_sqlite_refresh_lock_should_expire(tmp_path):
+    path = str(tmp_path / "tokens.db")
+    store = SQLiteTokenStore(path, lock_lease=0.2)
+    assert store._acquire("client", "dead process")
+    with pytest.raises(ApiV5Timeout):
+        with SQLiteTokenStore(path).refresh_lock("client", timeout=0.05):
+            pass
+    with SQLiteTokenStore(path).refresh_lock("client", timeout=1):
+        pass
+
+
+def test_oauth_should_write_token_pairs_at_once():
+    store = MemoryTokenStore()
+    store.put = Mock(side_effect=store.put)
+    oauth = OAuth2Api("base_api", "client_id", "secret", 123, token_store=store)
+    oauth.token_saver({"access_token": "access", "refresh_token": "refresh"})
+    assert store.put.call_count == 1
+    assert store.get("client_id") == TokenPair("access", "refresh")
+    assert oauth.access_token == "access"
+    assert oauth.refresh_token == "refresh"
+
+
+def test_oauth_should_keep_tokens_changed_by_another_process():
+    store = MemoryTokenStore()
+    oauth = OAuth2Api(
+        "base_api", "client_id", "secret", 123, token_store=store, token_cache_ttl=60
+    )
+    oauth.token_saver({"access_token": "a1", "refresh_token": "r1"})
+    store.put("client_id", TokenPair("a2", "r2"))
+    oauth.token_saver({"access_token": "a3", "refresh_token": "r3"})
+    assert store.get("client_id") == TokenPair("a2", "r2")
+    assert oauth.access_token == "a2"
+
+
+@pytest.mark.parametrize("token_cache_ttl, reads", [(None, 1), (0, 7)])
+def test_client_should_not_read_the_store_on_every_call(
+    tmp_path, token_cache_ttl, reads
+):
+    store = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    store.put("client_id", TokenPair("access", "refresh"))
+    store.get = Mock(side_effect=store.get)
+    client = ApiV5Client(
+        api_base="base_api",
+        client_id="client_id",
+        client_secret="secret",
+        token_store=store,
+        token_cache_ttl=token_cache_ttl,
+    )
+    with patch.object(client.session, "get", Mock(return_value=http_response())):
+        for _ in range(3):
+            client.call("/v5/users/me/organizations")
+    assert store.get.call_count == reads
+
+
+def test_client_should_not_take_token_store_and_getters():
+    with pytest.raises(ApiV5NoConfig):
+        ApiV5Client(
+            api_base="base_api",
+            client_id="client_id",
+            client_secret="secret",
+            oauth2_token_getter=Mock(),
+            oauth2_token_setter=Mock(),
+            token_store=MemoryTokenStore(),
+            lazy_auth=True,
+        )
+
+
+def test_clients_should_share_tokens_and_refresh_once(tmp_path):
+    path = str(tmp_path / "tokens.db")
+    with MockApi() as mock:
+        ApiV5Client(
+            api_base=mock.api_base,
+            client_id="client_id",
+            client_secret="client_secret",
+            token_store=SQLiteTokenStore(path),
+        )
+        mock.access_tokens.clear()
+        children = [
+            subprocess.Popen([sys.executable, "-c", CHILD, mock.api_base, path])
+            for _ in range(4)
+        ]
+        assert [child.wait(timeout=60) for child in children] == [0] * 4
+        stats = mock.stats()
+    assert stats["grant_client_credentials"] == 1
+    assert stats["grant_refresh_token"] == 1
+    assert stats.get("status_400") is None